@@ -20,6 +20,7 @@ export interface ChatBoxProps {
 export function ChatBox({ chatWidth = 600, chatHeight = 500 }: ChatBoxProps) {
   const [chatSessions, setChatSessions] = useState<ChatSession[]>([]);
   const [chatMessages, setChatMessages] = useState<Message[]>([]);
+  const [olderMessagesUrl, setOlderMessagesUrl] = useState<string | null>(null);
   const [activeChatId, setActiveChatId] = useState(0);
   const [hasUnread, setHasUnread] = useState(false);
   const [open, setOpen] = useState(false);
@@ -31,9 +32,10 @@ export function ChatBox({ chatWidth = 600, chatHeight = 500 }: ChatBoxProps) {
       try {
         setActiveChatId(chatId);
 
-        // Always fetch chat history from API
-        const messages = await fetchChatHistory(chatId);
+        // Fetch the newest messages; older ones are loaded on request
+        const { messages, olderUrl } = await fetchChatHistory(chatId);
         setChatMessages(messages);
+        setOlderMessagesUrl(olderUrl);
 
         // Mark messages as read via API
         await markChatAsRead(chatId);
@@ -55,6 +57,19 @@ export function ChatBox({ chatWidth = 600, chatHeight = 500 }: ChatBoxProps) {
     [chatSessions]
   );
 
+  // Prepend the page of messages before the oldest one shown
+  const handleLoadOlderMessages = useCallback(async () => {
+    if (!activeChatId || !olderMessagesUrl) return;
+    try {
+      const { messages, olderUrl } = await fetchChatHistory(activeChatId, olderMessagesUrl);
+      setChatMessages((prev) => [...messages, ...prev]);
+      setOlderMessagesUrl(olderUrl);
+    } catch (error) {
+      console.error("Error fetching older chat messages:", error);
+      toast.error("Failed to load older messages");
+    }
+  }, [activeChatId, olderMessagesUrl]);
+
   // Send a new message
   const handleSendMessage = useCallback(
     async (content: string, file?: File) => {
@@ -199,6 +214,8 @@ export function ChatBox({ chatWidth = 600, chatHeight = 500 }: ChatBoxProps) {
           activeChat={chatMessages}
           handleSelectChat={handleSelectChat}
           handleSendMessage={handleSendMessage}
+          hasOlderMessages={olderMessagesUrl !== null}
+          handleLoadOlderMessages={handleLoadOlderMessages}
         />
       </PopoverContent>
     </Popover>
@@ -11,6 +11,8 @@ interface ChatInterfaceProps {
   activeChat: Message[];
   handleSelectChat: (chatId: number) => Promise<void>;
   handleSendMessage: (content: string, file?: globalThis.File) => void;
+  hasOlderMessages: boolean;
+  handleLoadOlderMessages: () => Promise<void>;
 }
 
 // the chat interface component is responsible for rendering the chat sidebar and chat window
@@ -20,6 +22,8 @@ export function ChatInterface({
   activeChat,
   handleSelectChat,
   handleSendMessage,
+  hasOlderMessages,
+  handleLoadOlderMessages,
 }: ChatInterfaceProps) {
   // Pass the loading state to the chat window component for UI feedback
   return (
@@ -35,7 +39,12 @@ export function ChatInterface({
           onSelectChat={handleSelectChat}
         />
 
-        <ChatWindow chat={activeChat} onSendMessage={handleSendMessage} />
+        <ChatWindow
+          chat={activeChat}
+          onSendMessage={handleSendMessage}
+          hasOlderMessages={hasOlderMessages}
+          onLoadOlderMessages={handleLoadOlderMessages}
+        />
       </div>
     </div>
   );
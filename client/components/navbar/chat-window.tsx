@@ -1,6 +1,6 @@
 "use client";
 
-import { useRef, useEffect } from "react";
+import { useRef, useEffect, useState } from "react";
 import { Message } from "@/types/message";
 import MessageInput from "@/components/navbar/message-input";
 import { ScrollArea } from "@/components/ui/scroll-area";
@@ -35,21 +35,51 @@ const FileTypeIcon = ({ type }: { type: string }) => {
 interface ChatWindowProps {
   chat: Message[];
   onSendMessage: (content: string, file?: globalThis.File) => void;
+  hasOlderMessages: boolean;
+  onLoadOlderMessages: () => Promise<void>;
 }
 
 // the chat window component is responsible for rendering the chat messages
 // it also handles the sending of new messages
-export default function ChatWindow({ chat, onSendMessage }: ChatWindowProps) {
+export default function ChatWindow({
+  chat,
+  onSendMessage,
+  hasOlderMessages,
+  onLoadOlderMessages,
+}: ChatWindowProps) {
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const newestMessageId = chat[chat.length - 1]?.id;
 
+  // Follow new messages, but stay in place when older ones are prepended
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [chat]);
+  }, [newestMessageId]);
+
+  const loadOlderMessages = async () => {
+    setLoadingOlder(true);
+    try {
+      await onLoadOlderMessages();
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
 
   return (
     <div className="flex flex-7/10 h-full w-full flex-col overflow-hidden">
       <ScrollArea className="flex-1 px-2 overflow-y-auto webkit-fill-available">
         <div className=" mt-2 space-y-2">
+          {hasOlderMessages && (
+            <div className="flex justify-center">
+              <button
+                type="button"
+                onClick={loadOlderMessages}
+                disabled={loadingOlder}
+                className="text-xs text-muted-foreground underline disabled:opacity-50">
+                {loadingOlder ? "Loading..." : "Load older messages"}
+              </button>
+            </div>
+          )}
           {chat.map((message: Message) => (
             <div
               key={message.id}
@@ -10,12 +10,24 @@ const nextConfig: NextConfig = {
         port: "8000",
         pathname: "/media/**",
       },
+      {
+        protocol: "http",
+        hostname: "127.0.0.1",
+        port: "8000",
+        pathname: "/api/media/**",
+      },
       {
         protocol: "http",
         hostname: "192.168.0.101",
         port: "8000",
         pathname: "/media/**",
       },
+      {
+        protocol: "http",
+        hostname: "192.168.0.101",
+        port: "8000",
+        pathname: "/api/media/**",
+      },
     ],
   },
 };
@@ -2,15 +2,16 @@
  * Types for notifications in the application
  */
 
+// Course announcements have string IDs of the form "announcement-<id>"
 export type Notification = {
-  id: number;
+  id: number | string;
   message: string;
   read: boolean;
   time: string;
 };
 
 export type ApiNotification = {
-  id: number;
+  id: number | string;
   message: string;
   is_read: boolean;
   created_at: string;
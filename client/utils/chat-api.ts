@@ -42,17 +42,40 @@ export async function sendMessage(activeChatId: number, content: string, file?:
   return await response.json();
 }
 
-export async function fetchChatHistory(chatId: number): Promise<Message[]> {
-  const response = await fetchWithAuth(`${API_URL}/api/chat/${chatId}/`);
+export interface ChatHistoryPage {
+  messages: Message[];
+  olderUrl: string | null;
+}
+
+// Find the URL with the given rel in a Link header
+function getLinkUrl(header: string | null, rel: string): string | null {
+  if (!header) return null;
+  for (const link of header.split(",")) {
+    const match = link.match(/<([^>]+)>;\s*rel="([^"]+)"/);
+    if (match && match[2] === rel) return match[1];
+  }
+  return null;
+}
+
+// Fetch the newest page of a chat, or the older page at olderUrl. Pages are
+// returned oldest first, with the URL of the page before them, if any.
+export async function fetchChatHistory(
+  chatId: number,
+  olderUrl?: string | null
+): Promise<ChatHistoryPage> {
+  const response = await fetchWithAuth(olderUrl || `${API_URL}/api/chat/${chatId}/`);
   const messages: ChatMessageResponse[] = await response.json();
-  
-  return messages.map((msg) => ({
-    id: msg.id,
-    content: msg.content,
-    isSender: msg.isSender,
-    timestamp: new Date(msg.timestamp),
-    file: msg.file,
-  }));
+
+  return {
+    messages: messages.map((msg) => ({
+      id: msg.id,
+      content: msg.content,
+      isSender: msg.isSender,
+      timestamp: new Date(msg.timestamp),
+      file: msg.file,
+    })),
+    olderUrl: getLinkUrl(response.headers.get("Link"), "prev"),
+  };
 }
 
 export async function fetchChatSessions(): Promise<ChatSession[]> {
@@ -1,6 +1,6 @@
 import { toast } from "sonner";
 import { Message, ChatSession } from "@/types/chat";
-import { fetchChatHistory, fetchChatSessions } from "@/utils/chat-api";
+import { fetchChatHistory } from "@/utils/chat-api";
 
 interface WebSocketHandlerProps {
   chatSocket: WebSocket | null;
@@ -32,6 +32,16 @@ export function setupWebSocketHandler({
     all_read?: boolean;
     has_unread?: boolean;
     any_unread_sessions?: boolean;
+    session?: SessionUpdate;
+  }
+
+  interface SessionUpdate {
+    id: number;
+    name: string;
+    last_message: string;
+    last_message_at: string | null;
+    unread_count: number;
+    is_unread: boolean;
   }
 
   interface ChatMessage {
@@ -62,8 +72,8 @@ export function setupWebSocketHandler({
       case "read_status_update":
         handleReadStatusUpdate(data);
         break;
-      case "chat_sessions_updated":
-        refreshChatSessions();
+      case "chat_session_update":
+        if (data.session) applySessionUpdate(data.session);
         break;
       case "error":
         toast.error(data.error || "An error occurred");
@@ -74,7 +84,7 @@ export function setupWebSocketHandler({
   const handleChatMessage = (message: ChatMessage) => {
     // If looking at the current chat, update the message list
     if (message.sender_id === activeChatId && open) {
-      // Refresh the entire chat history to ensure consistency
+      // Refresh the newest messages to ensure consistency
       refreshChatHistory(activeChatId);
     } else {
       // Just update the session data and show a notification
@@ -97,20 +107,32 @@ export function setupWebSocketHandler({
     }
   };
 
-  const refreshChatSessions = async () => {
-    try {
-      const sessions = await fetchChatSessions();
-      setChatSessions(sessions);
-      setHasUnread(sessions.some((session) => session.isUnread));
-    } catch (error) {
-      console.error("Error refreshing chat sessions:", error);
+  const applySessionUpdate = (update: SessionUpdate) => {
+    // An open chat is read as messages arrive, so it never shows as unread
+    const isCurrentChat = update.id === activeChatId && open;
+    const session: ChatSession = {
+      id: update.id,
+      name: update.name,
+      lastMessage: update.last_message,
+      isUnread: update.is_unread && !isCurrentChat,
+    };
+
+    // Move the updated session to the top, as it now has the latest message
+    setChatSessions((prev) => [session, ...prev.filter((s) => s.id !== update.id)]);
+    if (session.isUnread) {
+      setHasUnread(true);
     }
   };
 
   const refreshChatHistory = async (chatId: number) => {
     try {
-      const messages = await fetchChatHistory(chatId);
-      setChatMessages(messages);
+      const { messages } = await fetchChatHistory(chatId);
+      // Replace what the newest page covers and keep older pages already loaded
+      const oldest = messages[0]?.timestamp;
+      setChatMessages((prev) => [
+        ...prev.filter((msg) => oldest && msg.timestamp < oldest),
+        ...messages,
+      ]);
     } catch (error) {
       console.error("Error refreshing chat history:", error);
     }
@@ -34,7 +34,7 @@ export const fetchNotifications = async (): Promise<Notification[]> => {
  * Marks a specific notification as read
  * @param notificationId ID of the notification to mark as read
  */
-export const markNotificationAsRead = async (notificationId: number): Promise<boolean> => {
+export const markNotificationAsRead = async (notificationId: number | string): Promise<boolean> => {
   try {
     const response = await fetchWithAuth(
       `${API_URL}/api/notifications/${notificationId}/`,
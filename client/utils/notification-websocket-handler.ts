@@ -5,7 +5,7 @@
 // Type for the parsed WebSocket message data
 export type NotificationSocketMessage = {
   type: string;
-  notification_id: number;
+  notification_id: number | string;
   message: string;
 };
 
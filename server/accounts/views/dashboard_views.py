@@ -6,6 +6,8 @@ from django.db.models import Q
 
 from courses.models import Course, Enrollment
 from courses.serializers import CourseSerializer, EnrollmentSerializer
+from uploads.derivatives import get_derivative_urls, schedule_derivatives
+from uploads.signing import signed_media_url
 
 
 class DashboardViewSet(viewsets.ViewSet):
@@ -39,7 +41,10 @@ class DashboardViewSet(viewsets.ViewSet):
                 "username": user.username,
                 "role": user.role,
                 "photo": (
-                    request.build_absolute_uri(user.photo.url) if user.photo else None
+                    signed_media_url(user.photo.name, request) if user.photo else None
+                ),
+                "photo_thumbnails": get_derivative_urls(
+                    user.photo.name, "avatar", request
                 ),
                 "status": user.status,
                 "courses": courses,
@@ -173,8 +178,11 @@ class DashboardViewSet(viewsets.ViewSet):
             user.save()
 
             if user.photo:
+                # Avatar sizes are rendered in the background and listed by the
+                # dashboard once they are ready
+                schedule_derivatives(user.photo, "avatar")
                 return Response(
-                    {"photo": request.build_absolute_uri(user.photo.url)},
+                    {"photo": signed_media_url(user.photo.name, request)},
                     status=status.HTTP_200_OK,
                 )
             return Response(
@@ -30,11 +30,14 @@ from courses.views import (
 )
 
 # Notifications
-from notifications.views import NotificationViewSet
+from notifications.views import NotificationViewSet, notification_stream
 
 # Chat
 from chat.views import ChatMessageViewSet
 
+# Uploads
+from uploads.views import MediaDownloadView, UploadSessionViewSet
+
 # Main router for top-level endpoints
 router = DefaultRouter()
 
@@ -85,10 +88,16 @@ router.register(r"chat", ChatMessageViewSet, basename="chat")
 # Notifications
 router.register(r"notifications", NotificationViewSet, basename="notifications")
 
+# Chunked Uploads
+router.register(r"uploads", UploadSessionViewSet, basename="uploads")
+
 # API URL Patterns
 urlpatterns = [
+    # Before the router, whose notification detail route would match "stream"
+    path("notifications/stream/", notification_stream, name="notification-stream"),
     path("", include(router.urls)),
     path("", include(courses_router.urls)),
     path("auth/register/", UserRegistrationView.as_view(), name="register"),
     path("auth/logout/", UserLogoutView.as_view(), name="logout"),
+    path("media/<path:name>", MediaDownloadView.as_view(), name="media-download"),
 ]
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api.realtime import dispatch_outbox
+
+
+class Command(BaseCommand):
+    """Send the real-time events waiting in the outbox.
+
+    Runs as a long-lived worker by default, draining the outbox in batches and
+    sleeping while it is empty. Events that fail are retried with exponential
+    backoff up to REALTIME_OUTBOX_MAX_ATTEMPTS times. Several workers can run
+    side by side.
+    """
+
+    help = "Dispatch real-time events from the outbox to the channel layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of events claimed and sent at a time",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no events are due",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the events that are due and exit",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total_claimed = 0
+        total_sent = 0
+
+        while True:
+            claimed, sent = dispatch_outbox(batch_size)
+            total_claimed += claimed
+            total_sent += sent
+
+            if claimed < batch_size:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sent {total_sent} of {total_claimed} events, "
+                f"{total_claimed - total_sent} rescheduled"
+            )
+        )
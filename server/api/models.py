@@ -0,0 +1,51 @@
+"""
+Real-time Outbox Model
+======================
+
+This model stores real-time events in the same transaction as the data they
+describe, until they have been delivered to the channel layer.
+"""
+
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    A real-time event waiting to be sent to a channel layer group.
+
+    Rows are deleted once the event has been sent. Failed sends are retried
+    with exponential backoff until REALTIME_OUTBOX_MAX_ATTEMPTS is reached, and
+    the row is then kept for inspection.
+
+    Attributes:
+        group (str): Name of the channel layer group
+        event (dict): Event with a "type" key naming the consumer handler
+        created_at (datetime): When the event was published
+        attempts (int): Number of failed sends so far
+        next_attempt_at (datetime): When the dispatcher may next send the event
+        last_error (str): Error of the last failed send
+    """
+
+    group = models.CharField(max_length=100)
+    event = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at", "id"], name="outbox_next_attempt_idx"
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the event.
+
+        Returns:
+            str: The event type and target group
+        """
+        return f"{self.event.get('type')} to {self.group}"
@@ -0,0 +1,227 @@
+"""
+Keyset Pagination for the eLearning Platform
+
+This file defines a cursor-based paginator shared by the API endpoints that page
+through long, append-mostly feeds (chat history, notifications).
+"""
+
+import base64
+import heapq
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate a queryset by a (timestamp, id) key using opaque cursors.
+
+    Each page is located with an indexed range condition on the key instead of an
+    OFFSET, so every page costs the same regardless of how deep it is. Clients pass:
+    - no cursor: the newest page
+    - before=<cursor>: the page of items strictly older than the cursor
+    - after=<cursor>: the page of items strictly newer than the cursor
+    - limit=<n>: page size, capped at max_page_size
+
+    The response body stays a plain list; links to the neighbouring pages are
+    returned in the ``Link`` header with rel="prev" (older) and rel="next" (newer).
+
+    Attributes:
+        ordering_field: Timestamp field that orders the feed
+        page_size: Default number of items per page
+        max_page_size: Upper bound for the limit query parameter
+        ascending_results: Whether each page is returned oldest first
+    """
+
+    ordering_field = "created_at"
+    page_size = 50
+    max_page_size = 200
+    ascending_results = False
+
+    before_query_param = "before"
+    after_query_param = "after"
+    limit_query_param = "limit"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of the queryset as a list.
+
+        Args:
+            queryset: The queryset to paginate
+            request: The incoming request carrying the cursor parameters
+            view: The calling view
+
+        Returns:
+            list: Items of the requested page in result order
+        """
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Return one page of a feed merged from several querysets.
+
+        Each queryset is paged with the same key condition and at most one page
+        is read from each, so the cost stays independent of how deep the page
+        is. The querysets must share the ordering field; items are ordered by
+        (timestamp, id) across them.
+
+        Args:
+            querysets: The querysets to paginate together
+            request: The incoming request carrying the cursor parameters
+            view: The calling view
+
+        Returns:
+            list: Items of the requested page in result order
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        field = self.ordering_field
+        condition = Q()
+        if after:
+            condition = self.newer_than(self.decode_cursor(after))
+            ordering = (field, "id")
+        else:
+            if before:
+                condition = self.older_than(self.decode_cursor(before))
+            ordering = (f"-{field}", "-id")
+
+        pages = [
+            list(queryset.filter(condition).order_by(*ordering)[: self.limit + 1])
+            for queryset in querysets
+        ]
+
+        if len(pages) == 1:
+            items = pages[0]
+        else:
+            items = list(
+                heapq.merge(
+                    *pages,
+                    key=lambda item: (getattr(item, field), item.id),
+                    reverse=not after,
+                )
+            )[: self.limit + 1]
+        has_more = len(items) > self.limit
+        items = items[: self.limit]
+
+        # Items are currently in scan order: newest first unless paging forwards
+        if after:
+            self.has_newer, self.has_older = has_more, True
+            items.reverse()
+        else:
+            self.has_older, self.has_newer = has_more, bool(before)
+
+        self.newest = items[0] if items else None
+        self.oldest = items[-1] if items else None
+        if self.ascending_results:
+            items.reverse()
+        return items
+
+    def get_paginated_response(self, data):
+        """
+        Return the page as a list with neighbouring page links in the headers.
+
+        Args:
+            data: Serialized page items
+
+        Returns:
+            Response: The page with an optional Link header
+        """
+        links = []
+        if self.has_older and self.oldest is not None:
+            links.append(
+                f'<{self.get_page_link(self.before_query_param, self.oldest)}>; rel="prev"'
+            )
+        if self.has_newer and self.newest is not None:
+            links.append(
+                f'<{self.get_page_link(self.after_query_param, self.newest)}>; rel="next"'
+            )
+
+        headers = {"Link": ", ".join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def get_limit(self, request):
+        """
+        Read the requested page size, falling back to the default.
+
+        Returns:
+            int: The page size to use
+        """
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def get_page_link(self, query_param, item):
+        """
+        Build the absolute URL of a neighbouring page.
+
+        Args:
+            query_param: Either the before or the after query parameter
+            item: The item at the edge of the current page
+
+        Returns:
+            str: Absolute URL for the neighbouring page
+        """
+        url = self.request.build_absolute_uri()
+        for param in (self.before_query_param, self.after_query_param):
+            url = remove_query_param(url, param)
+        return replace_query_param(url, query_param, self.encode_cursor(item))
+
+    def encode_cursor(self, item):
+        """
+        Encode an item's position as an opaque cursor string.
+
+        Args:
+            item: A model instance from the paginated queryset
+
+        Returns:
+            str: URL-safe cursor
+        """
+        timestamp = getattr(item, self.ordering_field)
+        raw = f"{timestamp.isoformat()}|{item.id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """
+        Decode a cursor produced by encode_cursor.
+
+        Args:
+            cursor: Cursor string from the query parameters
+
+        Returns:
+            tuple: (timestamp, id) of the cursor position
+
+        Raises:
+            NotFound: If the cursor is malformed
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            timestamp, item_id = base64.urlsafe_b64decode(padded).decode().split("|")
+            return datetime.fromisoformat(timestamp), int(item_id)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def older_than(self, position):
+        """Return a filter matching items strictly before a cursor position."""
+        timestamp, item_id = position
+        field = self.ordering_field
+        return Q(**{f"{field}__lt": timestamp}) | Q(
+            **{field: timestamp, "id__lt": item_id}
+        )
+
+    def newer_than(self, position):
+        """Return a filter matching items strictly after a cursor position."""
+        timestamp, item_id = position
+        field = self.ordering_field
+        return Q(**{f"{field}__gt": timestamp}) | Q(
+            **{field: timestamp, "id__gt": item_id}
+        )
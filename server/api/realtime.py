@@ -0,0 +1,391 @@
+"""
+Real-time Event Publishing for the eLearning Platform
+
+This file defines the publisher used by views and services to push events to
+WebSocket groups through the channel layer. Published events are written to the
+OutboxEvent table in the caller's transaction, so an event exists if and only if
+the data it describes was committed, and publishing never fails a request.
+
+Once the transaction commits, the events are handed to a background sender
+thread in the same process, which sends them right away on a best-effort basis
+and deletes them from the outbox, so the response never waits for the channel
+layer. All events published while a batch is open go out together through a
+single event-loop bridge. Events that could not be sent, or that were still
+queued when the process exited, stay in the outbox and the dispatch_outbox
+command retries them with backoff. REALTIME_SEND_INLINE sends them in the
+committing thread instead, and with REALTIME_DISPATCH_ON_COMMIT disabled the
+dispatcher does all sending.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_current_batch = ContextVar("realtime_batch", default=None)
+
+
+class EventBatch:
+    """
+    Outbox events collected while a batch is open, waiting to be sent together.
+
+    Attributes:
+        events: OutboxEvent rows in publishing order
+        closed: Whether the batch has already been sent
+    """
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+
+    def extend(self, events):
+        """Queue outbox events, or send them if the batch was already sent."""
+        if self.closed:
+            deliver(events)
+        else:
+            self.events.extend(events)
+
+    def send(self):
+        """Send all queued events and close the batch."""
+        self.closed = True
+        events, self.events = self.events, []
+        deliver(events)
+
+
+class BackgroundSender:
+    """
+    Thread that sends committed outbox events outside the request.
+
+    One sender runs per process and is started on first use. Rows submitted
+    while it is busy are sent together in its next round.
+
+    Attributes:
+        queue: Lists of OutboxEvent rows waiting to be sent
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, rows):
+        """Queue outbox events to be sent by the sender thread."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="realtime-sender", daemon=True
+                )
+                self._thread.start()
+        self.queue.put(rows)
+
+    def run(self):
+        """Send queued events until the process exits."""
+        while True:
+            rows = self.queue.get()
+            while True:
+                try:
+                    rows = rows + self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                dispatch_events(rows)
+            except Exception as e:
+                # The rows are still in the outbox for the dispatcher
+                logger.error(f"Error sending real-time events: {str(e)}")
+            finally:
+                close_old_connections()
+
+
+_sender = BackgroundSender()
+
+
+def deliver(rows):
+    """
+    Send committed outbox events, in the background unless REALTIME_SEND_INLINE.
+
+    Args:
+        rows: OutboxEvent rows whose transaction has committed
+    """
+    if not rows:
+        return
+    if settings.REALTIME_SEND_INLINE:
+        dispatch_events(rows)
+    else:
+        _sender.submit(rows)
+
+
+def publish(group, event):
+    """
+    Publish an event to a channel layer group after the current transaction commits.
+
+    The event is stored in the outbox as part of the current transaction. Inside
+    a batch it is handed to the sender when the batch closes; otherwise as soon
+    as the transaction commits (immediately in autocommit mode). Events published inside
+    a transaction that rolls back are never stored or sent.
+
+    Args:
+        group: Name of the channel layer group
+        event: Event dict with a "type" key naming the consumer handler
+    """
+    publish_many([(group, event)])
+
+
+def publish_many(events):
+    """
+    Publish many events after the current transaction commits.
+
+    Equivalent to calling publish() for each event, with a single outbox insert
+    and a single commit hook for all of them.
+
+    Args:
+        events: (group, event) pairs to publish
+    """
+    dispatch = settings.REALTIME_DISPATCH_ON_COMMIT
+    now = timezone.now()
+    # Leave events that are about to be sent on commit to this process for a
+    # while, so the dispatcher does not send them a second time
+    next_attempt_at = (
+        now + timedelta(seconds=settings.REALTIME_OUTBOX_CLAIM_DELAY)
+        if dispatch
+        else now
+    )
+    rows = OutboxEvent.objects.bulk_create(
+        OutboxEvent(group=group, event=event, next_attempt_at=next_attempt_at)
+        for group, event in events
+    )
+    if not rows or not dispatch:
+        return
+
+    current = _current_batch.get()
+    if current is None:
+        transaction.on_commit(partial(deliver, rows))
+    else:
+        transaction.on_commit(partial(current.extend, rows))
+
+
+@contextmanager
+def batch():
+    """
+    Collect every event published inside the block and send them together.
+
+    Nested batches join the outermost one. Only events whose transaction has
+    committed are ever queued, so they are sent even if the block raises.
+    """
+    if _current_batch.get() is not None:
+        yield
+        return
+
+    current = EventBatch()
+    token = _current_batch.set(current)
+    try:
+        yield
+    finally:
+        _current_batch.reset(token)
+        current.send()
+
+
+@asynccontextmanager
+async def abatch():
+    """
+    Like batch(), for code running on the event loop.
+
+    Events are handed over from a worker thread when the block exits, so an
+    inline send never blocks the loop.
+    """
+    if _current_batch.get() is not None:
+        yield
+        return
+
+    current = EventBatch()
+    token = _current_batch.set(current)
+    try:
+        yield
+    finally:
+        _current_batch.reset(token)
+        if current.events:
+            await sync_to_async(current.send, thread_sensitive=False)()
+        else:
+            current.closed = True
+
+
+def get_retry_delay(attempts):
+    """
+    Return the backoff before retrying an event that failed attempts times.
+
+    Args:
+        attempts: Number of failed sends so far, at least 1
+
+    Returns:
+        timedelta: Exponential delay, capped at REALTIME_OUTBOX_RETRY_MAX
+    """
+    seconds = settings.REALTIME_OUTBOX_RETRY_BASE * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.REALTIME_OUTBOX_RETRY_MAX))
+
+
+def dispatch_events(rows):
+    """
+    Send outbox events and record the outcome.
+
+    Sent events are deleted from the outbox; failed ones are rescheduled with
+    backoff for the dispatcher.
+
+    Args:
+        rows: OutboxEvent rows to send
+
+    Returns:
+        int: Number of events sent
+    """
+    if not rows:
+        return 0
+
+    failures = send_events([(row.group, row.event) for row in rows])
+    failed = []
+    now = timezone.now()
+    for index, error in failures:
+        row = rows[index]
+        row.attempts += 1
+        row.next_attempt_at = now + get_retry_delay(row.attempts)
+        row.last_error = error
+        failed.append(row)
+        if row.attempts >= settings.REALTIME_OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {row} after {row.attempts} attempts")
+
+    try:
+        failed_ids = {row.id for row in failed}
+        OutboxEvent.objects.filter(
+            id__in=[row.id for row in rows if row.id not in failed_ids]
+        ).delete()
+        OutboxEvent.objects.bulk_update(
+            failed, ["attempts", "next_attempt_at", "last_error"]
+        )
+    except Exception as e:
+        # The dispatcher will pick the events up again; re-sending is harmless
+        logger.error(f"Error updating the real-time outbox: {str(e)}")
+    return len(rows) - len(failed)
+
+
+def dispatch_outbox(batch_size=500):
+    """
+    Claim a batch of due outbox events and send them.
+
+    Claimed events are pushed back by REALTIME_OUTBOX_CLAIM_DELAY before they
+    are sent, so concurrent dispatchers skip them; rows locked by another
+    dispatcher are skipped on databases that support it.
+
+    Args:
+        batch_size: Maximum number of events to claim
+
+    Returns:
+        tuple: (events claimed, events sent)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                next_attempt_at__lte=now,
+                attempts__lt=settings.REALTIME_OUTBOX_MAX_ATTEMPTS,
+            )
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        OutboxEvent.objects.filter(id__in=[row.id for row in rows]).update(
+            next_attempt_at=now
+            + timedelta(seconds=settings.REALTIME_OUTBOX_CLAIM_DELAY)
+        )
+    return len(rows), dispatch_events(rows)
+
+
+def send_events(events):
+    """
+    Send events to their groups concurrently through one event-loop bridge.
+
+    At most REALTIME_MAX_CONCURRENT_SENDS sends are in flight at a time, so a
+    large fan-out is pipelined instead of opening thousands of requests to the
+    channel layer at once. Failures are logged per event and never raised,
+    since the data the events describe has already been committed.
+
+    Args:
+        events: (group, event) pairs to send
+
+    Returns:
+        list: (index, error message) of each event that could not be sent
+    """
+    channel_layer = get_channel_layer()
+    if not events or channel_layer is None:
+        return []
+
+    async def send_all():
+        semaphore = asyncio.Semaphore(settings.REALTIME_MAX_CONCURRENT_SENDS)
+
+        async def send(group, event):
+            async with semaphore:
+                await channel_layer.group_send(group, event)
+
+        return await asyncio.gather(
+            *(send(group, event) for group, event in events),
+            return_exceptions=True,
+        )
+
+    try:
+        results = async_to_sync(send_all)()
+    except Exception as e:
+        logger.error(f"Error publishing real-time events: {str(e)}")
+        return [(index, str(e)) for index in range(len(events))]
+
+    failures = []
+    for index, ((group, event), result) in enumerate(zip(events, results)):
+        if isinstance(result, Exception):
+            logger.error(
+                f"Error publishing {event.get('type')} to {group}: {str(result)}"
+            )
+            failures.append((index, str(result)))
+    return failures
+
+
+class RealtimeBatchMiddleware:
+    """
+    Send all real-time events produced while handling a request in one batch.
+
+    Events are handed to the sender after the view has returned, once their
+    transactions have committed, instead of one at a time per publish call.
+    The middleware runs natively on both stacks, so async views such as the
+    notification stream stay on the event loop under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        async with abatch():
+            return await self.get_response(request)
@@ -1,3 +1,15 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -5,6 +17,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 from accounts.models import User
 from courses.models import Course
+from api import realtime
+from api.models import OutboxEvent
 
 
 class APITestBase(APITestCase):
@@ -89,3 +103,131 @@ class NotificationAPITests(APITestBase):
         url = reverse("notifications-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class RealtimePublishTests(TestCase):
+    @mock.patch("api.realtime.send_events")
+    def test_batch_sends_committed_events_together(self, send_events):
+        with realtime.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                realtime.publish("group_a", {"type": "first"})
+                realtime.publish("group_b", {"type": "second"})
+            send_events.assert_not_called()
+
+        send_events.assert_called_once_with(
+            [("group_a", {"type": "first"}), ("group_b", {"type": "second"})]
+        )
+
+    @mock.patch("api.realtime.send_events")
+    def test_rolled_back_events_are_not_sent(self, send_events):
+        with realtime.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        realtime.publish("group_a", {"type": "discarded"})
+                        raise ValueError
+                except ValueError:
+                    pass
+                realtime.publish("group_b", {"type": "kept"})
+
+        send_events.assert_called_once_with([("group_b", {"type": "kept"})])
+
+    @mock.patch("api.realtime.send_events", return_value=[])
+    def test_sent_events_leave_the_outbox(self, send_events):
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.publish("group_a", {"type": "first"})
+            self.assertEqual(OutboxEvent.objects.count(), 1)
+            send_events.assert_not_called()
+
+        send_events.assert_called_once_with([("group_a", {"type": "first"})])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @mock.patch("api.realtime.send_events", return_value=[(0, "Connection refused")])
+    def test_failed_events_are_retried_with_backoff(self, send_events):
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.publish("group_a", {"type": "first"})
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.last_error, "Connection refused")
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertEqual(realtime.dispatch_outbox(), (0, 0))
+
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(realtime.dispatch_outbox(), (1, 0))
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 2)
+        self.assertGreaterEqual(
+            event.next_attempt_at - timezone.now(), timedelta(seconds=3)
+        )
+
+        send_events.return_value = []
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(realtime.dispatch_outbox(), (1, 1))
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(REALTIME_DISPATCH_ON_COMMIT=False)
+    @mock.patch("api.realtime.send_events", return_value=[])
+    def test_dispatcher_sends_outbox(self, send_events):
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.publish("group_a", {"type": "first"})
+            realtime.publish("group_b", {"type": "second"})
+        send_events.assert_not_called()
+        OutboxEvent.objects.create(
+            group="group_c", event={"type": "dead"}, attempts=10
+        )
+
+        out = StringIO()
+        call_command("dispatch_outbox", once=True, stdout=out)
+
+        send_events.assert_called_once_with(
+            [("group_a", {"type": "first"}), ("group_b", {"type": "second"})]
+        )
+        self.assertIn("Sent 2 of 2 events", out.getvalue())
+        self.assertEqual(OutboxEvent.objects.get().group, "group_c")
+
+
+@override_settings(REALTIME_SEND_INLINE=False)
+class RealtimeBackgroundSendTests(TransactionTestCase):
+    def test_events_are_sent_after_the_request(self):
+        sent = threading.Event()
+        calling_thread = threading.current_thread()
+
+        def send_events(events):
+            self.assertIsNot(threading.current_thread(), calling_thread)
+            sent.set()
+            return []
+
+        with mock.patch("api.realtime.send_events", side_effect=send_events):
+            with realtime.batch():
+                realtime.publish("group_a", {"type": "first"})
+                self.assertEqual(OutboxEvent.objects.count(), 1)
+            self.assertTrue(sent.wait(5))
+
+        # The sender removes the event from the outbox once it went out
+        for _ in range(50):
+            if not OutboxEvent.objects.exists():
+                break
+            time.sleep(0.1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class RealtimeBatchMiddlewareTests(TransactionTestCase):
+    @mock.patch("api.realtime.send_events", return_value=[])
+    def test_async_requests_are_batched_on_the_event_loop(self, send_events):
+        def publish_events():
+            realtime.publish("group_a", {"type": "first"})
+            realtime.publish("group_b", {"type": "second"})
+
+        async def view(request):
+            await sync_to_async(publish_events)()
+            send_events.assert_not_called()
+            return HttpResponse()
+
+        middleware = realtime.RealtimeBatchMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(None)
+
+        send_events.assert_called_once_with(
+            [("group_a", {"type": "first"}), ("group_b", {"type": "second"})]
+        )
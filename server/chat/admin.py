@@ -1,10 +1,24 @@
 from django.contrib import admin
-from .models import ChatMessage
+from .models import ChatMessage, Conversation
 
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ("sender", "receiver", "content", "file", "is_read", "timestamp")
+    list_display = ("sender", "receiver", "content", "file", "timestamp")
     list_filter = ("sender", "receiver", "timestamp")
     search_fields = ("sender__username", "receiver__username", "content")
     ordering = ("-timestamp",)
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = (
+        "user1",
+        "user2",
+        "last_message_preview",
+        "user1_unread_count",
+        "user2_unread_count",
+        "last_message_at",
+    )
+    search_fields = ("user1__username", "user2__username")
+    ordering = ("-last_message_at",)
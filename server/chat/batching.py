@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import weakref
+from channels.db import database_sync_to_async
+from django.conf import settings
+from .models import ChatMessage
+from .services import create_messages
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """
+    Group-commit buffer for chat messages sent over WebSocket.
+
+    Messages submitted by all consumers running on the same event loop are held
+    for a short window and then inserted together with one bulk INSERT inside a
+    single transaction. On SQLite every commit takes the database write lock and
+    syncs the journal, so committing a batch at once is far cheaper than
+    committing each message on its own.
+
+    Attributes:
+        window (float): Seconds to wait for more messages before flushing
+        max_batch (int): Number of pending messages that triggers an immediate flush
+    """
+
+    def __init__(self, window=0.01, max_batch=100):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []  # (unsaved ChatMessage, Future) pairs
+        self._flush_task = None
+
+    async def submit(self, sender_id, receiver_id, content):
+        """
+        Queue a text message and wait until it has been committed.
+
+        Args:
+            sender_id: ID of the user sending the message
+            receiver_id: ID of the user receiving the message
+            content: Text content of the message
+
+        Returns:
+            ChatMessage: The saved message with its assigned ID and timestamp
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        message = ChatMessage(
+            sender_id=sender_id, receiver_id=receiver_id, content=content
+        )
+        self._pending.append((message, future))
+
+        if len(self._pending) >= self.max_batch:
+            loop.create_task(self.flush())
+        elif self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_after_window())
+
+        return await future
+
+    async def _flush_after_window(self):
+        """Flush whatever is pending once the batching window has passed."""
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """
+        Commit all pending messages and resolve their waiting futures.
+
+        If the commit fails, every message of the batch fails with the same error.
+        """
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            saved = await database_sync_to_async(create_messages)(
+                [message for message, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Error committing chat messages: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for message, (_, future) in zip(saved, batch):
+            if not future.done():
+                future.set_result(message)
+
+
+# One buffer per event loop, since futures and tasks are bound to their loop
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_message_buffer():
+    """
+    Return the message write buffer for the running event loop.
+
+    Returns:
+        MessageWriteBuffer: Buffer configured from CHAT_GROUP_COMMIT_* settings
+    """
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = MessageWriteBuffer(
+            window=getattr(settings, "CHAT_GROUP_COMMIT_WINDOW", 0.01),
+            max_batch=getattr(settings, "CHAT_GROUP_COMMIT_MAX_BATCH", 100),
+        )
+        _buffers[loop] = buffer
+    return buffer
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
@@ -5,6 +6,10 @@ from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
 from asgiref.sync import sync_to_async
+from django.conf import settings
+from .batching import get_message_buffer
+from api.realtime import publish
+from .services import build_message_event, build_read_status, mark_chat_read
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -16,17 +21,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     This consumer handles:
     - WebSocket connections with JWT authentication
+    - Sending text messages (group-committed to the database)
     - Real-time message notifications
     - Read status updates
     - Chat session updates
 
-    All chat operations except read status updates should be performed via HTTP API.
+    File uploads and all other chat operations should be performed via HTTP API.
     """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = None  # Authenticated user
         self.group_name = None  # Channel group name for this user
+        self.known_receivers = set()  # Receiver IDs already checked to exist
+        self.pending_reads = {}  # Chat ID -> scheduled mark-read task
+        self.disconnecting = False  # Set once the socket is closing
 
     async def connect(self):
         """
@@ -72,8 +81,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         Handle WebSocket disconnection.
 
-        Removes user from their chat group when they disconnect.
+        Removes user from their chat group when they disconnect, after letting
+        any scheduled mark-read updates reach the database. Their replies are
+        not sent, since the socket is already closed.
         """
+        self.disconnecting = True
+        if self.pending_reads:
+            await asyncio.gather(*self.pending_reads.values(), return_exceptions=True)
         if self.group_name:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
@@ -94,7 +108,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         Handle incoming WebSocket messages.
 
-        Only processes read status updates. All other operations should use HTTP API.
+        Processes text message sends and read status updates. All other
+        operations should use HTTP API.
         """
         if not self.user:
             return
@@ -103,8 +118,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get("type")
 
-            # WebSocket now only handles read status updates - everything else should use API
-            if message_type == "mark_read":
+            # WebSocket handles text messages and read status updates - everything else should use API
+            if message_type == "send_message":
+                await self.handle_send_message(data)
+            elif message_type == "mark_read":
                 await self.handle_mark_read(data)
             else:
                 logger.warning(
@@ -128,49 +145,167 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 )
             )
 
+    async def handle_send_message(self, data):
+        """
+        Handle sending a text message to another user.
+
+        The message is queued in the shared write buffer and committed together
+        with other messages sent in the same short window. The commit also
+        records the receiver's notification and both session updates in the
+        outbox. Once committed, the sender receives an acknowledgement with the
+        assigned message ID.
+
+        Args:
+            data: Dictionary containing receiver, content and an optional
+                client_id echoed back in the acknowledgement
+        """
+        client_id = data.get("client_id")
+        content = data.get("content")
+        try:
+            receiver_id = int(data.get("receiver"))
+        except (TypeError, ValueError):
+            receiver_id = None
+
+        if not receiver_id or not isinstance(content, str) or not content.strip():
+            await self.send_error("Receiver and content are required", client_id)
+            return
+
+        if receiver_id not in self.known_receivers:
+            if not await self.user_exists(receiver_id):
+                await self.send_error("Receiver not found", client_id)
+                return
+            self.known_receivers.add(receiver_id)
+
+        try:
+            message = await get_message_buffer().submit(
+                self.user.id, receiver_id, content
+            )
+        except Exception as e:
+            logger.error(f"Error sending message: {str(e)}")
+            await self.send_error("Failed to send message", client_id)
+            return
+
+        message_data = build_message_event(message, self.user)
+        await self.send(
+            text_data=json.dumps(
+                {"type": "message_ack", "client_id": client_id, "message": message_data}
+            )
+        )
+
+    async def send_error(self, message, client_id=None):
+        """
+        Send an error frame to the client.
+
+        Args:
+            message: Human-readable error description
+            client_id: Client-supplied ID of the request that failed, if any
+        """
+        await self.send(
+            text_data=json.dumps(
+                {"type": "error", "message": message, "client_id": client_id}
+            )
+        )
+
+    @sync_to_async
+    def user_exists(self, user_id):
+        """
+        Check whether a user exists.
+
+        Args:
+            user_id: ID of the user to look up
+
+        Returns:
+            bool: True if the user exists
+        """
+        return User.objects.filter(id=user_id).exists()
+
     async def handle_mark_read(self, data):
         """
         Handle marking messages as read for a specific chat.
 
+        The database update is scheduled after a short window instead of being
+        run immediately, and further mark-read frames for the same chat arriving
+        within that window are folded into the already scheduled update.
+
         Args:
             data: Dictionary containing chat_id and other relevant information
         """
         try:
-            chat_id = data.get("chat_id")
-            if not chat_id:
-                return
+            chat_id = int(data.get("chat_id"))
+        except (TypeError, ValueError):
+            return
 
-            # Mark messages as read and check if any unread messages remain
-            has_unread, any_unread_sessions = await self.mark_messages_read(chat_id)
+        if chat_id in self.pending_reads:
+            return
 
-            # Send update to the user about read status
-            await self.send(
-                text_data=json.dumps(
-                    {
-                        "type": "read_status_update",
-                        "chat_id": chat_id,
-                        "has_unread": has_unread,
-                        "all_read": not any_unread_sessions,
-                        "any_unread_sessions": any_unread_sessions,
-                    }
-                )
-            )
+        self.pending_reads[chat_id] = asyncio.ensure_future(
+            self.flush_mark_read(chat_id)
+        )
+
+    async def flush_mark_read(self, chat_id):
+        """
+        Run a scheduled mark-read update and report the new read status.
+
+        This socket gets the status as a reply; the user's other sockets get it
+        through their chat group, like after a mark-read over HTTP.
+
+        Args:
+            chat_id: ID of the chat partner whose messages were read
+        """
+        try:
+            await asyncio.sleep(getattr(settings, "CHAT_MARK_READ_WINDOW", 0.25))
+            # Stop coalescing before the update so later frames schedule a new one
+            self.pending_reads.pop(chat_id, None)
+
+            # Mark messages as read and check if any unread messages remain
+            read_status = await self.mark_messages_read(chat_id)
+            if not self.disconnecting:
+                await self.send(text_data=json.dumps(read_status))
 
         except Exception as e:
             logger.error(f"Error marking messages as read: {str(e)}")
-            await self.send(
-                text_data=json.dumps(
-                    {"type": "error", "message": "Failed to mark messages as read"}
+            if not self.disconnecting:
+                await self.send(
+                    text_data=json.dumps(
+                        {"type": "error", "message": "Failed to mark messages as read"}
+                    )
                 )
-            )
+
+    @sync_to_async
+    def mark_messages_read(self, chat_id):
+        """
+        Mark all messages from a chat partner as read and publish the result.
+
+        Args:
+            chat_id: ID of the chat partner
+
+        Returns:
+            dict: The ``read_status_update`` for this user, where any unread
+                sessions come from the conversation unread counters
+        """
+        read_status = build_read_status(chat_id, mark_chat_read(self.user, chat_id))
+        publish(
+            self.group_name,
+            {
+                "type": "chat_message",
+                "message": read_status,
+                "exclude_channel": self.channel_name,
+            },
+        )
+        return read_status
 
     async def chat_message(self, event):
         """
         Handle chat message event from channel layer.
 
+        Events naming this socket in exclude_channel were already sent to it
+        directly and are skipped.
+
         Args:
             event: Dictionary containing message data
         """
+        if event.pop("exclude_channel", None) == self.channel_name:
+            return
         await self.send(text_data=json.dumps(event))
 
     async def notification_message(self, event):
@@ -182,11 +317,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         await self.send(text_data=json.dumps(event))
 
-    async def chat_sessions_updated(self, event):
+    async def chat_session_update(self, event):
         """
-        Notify client that chat sessions have been updated and should be refreshed via API.
+        Send a changed chat session entry so the client can patch its session list.
+
+        Args:
+            event: Dictionary containing the session diff
         """
-        await self.send(text_data=json.dumps({"type": "chat_sessions_updated"}))
+        await self.send(
+            text_data=json.dumps(
+                {"type": "chat_session_update", "session": event["session"]}
+            )
+        )
 
     async def chat_message_notification(self, event):
         """
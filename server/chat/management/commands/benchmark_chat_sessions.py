@@ -0,0 +1,135 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from chat.models import ChatMessage, Conversation
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data."""
+
+
+class Command(BaseCommand):
+    """Measure building the chat session list of a user with many messages.
+
+    Times the three ways of listing a user's chat sessions: the original loop
+    with two queries per chat partner, the single window-function query over
+    the messages table (CHAT_SESSIONS_SOURCE = "messages") and the
+    conversation summaries (the default). The original loop is reproduced
+    here, with its unread check made against the read cursor since messages
+    no longer carry a read flag. All three must return the same list.
+
+    A temporary user with the requested number of messages, spread over the
+    requested number of partners, is created inside a transaction that is
+    rolled back at the end, so the database is left as it was.
+    """
+
+    help = "Benchmark listing the chat sessions of a user with many messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=10000,
+            help="Number of messages sent to or by the user",
+        )
+        parser.add_argument(
+            "--partners",
+            type=int,
+            default=100,
+            help="Number of users the messages are exchanged with",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["messages"], options["partners"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, message_count, partner_count):
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        user = User.objects.create(username=f"{prefix}-user", role="student")
+        partners = User.objects.bulk_create(
+            User(username=f"{prefix}-{i}", first_name="Partner", last_name=str(i))
+            for i in range(partner_count)
+        )
+        messages = ChatMessage.objects.bulk_create(
+            (
+                ChatMessage(
+                    sender=user if i % 3 == 0 else partners[i % partner_count],
+                    receiver=partners[i % partner_count] if i % 3 == 0 else user,
+                    content=f"Benchmark message {i}",
+                )
+                for i in range(message_count)
+            ),
+            batch_size=1000,
+        )
+        Conversation.record_messages(messages)
+        for partner in partners[::2]:
+            Conversation.mark_read(user.id, partner.id)
+
+        results = {}
+        for label, list_sessions in (
+            ("Per-partner loop", self.get_chat_sessions_per_partner),
+            ("Window-function query", ChatMessage.get_chat_sessions_from_messages),
+            ("Conversation summaries", Conversation.get_sessions),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                results[label] = list_sessions(user)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{label} over {message_count} messages with {partner_count} "
+                f"partners: {elapsed * 1000:.1f} ms, {len(queries)} queries"
+            )
+
+        if len({repr(sessions) for sessions in results.values()}) != 1:
+            self.stderr.write("The session lists differ")
+
+    @staticmethod
+    def get_chat_sessions_per_partner(user):
+        """List chat sessions the way the original implementation did."""
+        partners = User.objects.filter(
+            Q(messages_sent__receiver=user) | Q(messages_received__sender=user)
+        ).distinct()
+
+        sessions = []
+        for partner in partners:
+            last_message = (
+                ChatMessage.objects.filter(
+                    Q(sender=user, receiver=partner) | Q(sender=partner, receiver=user)
+                )
+                .order_by("-timestamp", "-id")
+                .first()
+            )
+            read_cursor = Conversation.for_users(user.id, partner.id).values_list(
+                Conversation.last_read_field(min(user.id, partner.id), user.id),
+                flat=True,
+            )
+            has_unread = ChatMessage.objects.filter(
+                sender=partner, receiver=user, id__gt=read_cursor[:1]
+            ).exists()
+            sessions.append(
+                (
+                    last_message.timestamp,
+                    last_message.id,
+                    {
+                        "id": partner.id,
+                        "name": partner.get_full_name() or partner.username,
+                        "last_message": Conversation.build_preview(last_message),
+                        "is_unread": has_unread,
+                    },
+                )
+            )
+
+        sessions.sort(key=lambda session: session[:2], reverse=True)
+        return [session for _, _, session in sessions]
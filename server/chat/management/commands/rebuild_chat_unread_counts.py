@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chat.models import Conversation
+
+
+class Command(BaseCommand):
+    """Recount the chat unread counters from the read cursors.
+
+    The per-participant read cursors (user1_last_read_id and user2_last_read_id)
+    are the source of truth: every partner message above a cursor is unread.
+    The unread counters on Conversation are a derived copy, maintained
+    incrementally so badges can be served without counting messages, and may
+    drift. This command recomputes them from the messages above each
+    participant's read cursor, fixes any that drifted and drops the cached
+    counts of the affected users.
+    """
+
+    help = "Rebuild chat unread counters from the conversation read cursors"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of conversations updated per query",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fixed = 0
+        checked = 0
+        batch = []
+
+        for conversation in Conversation.objects.order_by("id").iterator(
+            chunk_size=batch_size
+        ):
+            checked += 1
+            if conversation.recount_unread():
+                batch.append(conversation)
+            if len(batch) >= batch_size:
+                fixed += self.save_batch(batch)
+                batch = []
+        fixed += self.save_batch(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {checked} conversations, fixed {fixed} unread counters"
+            )
+        )
+
+    def save_batch(self, conversations):
+        """Write corrected counters and invalidate the cached counts.
+
+        Args:
+            conversations (list): Conversations whose counters were recomputed
+
+        Returns:
+            int: Number of conversations saved
+        """
+        if not conversations:
+            return 0
+        with transaction.atomic():
+            Conversation.objects.bulk_update(
+                conversations, ["user1_unread_count", "user2_unread_count"]
+            )
+            Conversation.invalidate_unread_counts(
+                *{c.user1_id for c in conversations},
+                *{c.user2_id for c in conversations},
+            )
+        return len(conversations)
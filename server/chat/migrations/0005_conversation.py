@@ -0,0 +1,218 @@
+# Generated by Django 5.1.3 on 2026-10-17 01:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+PREVIEW_LENGTH = 25
+
+
+def backfill_conversations(apps, schema_editor):
+    """Build one conversation summary per user pair from the existing messages."""
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+    Conversation = apps.get_model("chat", "Conversation")
+
+    conversations = {}
+    for message in ChatMessage.objects.order_by("timestamp", "id").iterator():
+        low, high = sorted((message.sender_id, message.receiver_id))
+        conversation = conversations.get((low, high))
+        if conversation is None:
+            conversation = Conversation(user1_id=low, user2_id=high)
+            conversations[(low, high)] = conversation
+
+        if message.content and len(message.content) > PREVIEW_LENGTH:
+            preview = message.content[:PREVIEW_LENGTH] + "..."
+        else:
+            preview = message.content or "Sent a file"
+        conversation.last_message_id = message.id
+        conversation.last_message_preview = preview
+        conversation.last_message_at = message.timestamp
+
+        if not message.is_read:
+            if message.receiver_id == low:
+                conversation.user1_unread_count += 1
+            else:
+                conversation.user2_unread_count += 1
+
+    Conversation.objects.bulk_create(conversations.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_alter_chatmessage_content"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Conversation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_message_preview",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="Truncated preview of the most recent message",
+                        max_length=28,
+                    ),
+                ),
+                (
+                    "last_message_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="When the most recent message was sent",
+                        null=True,
+                    ),
+                ),
+                (
+                    "user1_unread_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Messages from user2 that user1 has not read",
+                    ),
+                ),
+                (
+                    "user2_unread_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Messages from user1 that user2 has not read",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="content",
+            field=models.TextField(
+                blank=True, help_text="Text content of the message", null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                help_text="Optional file attachment",
+                null=True,
+                upload_to="chat_files/",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="is_read",
+            field=models.BooleanField(
+                default=False,
+                help_text="Whether the message has been read by the receiver",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="receiver",
+            field=models.ForeignKey(
+                help_text="User who received the message",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="messages_received",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="sender",
+            field=models.ForeignKey(
+                help_text="User who sent the message",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="messages_sent",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="timestamp",
+            field=models.DateTimeField(
+                auto_now_add=True, help_text="When the message was sent"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["sender", "receiver", "timestamp"],
+                name="chat_chatme_sender__f1d558_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["receiver", "is_read"], name="chat_chatme_receive_d79e66_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Most recent message in the conversation",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="chat.chatmessage",
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="user1",
+            field=models.ForeignKey(
+                help_text="Participant with the lower user ID",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="conversations_as_user1",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="user2",
+            field=models.ForeignKey(
+                help_text="Participant with the higher user ID",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="conversations_as_user2",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(
+                fields=["user1", "-last_message_at"],
+                name="chat_conver_user1_i_f8c227_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(
+                fields=["user2", "-last_message_at"],
+                name="chat_conver_user2_i_c1038a_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="conversation",
+            constraint=models.UniqueConstraint(
+                fields=("user1", "user2"), name="unique_conversation_pair"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="conversation",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("user1__lte", models.F("user2"))),
+                name="conversation_users_ordered",
+            ),
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-17 01:12
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_conversation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="updated_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="When the summary or read state last changed",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(
+                fields=["user1", "updated_at"], name="chat_conver_user1_i_e22731_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(
+                fields=["user2", "updated_at"], name="chat_conver_user2_i_488c22_idx"
+            ),
+        ),
+    ]
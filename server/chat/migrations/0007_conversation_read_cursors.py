@@ -0,0 +1,79 @@
+# Generated by Django 5.1.3 on 2026-10-17 01:19
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def migrate_read_flags(apps, schema_editor):
+    """Convert per-message is_read flags into per-participant read cursors.
+
+    Each participant's cursor is placed just below their oldest unread message,
+    or on the newest message they received when everything was read, so no unread
+    message is lost. Unread counters are then recounted from the cursors.
+    """
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+    Conversation = apps.get_model("chat", "Conversation")
+
+    for conversation in Conversation.objects.iterator():
+        for side, reader_id, partner_id in (
+            ("user1", conversation.user1_id, conversation.user2_id),
+            ("user2", conversation.user2_id, conversation.user1_id),
+        ):
+            received = ChatMessage.objects.filter(
+                sender_id=partner_id, receiver_id=reader_id
+            )
+            first_unread = received.filter(is_read=False).aggregate(Min("id"))[
+                "id__min"
+            ]
+            if first_unread is None:
+                last_read = received.aggregate(Max("id"))["id__max"] or 0
+            else:
+                last_read = first_unread - 1
+
+            setattr(conversation, f"{side}_last_read_id", last_read)
+            setattr(
+                conversation,
+                f"{side}_unread_count",
+                received.filter(id__gt=last_read).count(),
+            )
+        conversation.save(
+            update_fields=[
+                "user1_last_read_id",
+                "user2_last_read_id",
+                "user1_unread_count",
+                "user2_unread_count",
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_conversation_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="user1_last_read_id",
+            field=models.PositiveBigIntegerField(
+                default=0, help_text="Highest message ID user1 has read"
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="user2_last_read_id",
+            field=models.PositiveBigIntegerField(
+                default=0, help_text="Highest message ID user2 has read"
+            ),
+        ),
+        migrations.RunPython(migrate_read_flags, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="chatmessage",
+            name="chat_chatme_receive_d79e66_idx",
+        ),
+        migrations.RemoveField(
+            model_name="chatmessage",
+            name="is_read",
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
-from django.db.models import Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
 from accounts.models import User
 
 
@@ -7,8 +11,9 @@ class ChatMessage(models.Model):
     """Model representing a chat message between two users.
 
     This model stores chat messages exchanged between users in the e-learning platform.
-    Messages can contain text content and/or file attachments. Each message tracks its
-    read status to support real-time chat notifications.
+    Messages can contain text content and/or file attachments. Read status is not
+    stored per message: each participant has a read cursor on the Conversation, and
+    every message with a higher ID from the partner is unread.
 
     Attributes:
         sender (User): User who sent the message
@@ -16,7 +21,6 @@ class ChatMessage(models.Model):
         content (str, optional): Text content of the message
         file (File, optional): Attached file, if any
         timestamp (datetime): When the message was sent
-        is_read (bool): Whether the message has been read by the receiver
     """
 
     # User relationships
@@ -48,20 +52,28 @@ class ChatMessage(models.Model):
     timestamp = models.DateTimeField(
         auto_now_add=True, help_text="When the message was sent"
     )
-    is_read = models.BooleanField(
-        default=False, help_text="Whether the message has been read by the receiver"
-    )
 
     class Meta:
         indexes = [
             models.Index(fields=["sender", "receiver", "timestamp"]),
-            models.Index(fields=["receiver", "is_read"]),
         ]
 
     def __str__(self):
         """Return a string representation of the message."""
         return f"Message from {self.sender.get_full_name()} to {self.receiver.get_full_name()}"
 
+    def save(self, *args, **kwargs):
+        """Save the message and keep its conversation summary in sync.
+
+        New messages update the denormalized Conversation row inside the same
+        transaction, so the session list never sees a message without its summary.
+        """
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                Conversation.record_message(self)
+
     @classmethod
     def get_chat_messages(cls, user1, user2):
         """Get messages exchanged between two users.
@@ -78,11 +90,17 @@ class ChatMessage(models.Model):
         )
 
     @classmethod
-    def get_chat_sessions(cls, user):
+    def get_chat_sessions(cls, user, source=None):
         """Get all chat sessions for a user with their latest messages and unread status.
 
+        Sessions are read from the Conversation summaries by default. Passing
+        ``source="messages"`` (or setting ``CHAT_SESSIONS_SOURCE``) computes them
+        directly from the messages table instead, which is useful as a fallback
+        while summaries are being rebuilt.
+
         Args:
             user (User): The user to get chat sessions for
+            source (str, optional): Either "conversations" or "messages"
 
         Returns:
             List[dict]: A list of dictionaries with chat session information including:
@@ -91,57 +109,474 @@ class ChatMessage(models.Model):
                 - last_message: Content of the last message or 'Sent a file'
                 - is_unread: Whether there are unread messages from this partner
         """
-        # Get unique chat partners
-        chat_partners = User.objects.filter(
-            Q(messages_sent__receiver=user) | Q(messages_received__sender=user)
-        ).distinct()
-
-        chat_sessions = []
-        for partner in chat_partners:
-            # Get the latest message
-            latest_message = (
-                cls.objects.filter(
-                    Q(sender=user, receiver=partner) | Q(sender=partner, receiver=user)
-                )
-                .order_by("-timestamp")
-                .first()
+        source = source or getattr(settings, "CHAT_SESSIONS_SOURCE", "conversations")
+        if source == "messages":
+            return cls.get_chat_sessions_from_messages(user)
+        return Conversation.get_sessions(user)
+
+    @classmethod
+    def get_chat_sessions_from_messages(cls, user):
+        """Compute the chat session list from the messages table in one query.
+
+        The chat partner is derived with a CASE on sender/receiver, ROW_NUMBER()
+        picks the latest message per partner and a windowed conditional sum counts
+        the received messages past the user's read cursor, so the whole list is a
+        single SQL statement.
+
+        Args:
+            user (User): The user to get chat sessions for
+
+        Returns:
+            List[dict]: Same shape as Conversation.get_sessions
+        """
+
+        def partner_field(field):
+            return Case(
+                When(sender=user, then=F(f"receiver__{field}")),
+                default=F(f"sender__{field}"),
             )
 
-            # Check for unread messages
-            has_unread = cls.objects.filter(
-                sender=partner, receiver=user, is_read=False
-            ).exists()
-
-            # Add timestamp for sorting
-            timestamp = latest_message.timestamp if latest_message else None
-
-            chat_sessions.append(
-                {
-                    "id": partner.id,
-                    "name": partner.get_full_name() or partner.username,
-                    "last_message": (
-                        latest_message.content[:25] + "..."
-                        if latest_message.content and len(latest_message.content) > 25
-                        else (
-                            (latest_message.content or "Sent a file")
-                            if latest_message
-                            else ""
+        partner = partner_field("id")
+        read_cursor = Subquery(
+            Conversation.objects.filter(
+                Q(user1=user, user2=OuterRef("partner_id"))
+                | Q(user2=user, user1=OuterRef("partner_id"))
+            ).values(
+                cursor=Case(
+                    When(user1=user, then=F("user1_last_read_id")),
+                    default=F("user2_last_read_id"),
+                )
+            )[
+                :1
+            ]
+        )
+        latest_messages = (
+            cls.objects.filter(Q(sender=user) | Q(receiver=user))
+            .annotate(partner_id=partner)
+            .annotate(
+                read_cursor=Coalesce(read_cursor, Value(0)),
+                partner_username=partner_field("username"),
+                partner_first_name=partner_field("first_name"),
+                partner_last_name=partner_field("last_name"),
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=[partner],
+                    order_by=[F("timestamp").desc(), F("id").desc()],
+                ),
+                unread_count=Window(
+                    Sum(
+                        Case(
+                            When(
+                                receiver=user,
+                                id__gt=F("read_cursor"),
+                                then=Value(1),
+                            ),
+                            default=Value(0),
                         )
                     ),
-                    "is_unread": has_unread,
-                    "_timestamp": timestamp,  # Internal field for sorting
-                }
+                    partition_by=[partner],
+                ),
+            )
+            .filter(row_number=1)
+            .order_by("-timestamp", "-id")
+        )
+
+        return [
+            {
+                "id": message.partner_id,
+                "name": f"{message.partner_first_name} {message.partner_last_name}".strip()
+                or message.partner_username,
+                "last_message": Conversation.build_preview(message),
+                "is_unread": message.unread_count > 0,
+            }
+            for message in latest_messages
+        ]
+
+
+class Conversation(models.Model):
+    """Denormalized summary of the chat between a pair of users.
+
+    One row exists per user pair and is updated whenever a message is sent or a
+    chat is marked as read, so listing chat sessions is a single indexed read
+    instead of one query per chat partner. The pair is stored in a canonical
+    order (user1.id <= user2.id, equal for a self-chat).
+
+    Attributes:
+        user1 (User): Participant with the lower user ID
+        user2 (User): Participant with the higher user ID
+        last_message (ChatMessage, optional): Most recent message in the conversation
+        last_message_preview (str): Truncated preview of the most recent message
+        last_message_at (datetime, optional): When the most recent message was sent
+        user1_unread_count (int): Messages from user2 that user1 has not read
+        user2_unread_count (int): Messages from user1 that user2 has not read
+        user1_last_read_id (int): Highest message ID user1 has read
+        user2_last_read_id (int): Highest message ID user2 has read
+        updated_at (datetime): When the summary or read state last changed
+    """
+
+    PREVIEW_LENGTH = 25
+
+    # Participants, stored in canonical order
+    user1 = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="conversations_as_user1",
+        help_text="Participant with the lower user ID",
+    )
+    user2 = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="conversations_as_user2",
+        help_text="Participant with the higher user ID",
+    )
+
+    # Latest message summary
+    last_message = models.ForeignKey(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="Most recent message in the conversation",
+    )
+    last_message_preview = models.CharField(
+        max_length=PREVIEW_LENGTH + 3,
+        blank=True,
+        default="",
+        help_text="Truncated preview of the most recent message",
+    )
+    last_message_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the most recent message was sent"
+    )
+
+    # Per-participant unread counters
+    user1_unread_count = models.PositiveIntegerField(
+        default=0, help_text="Messages from user2 that user1 has not read"
+    )
+    user2_unread_count = models.PositiveIntegerField(
+        default=0, help_text="Messages from user1 that user2 has not read"
+    )
+
+    # Per-participant read cursors; every partner message above a cursor is unread
+    user1_last_read_id = models.PositiveBigIntegerField(
+        default=0, help_text="Highest message ID user1 has read"
+    )
+    user2_last_read_id = models.PositiveBigIntegerField(
+        default=0, help_text="Highest message ID user2 has read"
+    )
+
+    # Change tracking for reconnect sync
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the summary or read state last changed",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user1", "user2"], name="unique_conversation_pair"
+            ),
+            models.CheckConstraint(
+                condition=Q(user1__lte=F("user2")),
+                name="conversation_users_ordered",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user1", "-last_message_at"]),
+            models.Index(fields=["user2", "-last_message_at"]),
+            models.Index(fields=["user1", "updated_at"]),
+            models.Index(fields=["user2", "updated_at"]),
+        ]
+
+    def __str__(self):
+        """Return a string representation of the conversation."""
+        return f"Conversation between {self.user1.username} and {self.user2.username}"
+
+    @staticmethod
+    def ordered_pair(user1_id, user2_id):
+        """Return two user IDs in the canonical (lower, higher) order."""
+        return (user1_id, user2_id) if user1_id < user2_id else (user2_id, user1_id)
+
+    @classmethod
+    def for_users(cls, user1_id, user2_id):
+        """Return a queryset matching the conversation between two users."""
+        low, high = cls.ordered_pair(user1_id, user2_id)
+        return cls.objects.filter(user1_id=low, user2_id=high)
+
+    @classmethod
+    def for_user(cls, user):
+        """Return a queryset of every conversation the user takes part in."""
+        return cls.objects.filter(Q(user1=user) | Q(user2=user))
+
+    @staticmethod
+    def unread_field(conversation_user1_id, user_id):
+        """Return the name of the unread counter that belongs to ``user_id``."""
+        if user_id == conversation_user1_id:
+            return "user1_unread_count"
+        return "user2_unread_count"
+
+    @staticmethod
+    def last_read_field(conversation_user1_id, user_id):
+        """Return the name of the read cursor that belongs to ``user_id``."""
+        if user_id == conversation_user1_id:
+            return "user1_last_read_id"
+        return "user2_last_read_id"
+
+    def get_partner_id(self, user_id):
+        """Return the ID of the other participant."""
+        return self.user2_id if user_id == self.user1_id else self.user1_id
+
+    def get_unread_count(self, user_id):
+        """Return how many messages ``user_id`` has not read in this conversation."""
+        return getattr(self, self.unread_field(self.user1_id, user_id))
+
+    def get_last_read_id(self, user_id):
+        """Return the highest message ID ``user_id`` has read in this conversation."""
+        return getattr(self, self.last_read_field(self.user1_id, user_id))
+
+    @classmethod
+    def build_preview(cls, message):
+        """Build the session list preview for a message.
+
+        Args:
+            message (ChatMessage): The message to summarize
+
+        Returns:
+            str: The first characters of the content, or 'Sent a file'
+        """
+        if message.content and len(message.content) > cls.PREVIEW_LENGTH:
+            return message.content[: cls.PREVIEW_LENGTH] + "..."
+        return message.content or "Sent a file"
+
+    @classmethod
+    def record_message(cls, message):
+        """Update the conversation summary for a newly saved message.
+
+        Creates the conversation on first contact, then moves the latest message
+        pointer forward and increments the receiver's unread counter.
+
+        Args:
+            message (ChatMessage): The message that was just saved
+        """
+        cls.record_messages([message])
+
+    @classmethod
+    def record_messages(cls, messages):
+        """Update conversation summaries for a batch of newly saved messages.
+
+        Messages are grouped per user pair so each affected conversation is
+        updated once, no matter how many of its messages are in the batch.
+
+        Args:
+            messages (List[ChatMessage]): Saved messages, oldest first
+        """
+        changes = {}
+        for message in messages:
+            pair = cls.ordered_pair(message.sender_id, message.receiver_id)
+            change = changes.setdefault(pair, {"last": None, "unread": {}})
+            change["last"] = message
+            unread = change["unread"]
+            unread[message.receiver_id] = unread.get(message.receiver_id, 0) + 1
+
+        now = timezone.now()
+        receiver_ids = set()
+        for (low, high), change in changes.items():
+            cls.objects.get_or_create(user1_id=low, user2_id=high)
+            last_message = change["last"]
+            counters = {}
+            for receiver_id, count in change["unread"].items():
+                unread_field = cls.unread_field(low, receiver_id)
+                counters[unread_field] = F(unread_field) + count
+                receiver_ids.add(receiver_id)
+            cls.objects.filter(user1_id=low, user2_id=high).update(
+                last_message=last_message,
+                last_message_preview=cls.build_preview(last_message),
+                last_message_at=last_message.timestamp,
+                updated_at=now,
+                **counters,
             )
 
-        # Sort by timestamp (newest first) and remove the temporary _timestamp field
-        sorted_sessions = sorted(
-            chat_sessions,
-            key=lambda x: x["_timestamp"] or datetime.datetime.min,
-            reverse=True,
+        cls.invalidate_unread_counts(*receiver_ids)
+
+    @classmethod
+    def mark_read(cls, reader_id, partner_id):
+        """Move the reader's read cursor to the latest message of the conversation.
+
+        Marking a chat as read is a single-row update of the cursor and the
+        unread counter, however many messages were unread.
+
+        Args:
+            reader_id (int): ID of the user who read the messages
+            partner_id (int): ID of the user whose messages were read
+        """
+        low, high = cls.ordered_pair(reader_id, partner_id)
+        cls.objects.filter(user1_id=low, user2_id=high).update(
+            updated_at=timezone.now(),
+            **{
+                cls.last_read_field(low, reader_id): Coalesce(
+                    F("last_message_id"), Value(0)
+                ),
+                cls.unread_field(low, reader_id): 0,
+            },
         )
+        cls.invalidate_unread_counts(reader_id)
 
-        for session in sorted_sessions:
-            if "_timestamp" in session:
-                del session["_timestamp"]
+    @classmethod
+    def has_unread(cls, user):
+        """Check the unread counters for any conversation with unread messages.
+
+        Args:
+            user (User): The user to check
 
-        return sorted_sessions
+        Returns:
+            bool: True if the user has unread messages in any conversation
+        """
+        return bool(cls.get_unread_counts(user.id))
+
+    @staticmethod
+    def unread_cache_key(user_id):
+        """Return the cache key holding a user's unread counts."""
+        return f"chat:unread:{user_id}"
+
+    @classmethod
+    def get_unread_counts(cls, user_id):
+        """Get a user's unread message counts per chat partner.
+
+        Counts are served from the cache and loaded from the conversation
+        counters on a miss, so badge polling never reads the messages table.
+
+        Args:
+            user_id (int): The user to get counts for
+
+        Returns:
+            dict: Chat partner ID -> number of unread messages, non-zero only
+        """
+        key = cls.unread_cache_key(user_id)
+        counts = cache.get(key)
+        if counts is None:
+            counts = cls.load_unread_counts(user_id)
+            cache.set(
+                key, counts, getattr(settings, "CHAT_UNREAD_CACHE_TIMEOUT", 86400)
+            )
+        return counts
+
+    @classmethod
+    def load_unread_counts(cls, user_id):
+        """Read a user's non-zero unread counters from the database.
+
+        Args:
+            user_id (int): The user to get counts for
+
+        Returns:
+            dict: Chat partner ID -> number of unread messages
+        """
+        rows = cls.objects.filter(
+            Q(user1_id=user_id, user1_unread_count__gt=0)
+            | Q(user2_id=user_id, user2_unread_count__gt=0)
+        ).values_list(
+            "user1_id", "user2_id", "user1_unread_count", "user2_unread_count"
+        )
+
+        counts = {}
+        for user1_id, user2_id, user1_unread, user2_unread in rows:
+            if user1_id == user_id:
+                if user1_unread:
+                    counts[user2_id] = user1_unread
+            elif user2_unread:
+                counts[user1_id] = user2_unread
+        return counts
+
+    @classmethod
+    def invalidate_unread_counts(cls, *user_ids):
+        """Drop cached unread counts after the counters changed.
+
+        The entries are dropped right away and again once the transaction
+        commits, so a read racing with the write cannot leave stale counts behind.
+
+        Args:
+            *user_ids (int): Users whose counters changed
+        """
+        keys = [cls.unread_cache_key(user_id) for user_id in user_ids]
+        if not keys:
+            return
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def recount_unread(self):
+        """Recompute both unread counters from the read cursors.
+
+        Returns:
+            bool: True if either counter was wrong and has been corrected
+        """
+        user1_unread = ChatMessage.objects.filter(
+            sender_id=self.user2_id,
+            receiver_id=self.user1_id,
+            id__gt=self.user1_last_read_id,
+        ).count()
+        user2_unread = ChatMessage.objects.filter(
+            sender_id=self.user1_id,
+            receiver_id=self.user2_id,
+            id__gt=self.user2_last_read_id,
+        ).count()
+
+        changed = (user1_unread, user2_unread) != (
+            self.user1_unread_count,
+            self.user2_unread_count,
+        )
+        self.user1_unread_count = user1_unread
+        self.user2_unread_count = user2_unread
+        return changed
+
+    @classmethod
+    def get_sessions(cls, user):
+        """Get the chat session list for a user from the conversation summaries.
+
+        Args:
+            user (User): The user to get chat sessions for
+
+        Returns:
+            List[dict]: Chat sessions ordered by latest message (newest first)
+        """
+        conversations = (
+            cls.for_user(user)
+            .select_related("user1", "user2")
+            .order_by(F("last_message_at").desc(nulls_last=True))
+        )
+
+        return [conversation.to_session(user.id) for conversation in conversations]
+
+    def to_session(self, user_id):
+        """Build the chat session list entry for one participant.
+
+        Args:
+            user_id (int): The participant viewing the session
+
+        Returns:
+            dict: Session with the partner's ID and name, preview and unread flag
+        """
+        partner = self.user2 if self.user1_id == user_id else self.user1
+        return {
+            "id": partner.id,
+            "name": partner.get_full_name() or partner.username,
+            "last_message": self.last_message_preview,
+            "is_unread": self.get_unread_count(user_id) > 0,
+        }
+
+    def to_session_update(self, user_id):
+        """Build the session diff pushed to a participant after a change.
+
+        Extends the session list entry with the last message time and the exact
+        unread count, so clients can patch their list without refetching it.
+
+        Args:
+            user_id (int): The participant receiving the update
+
+        Returns:
+            dict: Session list entry plus last_message_at and unread_count
+        """
+        session = self.to_session(user_id)
+        session["last_message_at"] = (
+            self.last_message_at.isoformat() if self.last_message_at else None
+        )
+        session["unread_count"] = self.get_unread_count(user_id)
+        return session
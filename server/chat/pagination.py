@@ -0,0 +1,15 @@
+from api.pagination import KeysetPagination
+
+
+class ChatHistoryPagination(KeysetPagination):
+    """Keyset pagination for the message history between two users.
+
+    Pages are keyed on (timestamp, id), which lines up with the
+    (sender, receiver, timestamp) index, and each page is returned oldest first
+    so clients can prepend older pages while scrolling back.
+    """
+
+    ordering_field = "timestamp"
+    page_size = 50
+    max_page_size = 200
+    ascending_results = True
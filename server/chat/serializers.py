@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.urls import reverse
+from uploads.derivatives import get_derivative_urls
+from uploads.serializers import CompletedUploadField
+from uploads.signing import signed_media_url
 from .models import ChatMessage
 
 
@@ -13,13 +16,15 @@ class ChatFileSerializer(serializers.Serializer):
         id (int): The ID of the chat message containing the file
         type (str): The file extension/type (e.g., 'pdf', 'jpg')
         title (str): The original filename
-        url (str): The absolute URL to access the file
+        url (str): The signed, expiring URL to download the file
+        thumbnails (dict): Signed URLs of generated thumbnails by size, once ready
     """
     
     id = serializers.IntegerField()
     type = serializers.SerializerMethodField()
     title = serializers.SerializerMethodField()
     url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
 
     def get_type(self, obj):
         """Extract the file type from the filename."""
@@ -34,16 +39,21 @@ class ChatFileSerializer(serializers.Serializer):
         return None
 
     def get_url(self, obj):
-        """Generate the absolute URL for the file.
+        """Generate a signed, expiring URL for the file.
         
         Uses the request context to build an absolute URI if available,
         otherwise falls back to the relative URL.
         """
         if obj.file:
-            request = self.context.get('request')
-            return request.build_absolute_uri(obj.file.url) if request else obj.file.url
+            return signed_media_url(obj.file.name, self.context.get('request'))
         return None
 
+    def get_thumbnails(self, obj):
+        """Get signed URLs of the image thumbnails that have been generated."""
+        if obj.file:
+            return get_derivative_urls(obj.file.name, 'thumbnail', self.context.get('request'))
+        return {}
+
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     """Serializer for chat messages.
@@ -58,10 +68,12 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     Attributes:
         isSender (bool): Whether the current user is the sender of the message
         file (ChatFileSerializer): Nested serializer for file attachments
+        upload_id (UUID): Write-only ID of a finished chunked upload to attach
     """
     
     isSender = serializers.SerializerMethodField()
     file = ChatFileSerializer(source='*', read_only=True)
+    upload_id = CompletedUploadField(source='upload')
 
     def get_isSender(self, obj):
         """Determine if the current user is the sender of the message."""
@@ -74,7 +86,7 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         """Validate that either message content or file is provided.
         
         This ensures that empty messages cannot be sent, requiring either
-        text content or a file attachment.
+        text content or a file attachment, sent directly or as a finished upload.
         
         Args:
             data: The data to validate
@@ -85,11 +97,35 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         Raises:
             ValidationError: If neither content nor file is provided
         """
-        if not data.get('content') and not self.context['request'].FILES.get('file'):
+        has_file = self.context['request'].FILES.get('file') or data.get('upload')
+        if not data.get('content') and not has_file:
             raise serializers.ValidationError("Either content or file must be provided")
         return data
 
     class Meta:
         model = ChatMessage
-        fields = ['id', 'isSender', 'content', 'timestamp', 'file']
+        fields = ['id', 'isSender', 'content', 'timestamp', 'file', 'upload_id']
         read_only_fields = ['id', 'timestamp']
+
+
+class ChatSyncMessageSerializer(ChatMessageSerializer):
+    """Serializer for messages returned by the reconnect sync endpoint.
+    
+    Sync responses span all of a user's chats, so each message also carries the
+    ID of the chat partner it belongs to.
+    
+    Attributes:
+        chat_id (int): The ID of the other participant in the conversation
+    """
+    
+    chat_id = serializers.SerializerMethodField()
+
+    def get_chat_id(self, obj):
+        """Return the ID of the chat partner from the current user's point of view."""
+        request = self.context.get('request')
+        if request and obj.sender_id == request.user.id:
+            return obj.receiver_id
+        return obj.sender_id
+
+    class Meta(ChatMessageSerializer.Meta):
+        fields = ChatMessageSerializer.Meta.fields + ['chat_id']
@@ -1,6 +1,11 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+import base64
+from datetime import datetime
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from api.realtime import publish, publish_many
+from uploads.signing import signed_media_url
+from .models import ChatMessage, Conversation
 import logging
 
 User = get_user_model()
@@ -24,14 +29,11 @@ def notify_new_message(sender, receiver, content=None):
         if not content:
             content = f"You received a new message from {sender_name}"
 
-        # Get channel layer
-        channel_layer = get_channel_layer()
-
         # Send to receiver's chat channel
         receiver_group = f"user_{receiver.id}_chat"
 
-        # Send notification via WebSocket
-        async_to_sync(channel_layer.group_send)(
+        # Send notification via WebSocket once the current transaction commits
+        publish(
             receiver_group,
             {
                 "type": "notification_message",
@@ -45,3 +47,255 @@ def notify_new_message(sender, receiver, content=None):
         )
     except Exception as e:
         logger.error(f"Error sending chat notification: {str(e)}")
+
+
+def build_message_event(message, sender):
+    """
+    Build the WebSocket payload describing a chat message
+
+    Args:
+        message: The saved chat message
+        sender: User who sent the message
+
+    Returns:
+        dict: Message data as pushed to chat clients
+    """
+    file_data = None
+    if message.file and message.file.name:
+        file_data = {
+            "id": message.id,
+            "title": message.file.name.split("/")[-1],
+            "url": signed_media_url(message.file.name),
+        }
+
+    return {
+        "id": message.id,
+        "sender_id": sender.id,
+        "sender_name": sender.get_full_name() or sender.username,
+        "receiver_id": message.receiver_id,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat(),
+        "file": file_data,
+    }
+
+
+def build_read_status(chat_id, any_unread_sessions):
+    """
+    Build the read status a user's clients show after a chat was read
+
+    Args:
+        chat_id: ID of the chat partner whose messages were read
+        any_unread_sessions: Whether any other chat still has unread messages
+
+    Returns:
+        dict: ``read_status_update`` payload
+    """
+    return {
+        "type": "read_status_update",
+        "chat_id": chat_id,
+        "has_unread": False,
+        "all_read": not any_unread_sessions,
+        "any_unread_sessions": any_unread_sessions,
+    }
+
+
+def build_session_updates(user_a_id, user_b_id):
+    """
+    Build the session diffs for both participants of a conversation
+
+    Args:
+        user_a_id: ID of one participant
+        user_b_id: ID of the other participant
+
+    Returns:
+        list: (user_id, event) pairs with a ``chat_session_update`` event per participant
+    """
+    conversation = (
+        Conversation.for_users(user_a_id, user_b_id)
+        .select_related("user1", "user2")
+        .get()
+    )
+    return [
+        (
+            user_id,
+            {
+                "type": "chat_session_update",
+                "session": conversation.to_session_update(user_id),
+            },
+        )
+        for user_id in {user_a_id, user_b_id}
+    ]
+
+
+def build_message_events(messages):
+    """
+    Build the WebSocket events announcing a batch of new messages
+
+    Each receiver gets a ``chat_message_notification`` per message, and both
+    participants of every affected conversation get one session update.
+
+    Args:
+        messages: Saved chat messages, oldest first
+
+    Returns:
+        list: (group, event) pairs ready for publish_many
+    """
+    senders = User.objects.in_bulk({message.sender_id for message in messages})
+    events = [
+        (
+            f"user_{message.receiver_id}_chat",
+            {
+                "type": "chat_message_notification",
+                "message": build_message_event(message, senders[message.sender_id]),
+            },
+        )
+        for message in messages
+    ]
+    pairs = dict.fromkeys(
+        Conversation.ordered_pair(message.sender_id, message.receiver_id)
+        for message in messages
+    )
+    for pair in pairs:
+        for user_id, event in build_session_updates(*pair):
+            events.append((f"user_{user_id}_chat", event))
+    return events
+
+
+def create_messages(messages):
+    """
+    Insert a batch of unsaved chat messages as a single group commit
+
+    All messages are written with one bulk INSERT, and their conversation
+    summaries and WebSocket events are recorded in the same transaction, so
+    the events go out through the outbox once the batch has committed.
+
+    Args:
+        messages: Unsaved ChatMessage instances, in send order
+
+    Returns:
+        list: The saved messages with their assigned IDs and timestamps
+    """
+    with transaction.atomic():
+        created = ChatMessage.objects.bulk_create(messages)
+        Conversation.record_messages(created)
+        publish_many(build_message_events(created))
+    return created
+
+
+def mark_chat_read(user, partner_id):
+    """
+    Mark every message from a chat partner as read
+
+    Args:
+        user: User who read the messages
+        partner_id: ID of the user whose messages were read
+
+    Returns:
+        bool: Whether the user still has unread messages in any other chat
+    """
+    Conversation.mark_read(user.id, partner_id)
+    return Conversation.has_unread(user)
+
+
+def encode_sync_cursor(last_message_id, changed_since, last_conversation_id=0):
+    """
+    Encode a reconnect sync position as an opaque cursor
+
+    Args:
+        last_message_id: ID of the newest message the client has received
+        changed_since: Time up to which read-state changes have been delivered
+        last_conversation_id: ID of the last conversation delivered with
+            updated_at equal to changed_since, or 0 if all of them were
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = f"{last_message_id}|{changed_since.isoformat()}|{last_conversation_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor):
+    """
+    Decode a cursor produced by encode_sync_cursor
+
+    Args:
+        cursor: Cursor string sent by the client
+
+    Returns:
+        tuple: (last_message_id, changed_since, last_conversation_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        parts = base64.urlsafe_b64decode(padded).decode().split("|")
+    except UnicodeDecodeError as e:
+        raise ValueError("Invalid cursor") from e
+    # Cursors issued before read states were paged have no conversation ID
+    if len(parts) == 2:
+        parts.append("0")
+    last_message_id, changed_since, last_conversation_id = parts
+    return (
+        int(last_message_id),
+        datetime.fromisoformat(changed_since),
+        int(last_conversation_id),
+    )
+
+
+def get_chat_changes(user, since_id, changed_since, limit, after_conversation_id=0):
+    """
+    Collect one page of what changed in a user's chats since a sync position
+
+    Both messages and read states are capped at limit. Read states are paged
+    on (updated_at, id), so a conversation that changes again while the
+    client is paging moves to a later page instead of being skipped.
+
+    Args:
+        user: User who is resynchronizing
+        since_id: Only messages with a higher ID are returned
+        changed_since: Only conversations whose read state changed later are
+            returned, or None to start from the oldest change
+        limit: Maximum number of messages and of read states to return
+        after_conversation_id: Also return conversations changed exactly at
+            changed_since with a higher ID, to resume a page cut between them
+
+    Returns:
+        tuple: (messages, read_states, has_more, read_position) where messages
+            are in ID order, read_states are dicts with the chat partner ID, the
+            unread count and both participants' read cursors, and
+            read_position is the (updated_at, id) of the last read state
+            returned if more are pending, otherwise None
+    """
+    messages = list(
+        ChatMessage.objects.filter(
+            Q(sender=user) | Q(receiver=user), id__gt=since_id
+        ).order_by("id")[: limit + 1]
+    )
+
+    conversations = Conversation.for_user(user)
+    if changed_since is not None:
+        changed = Q(updated_at__gt=changed_since)
+        if after_conversation_id:
+            changed |= Q(updated_at=changed_since, id__gt=after_conversation_id)
+        conversations = conversations.filter(changed)
+    conversations = list(conversations.order_by("updated_at", "id")[: limit + 1])
+
+    read_position = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        read_position = (conversations[-1].updated_at, conversations[-1].id)
+
+    read_states = []
+    for conversation in conversations:
+        partner_id = conversation.get_partner_id(user.id)
+        read_states.append(
+            {
+                "chat_id": partner_id,
+                "unread_count": conversation.get_unread_count(user.id),
+                "last_read_id": conversation.get_last_read_id(user.id),
+                "partner_last_read_id": conversation.get_last_read_id(partner_id),
+            }
+        )
+    has_more = len(messages) > limit or read_position is not None
+    return messages[:limit], read_states, has_more, read_position
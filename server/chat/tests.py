@@ -1,8 +1,12 @@
+import asyncio
 import json
 import tempfile
 from datetime import datetime
+from io import StringIO
+from unittest import mock
 from channels.testing import WebsocketCommunicator
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
@@ -11,10 +15,12 @@ from channels.layers import get_channel_layer
 from channels.db import database_sync_to_async
 from asgiref.sync import sync_to_async
 from channels.testing import WebsocketCommunicator
+from api.models import OutboxEvent
+from .batching import MessageWriteBuffer
 from .consumers import ChatConsumer
-from .models import ChatMessage
+from .models import ChatMessage, Conversation
 from .serializers import ChatMessageSerializer
-from .services import notify_new_message
+from .services import build_session_updates, create_messages, notify_new_message
 
 User = get_user_model()
 
@@ -52,6 +58,103 @@ class ChatMessageAPITestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 2)  # Should have two messages
 
+    def test_get_chat_history_pages(self):
+        """Test walking back through chat history with keyset cursors"""
+        for i in range(3):
+            ChatMessage.objects.create(
+                sender=self.user1, receiver=self.user2, content=f"Message {i}"
+            )
+
+        response = self.client.get(f"/api/chat/{self.user2.id}/?limit=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [message["content"] for message in response.data],
+            ["Message 1", "Message 2"],
+        )
+        self.assertIn('rel="prev"', response["Link"])
+
+        previous_url = response["Link"].split(">")[0].lstrip("<")
+        response = self.client.get(previous_url)
+        self.assertEqual(
+            [message["content"] for message in response.data],
+            ["Hi user1!", "Message 0"],
+        )
+        self.assertIn('rel="prev"', response["Link"])
+        self.assertIn('rel="next"', response["Link"])
+
+    def test_get_chat_history_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(f"/api/chat/{self.user2.id}/?before=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+    def test_sync_returns_changes_since_cursor(self):
+        """Test reconnect sync returns new messages and read states once"""
+        response = self.client.get(f"/api/chat/sync/?since={self.message2.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["messages"], [])
+        cursor = response.data["cursor"]
+
+        message = ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="While you were away"
+        )
+        response = self.client.get(f"/api/chat/sync/?cursor={cursor}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["messages"]), 1)
+        self.assertEqual(response.data["messages"][0]["id"], message.id)
+        self.assertEqual(response.data["messages"][0]["chat_id"], self.user2.id)
+        self.assertEqual(
+            response.data["read_states"],
+            [
+                {
+                    "chat_id": self.user2.id,
+                    "unread_count": 2,
+                    "last_read_id": 0,
+                    "partner_last_read_id": 0,
+                }
+            ],
+        )
+        self.assertFalse(response.data["has_more"])
+
+        response = self.client.get(f"/api/chat/sync/?cursor={response.data['cursor']}")
+        self.assertEqual(response.data["messages"], [])
+        self.assertEqual(response.data["read_states"], [])
+
+    def test_sync_pages_read_states(self):
+        """Test that read states are capped at the limit and resumed by cursor"""
+        partners = [
+            User.objects.create_user(username=f"partner{i}", password="pass")
+            for i in range(3)
+        ]
+        for partner in partners:
+            ChatMessage.objects.create(sender=partner, receiver=self.user1, content="Hi")
+
+        chat_ids = []
+        cursor = None
+        for _ in range(10):
+            query = f"cursor={cursor}" if cursor else "since=0"
+            response = self.client.get(f"/api/chat/sync/?{query}&limit=2")
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["read_states"]), 2)
+            chat_ids += [state["chat_id"] for state in response.data["read_states"]]
+            cursor = response.data["cursor"]
+            if not response.data["has_more"]:
+                break
+
+        self.assertEqual(
+            sorted(chat_ids),
+            sorted([self.user2.id] + [partner.id for partner in partners]),
+        )
+
+    def test_sync_rejects_unknown_since(self):
+        """Test that an unknown since message does not fall back to a full dump"""
+        response = self.client.get("/api/chat/sync/?since=999999")
+        self.assertEqual(response.status_code, 400)
+
+    def test_sync_requires_position(self):
+        """Test reconnect sync without a cursor or since parameter"""
+        response = self.client.get("/api/chat/sync/")
+        self.assertEqual(response.status_code, 400)
+
     def test_send_text_message(self):
         """Test sending a text message"""
         data = {"receiver": self.user2.id, "content": "Test message"}
@@ -87,6 +190,182 @@ class ChatMessageAPITestCase(APITestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class ConversationTestCase(APITestCase):
+    """Test cases for the denormalized conversation summaries"""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", password="pass1")
+        self.user2 = User.objects.create_user(username="user2", password="pass2")
+        self.user3 = User.objects.create_user(username="user3", password="pass3")
+        self.client.force_authenticate(user=self.user1)
+
+    def test_message_updates_conversation(self):
+        """Test that saving a message updates the pair's conversation summary"""
+        ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="A" * 30
+        )
+        message = ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="Second"
+        )
+
+        conversation = Conversation.for_users(self.user1.id, self.user2.id).get()
+        self.assertEqual(conversation.last_message, message)
+        self.assertEqual(conversation.last_message_preview, "Second")
+        self.assertEqual(conversation.user1_unread_count, 2)
+        self.assertEqual(conversation.user2_unread_count, 0)
+
+    def test_list_chat_sessions_from_conversations(self):
+        """Test that the session list is ordered and built from the summaries"""
+        ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="A" * 30
+        )
+        ChatMessage.objects.create(
+            sender=self.user1, receiver=self.user3, content=None
+        )
+
+        with self.assertNumQueries(1):
+            sessions = ChatMessage.get_chat_sessions(self.user1)
+
+        self.assertEqual(
+            sessions,
+            [
+                {
+                    "id": self.user3.id,
+                    "name": "user3",
+                    "last_message": "Sent a file",
+                    "is_unread": False,
+                },
+                {
+                    "id": self.user2.id,
+                    "name": "user2",
+                    "last_message": "A" * 25 + "...",
+                    "is_unread": True,
+                },
+            ],
+        )
+
+    def test_session_updates(self):
+        """Test that session diffs carry each participant's own view"""
+        message = ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="Hi there"
+        )
+
+        updates = dict(build_session_updates(self.user2.id, self.user1.id))
+        receiver_session = updates[self.user1.id]["session"]
+        self.assertEqual(updates[self.user1.id]["type"], "chat_session_update")
+        self.assertEqual(receiver_session["id"], self.user2.id)
+        self.assertEqual(receiver_session["name"], "user2")
+        self.assertEqual(receiver_session["last_message"], "Hi there")
+        self.assertEqual(
+            receiver_session["last_message_at"], message.timestamp.isoformat()
+        )
+        self.assertEqual(receiver_session["unread_count"], 1)
+        self.assertTrue(receiver_session["is_unread"])
+        self.assertEqual(updates[self.user2.id]["session"]["id"], self.user1.id)
+        self.assertEqual(updates[self.user2.id]["session"]["unread_count"], 0)
+
+    def test_list_chat_sessions_from_messages_matches_conversations(self):
+        """Test that the window-function session list matches the summaries"""
+        ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="A" * 30
+        )
+        ChatMessage.objects.create(
+            sender=self.user1, receiver=self.user2, content="Reply"
+        )
+        ChatMessage.objects.create(
+            sender=self.user3, receiver=self.user1, content="Hi there"
+        )
+
+        with self.assertNumQueries(1):
+            sessions = ChatMessage.get_chat_sessions(self.user1, source="messages")
+
+        self.assertEqual(sessions, ChatMessage.get_chat_sessions(self.user1))
+        self.assertTrue(sessions[0]["is_unread"])
+
+    def test_mark_chat_read_resets_unread_count(self):
+        """Test that marking a chat as read resets the reader's counter"""
+        ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="Hello"
+        )
+        response = self.client.post(
+            "/api/chat/mark_chat_read/", {"chat_id": self.user2.id}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        conversation = Conversation.for_users(self.user1.id, self.user2.id).get()
+        self.assertEqual(conversation.user1_unread_count, 0)
+        self.assertFalse(ChatMessage.get_chat_sessions(self.user1)[0]["is_unread"])
+
+    def test_mark_chat_read_moves_read_cursor(self):
+        """Test that marking read is a cursor move and later messages are unread"""
+        first = ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="Hello"
+        )
+        # User lookup, cursor update, unread check and the outbox insert of the
+        # read status event; no messages are touched
+        with self.assertNumQueries(4):
+            self.client.post("/api/chat/mark_chat_read/", {"chat_id": self.user2.id})
+        ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="Are you there?"
+        )
+
+        conversation = Conversation.for_users(self.user1.id, self.user2.id).get()
+        self.assertEqual(conversation.get_last_read_id(self.user1.id), first.id)
+        self.assertEqual(conversation.get_unread_count(self.user1.id), 1)
+        for source in ("conversations", "messages"):
+            sessions = ChatMessage.get_chat_sessions(self.user1, source=source)
+            self.assertTrue(sessions[0]["is_unread"])
+
+    def test_unread_counts(self):
+        """Test that badge counts are numeric, per partner and served from cache"""
+        for content in ("One", "Two"):
+            ChatMessage.objects.create(
+                sender=self.user2, receiver=self.user1, content=content
+            )
+        ChatMessage.objects.create(
+            sender=self.user3, receiver=self.user1, content="Three"
+        )
+        ChatMessage.objects.create(
+            sender=self.user1, receiver=self.user3, content="Reply"
+        )
+
+        response = self.client.get("/api/chat/unread_counts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 3)
+        self.assertEqual(
+            response.data["chats"], {str(self.user2.id): 2, str(self.user3.id): 1}
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                Conversation.get_unread_counts(self.user1.id),
+                {self.user2.id: 2, self.user3.id: 1},
+            )
+
+        self.client.post("/api/chat/mark_chat_read/", {"chat_id": self.user2.id})
+        response = self.client.get("/api/chat/unread_counts/")
+        self.assertEqual(response.data, {"total": 1, "chats": {str(self.user3.id): 1}})
+
+    def test_rebuild_unread_counts(self):
+        """Test that the rebuild command recounts drifted counters"""
+        ChatMessage.objects.create(
+            sender=self.user2, receiver=self.user1, content="Hello"
+        )
+        Conversation.objects.update(user1_unread_count=5, user2_unread_count=3)
+        Conversation.invalidate_unread_counts(self.user1.id, self.user2.id)
+
+        out = StringIO()
+        call_command("rebuild_chat_unread_counts", stdout=out)
+
+        self.assertIn("fixed 1", out.getvalue())
+        conversation = Conversation.for_users(self.user1.id, self.user2.id).get()
+        self.assertEqual(conversation.get_unread_count(self.user1.id), 1)
+        self.assertEqual(conversation.get_unread_count(self.user2.id), 0)
+        self.assertEqual(
+            Conversation.get_unread_counts(self.user1.id), {self.user2.id: 1}
+        )
+
+
 class ChatConsumerTestCase(TransactionTestCase):
     """Test cases for WebSocket chat consumer"""
 
@@ -150,6 +429,213 @@ class ChatConsumerTestCase(TransactionTestCase):
 
         await communicator.disconnect()
 
+    async def test_send_message_over_websocket(self):
+        """Test sending a text message over WebSocket returns an ack with its ID"""
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        receiver_channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(
+            f"user_{self.user2.id}_chat", receiver_channel
+        )
+
+        await communicator.send_json_to(
+            {
+                "type": "send_message",
+                "receiver": self.user2.id,
+                "content": "Hello over WebSocket",
+                "client_id": "tmp-1",
+            }
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "message_ack")
+        self.assertEqual(response["client_id"], "tmp-1")
+
+        message = await database_sync_to_async(ChatMessage.objects.get)(
+            id=response["message"]["id"]
+        )
+        self.assertEqual(message.content, "Hello over WebSocket")
+        self.assertEqual(message.receiver_id, self.user2.id)
+
+        # The sender's session list is patched with a diff, not a refetch signal
+        update = await communicator.receive_json_from()
+        self.assertEqual(update["type"], "chat_session_update")
+        self.assertEqual(update["session"]["id"], self.user2.id)
+        self.assertEqual(update["session"]["last_message"], "Hello over WebSocket")
+        self.assertEqual(update["session"]["unread_count"], 0)
+
+        # The receiver's events went through the outbox with the commit
+        event = await self.channel_layer.receive(receiver_channel)
+        self.assertEqual(event["type"], "chat_message_notification")
+        self.assertEqual(event["message"]["id"], message.id)
+        self.assertFalse(await OutboxEvent.objects.aexists())
+
+        await communicator.disconnect()
+
+    async def test_send_message_to_unknown_receiver(self):
+        """Test sending a WebSocket message to a user that does not exist"""
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        await communicator.connect()
+
+        await communicator.send_json_to(
+            {"type": "send_message", "receiver": 999, "content": "Hello"}
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "error")
+
+        await communicator.disconnect()
+
+    async def test_mark_read_frames_are_coalesced(self):
+        """Test that repeated mark-read frames for one chat share one update"""
+        await database_sync_to_async(ChatMessage.objects.create)(
+            sender=self.user2, receiver=self.user1, content="Unread"
+        )
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        await communicator.connect()
+
+        with self.settings(CHAT_MARK_READ_WINDOW=0.05), mock.patch(
+            "chat.consumers.mark_chat_read", return_value=False
+        ) as mark_read:
+            for _ in range(3):
+                await communicator.send_json_to(
+                    {"type": "mark_read", "chat_id": self.user2.id}
+                )
+            response = await communicator.receive_json_from()
+
+        self.assertEqual(response["type"], "read_status_update")
+        self.assertTrue(response["all_read"])
+        mark_read.assert_called_once()
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.disconnect()
+
+    async def test_mark_read_over_websocket(self):
+        """Test that a WebSocket mark-read resets the unread state"""
+        await database_sync_to_async(ChatMessage.objects.create)(
+            sender=self.user2, receiver=self.user1, content="Unread"
+        )
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        await communicator.connect()
+
+        with self.settings(CHAT_MARK_READ_WINDOW=0):
+            await communicator.send_json_to(
+                {"type": "mark_read", "chat_id": self.user2.id}
+            )
+            response = await communicator.receive_json_from()
+
+        self.assertFalse(response["any_unread_sessions"])
+        sessions = await database_sync_to_async(ChatMessage.get_chat_sessions)(
+            self.user1
+        )
+        self.assertFalse(sessions[0]["is_unread"])
+
+        await communicator.disconnect()
+
+    async def test_mark_read_reaches_other_sockets(self):
+        """Test that a WebSocket mark-read updates the user's other tabs once"""
+        await database_sync_to_async(ChatMessage.objects.create)(
+            sender=self.user2, receiver=self.user1, content="Unread"
+        )
+        reader = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        other_tab = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        await reader.connect()
+        await other_tab.connect()
+
+        with self.settings(CHAT_MARK_READ_WINDOW=0):
+            await reader.send_json_to({"type": "mark_read", "chat_id": self.user2.id})
+            reply = await reader.receive_json_from()
+            update = await other_tab.receive_json_from()
+
+        self.assertEqual(reply["type"], "read_status_update")
+        self.assertEqual(update["type"], "chat_message")
+        self.assertEqual(update["message"], reply)
+        self.assertTrue(await reader.receive_nothing())
+
+        await reader.disconnect()
+        await other_tab.disconnect()
+
+    async def test_pending_mark_read_is_not_replied_after_disconnect(self):
+        """Test that a mark-read flushed on disconnect does not write to the socket"""
+        await database_sync_to_async(ChatMessage.objects.create)(
+            sender=self.user2, receiver=self.user1, content="Unread"
+        )
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/?token={self.token}"
+        )
+        await communicator.connect()
+
+        with self.settings(CHAT_MARK_READ_WINDOW=0.05), mock.patch.object(
+            ChatConsumer, "send", autospec=True, wraps=ChatConsumer.send
+        ) as send:
+            await communicator.send_json_to(
+                {"type": "mark_read", "chat_id": self.user2.id}
+            )
+            await communicator.disconnect()
+
+        send.assert_not_called()
+        # The update itself still reached the database
+        sessions = await database_sync_to_async(ChatMessage.get_chat_sessions)(
+            self.user1
+        )
+        self.assertFalse(sessions[0]["is_unread"])
+
+    async def test_group_commit_batches_messages(self):
+        """Test that messages sent within one window are committed together"""
+        buffer = MessageWriteBuffer(window=0.05)
+        with mock.patch(
+            "chat.batching.create_messages", side_effect=create_messages
+        ) as commit:
+            first, second = await asyncio.gather(
+                buffer.submit(self.user1.id, self.user2.id, "First"),
+                buffer.submit(self.user2.id, self.user1.id, "Second"),
+            )
+
+        commit.assert_called_once()
+        self.assertNotEqual(first.id, second.id)
+        conversation = await database_sync_to_async(
+            Conversation.for_users(self.user1.id, self.user2.id).get
+        )()
+        self.assertEqual(conversation.last_message_id, second.id)
+        self.assertEqual(conversation.user1_unread_count, 1)
+        self.assertEqual(conversation.user2_unread_count, 1)
+
+    def test_created_messages_are_published_through_outbox(self):
+        """Test that a group commit records its WebSocket events with the messages"""
+        with self.settings(REALTIME_DISPATCH_ON_COMMIT=False):
+            first, second = create_messages(
+                [
+                    ChatMessage(sender=self.user1, receiver=self.user2, content="a"),
+                    ChatMessage(sender=self.user1, receiver=self.user2, content="b"),
+                ]
+            )
+
+        events = list(OutboxEvent.objects.order_by("id"))
+        self.assertEqual(
+            [(e.group, e.event["message"]["id"]) for e in events[:2]],
+            [(f"user_{self.user2.id}_chat", m.id) for m in (first, second)],
+        )
+        # One session update per participant for the whole batch
+        updates = {e.group: e.event for e in events[2:]}
+        self.assertEqual(len(events), 4)
+        self.assertEqual(
+            updates[f"user_{self.user2.id}_chat"]["session"]["unread_count"], 2
+        )
+        self.assertEqual(
+            updates[f"user_{self.user1.id}_chat"]["type"], "chat_session_update"
+        )
+
 
 class ChatServicesTestCase(TransactionTestCase):
     """Test cases for chat service functions"""
@@ -1,16 +1,28 @@
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from .models import ChatMessage
-from .serializers import ChatMessageSerializer
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .models import ChatMessage, Conversation
+from .serializers import ChatMessageSerializer, ChatSyncMessageSerializer
+from .pagination import ChatHistoryPagination
+from .services import (
+    build_message_event,
+    build_read_status,
+    build_session_updates,
+    decode_sync_cursor,
+    encode_sync_cursor,
+    get_chat_changes,
+    mark_chat_read,
+)
+from api.realtime import publish
+from uploads.derivatives import schedule_derivatives
+from uploads.services import UploadError, attach_upload
 
 User = get_user_model()
-channel_layer = get_channel_layer()
 
 
 class ChatMessageViewSet(viewsets.ModelViewSet):
@@ -22,6 +34,7 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     - Sending messages (both text and files)
     - Marking messages as read
     - Initializing new chat sessions
+    - Resynchronizing after a WebSocket reconnect
     """
 
     permission_classes = [
@@ -31,6 +44,9 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         ChatMessageSerializer  # Serializer class for chat message objects
     )
     http_method_names = ["get", "post"]  # Limit available HTTP methods to GET and POST
+    pagination_class = ChatHistoryPagination  # Keyset pagination for chat history
+    sync_page_size = 100  # Default number of messages per sync response
+    sync_max_page_size = 500  # Upper bound for the sync limit parameter
 
     def get_queryset(self):
         """Get the queryset of chat messages for the current user.
@@ -51,28 +67,31 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         return Response(chat_sessions)
 
     def retrieve(self, request, pk=None):
-        """Get chat messages between the current user and another user.
+        """Get a page of chat messages between the current user and another user.
+
+        Messages are keyset-paginated on (timestamp, id). Without a cursor the
+        newest page is returned; ``before``/``after`` cursors from the ``Link``
+        header walk to older/newer pages and ``limit`` sets the page size.
 
         Args:
             request: The HTTP request object
             pk (int): The ID of the other user to get chat messages with
 
         Returns:
-            Response: Serialized chat messages between the two users
+            Response: Serialized chat messages between the two users, oldest first
         """
         try:
             other_user = User.objects.get(id=pk)
             current_user = request.user
 
-            # Get all messages between the two users
-            messages = ChatMessage.get_chat_messages(current_user, other_user).order_by(
-                "timestamp"
-            )
+            # Get one page of messages between the two users
+            messages = ChatMessage.get_chat_messages(current_user, other_user)
+            page = self.paginate_queryset(messages)
 
             serializer = self.get_serializer(
-                messages, many=True, context={"request": request}
+                page, many=True, context={"request": request}
             )
-            return Response(serializer.data)
+            return self.get_paginated_response(serializer.data)
 
         except User.DoesNotExist:
             return Response(
@@ -82,15 +101,16 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         """Send a message to a specific user.
 
-        This endpoint handles both text messages and file uploads. While WebSocket
-        is preferred for text-only messages, this endpoint serves as a fallback
-        and remains the primary method for file uploads.
+        This endpoint handles both text messages and file uploads. Text-only
+        messages are preferably sent with the WebSocket ``send_message`` frame;
+        this endpoint serves as a fallback and remains the method for file uploads.
 
         Args:
             request: The HTTP request object containing:
                 - receiver (int): ID of the user to send the message to
                 - content (str, optional): Text content of the message
                 - file (File, optional): File attachment
+                - upload_id (UUID, optional): Finished chunked upload to attach
 
         Returns:
             Response: The created message data if successful
@@ -115,46 +135,45 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
             )
 
             if serializer.is_valid():
-                message = serializer.save(sender=request.user, receiver=receiver)
-
-                # Handle file upload if present
-                if "file" in request.FILES:
-                    message.file = request.FILES["file"]
-                    message.save()
-
-                # Format message data for WebSocket
-                sender_name = request.user.get_full_name() or request.user.username
-                file_data = None
-                if message.file and message.file.name:
-                    file_data = {
-                        "id": message.id,
-                        "title": message.file.name.split("/")[-1],
-                        "url": message.file.url,
-                    }
-
-                message_data = {
-                    "id": message.id,
-                    "sender_id": request.user.id,
-                    "sender_name": sender_name,
-                    "receiver_id": receiver.id,
-                    "content": message.content,
-                    "timestamp": message.timestamp.isoformat(),
-                    "file": file_data,
-                }
-
-                # Send notification to receiver's WebSocket
-                async_to_sync(channel_layer.group_send)(
-                    f"user_{receiver_id}_chat",
-                    {"type": "chat_message_notification", "message": message_data},
-                )
-
-                # Notify both sender and receiver to refresh their chat sessions
-                for user_id in [request.user.id, receiver_id]:
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{user_id}_chat",
-                        {"type": "chat_sessions_updated"},
+                # Saving the message also updates the conversation summary
+                # in the same transaction
+                with transaction.atomic():
+                    # Attach a finished chunked upload or a multipart file, if any
+                    upload = serializer.validated_data.pop("upload", None)
+                    try:
+                        file = attach_upload(upload) if upload else None
+                    except UploadError as e:
+                        return Response(
+                            {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+                        )
+
+                    try:
+                        message = serializer.save(
+                            sender=request.user,
+                            receiver=receiver,
+                            file=file or request.FILES.get("file"),
+                        )
+                    finally:
+                        if file:
+                            file.close()
+                    schedule_derivatives(message.file, "thumbnail")
+
+                    # Format message data for WebSocket
+                    message_data = build_message_event(message, request.user)
+
+                    # Queue the notification to the receiver's WebSocket; events
+                    # are sent together once the transaction has committed
+                    publish(
+                        f"user_{receiver_id}_chat",
+                        {"type": "chat_message_notification", "message": message_data},
                     )
 
+                    # Push the changed session entry to both sender and receiver
+                    for user_id, event in build_session_updates(
+                        request.user.id, receiver_id
+                    ):
+                        publish(f"user_{user_id}_chat", event)
+
                 return Response(
                     self.get_serializer(message, context={"request": request}).data,
                     status=status.HTTP_201_CREATED,
@@ -192,29 +211,16 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
                     {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Mark all messages from the other user as read
-            unread_messages = ChatMessage.objects.filter(
-                sender=other_user, receiver=request.user, is_read=False
-            )
-            unread_messages.update(is_read=True)
-
-            # Check if there are any unread messages left from any sender
-            any_unread_sessions = ChatMessage.objects.filter(
-                receiver=request.user, is_read=False
-            ).exists()
+            # Mark all messages from the other user as read and check the
+            # conversation counters for unread messages left from any sender
+            any_unread_sessions = mark_chat_read(request.user, other_user.id)
 
             # Send WebSocket notification about read status update
-            async_to_sync(channel_layer.group_send)(
+            publish(
                 f"user_{request.user.id}_chat",
                 {
                     "type": "chat_message",
-                    "message": {
-                        "type": "read_status_update",
-                        "chat_id": chat_id,
-                        "has_unread": False,
-                        "all_read": not any_unread_sessions,
-                        "any_unread_sessions": any_unread_sessions,
-                    },
+                    "message": build_read_status(chat_id, any_unread_sessions),
                 },
             )
 
@@ -230,6 +236,106 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(methods=["get"], detail=False)
+    def unread_counts(self, request):
+        """Get the current user's unread message counts for badges.
+
+        Counts come from the cached conversation counters, so polling this
+        endpoint never reads the messages table.
+
+        Returns:
+            Response: Total unread messages and unread messages per chat partner ID
+        """
+        counts = Conversation.get_unread_counts(request.user.id)
+        return Response(
+            {
+                "total": sum(counts.values()),
+                "chats": {str(chat_id): count for chat_id, count in counts.items()},
+            }
+        )
+
+    @action(methods=["get"], detail=False)
+    def sync(self, request):
+        """Return chat changes since a sync position, for clients that reconnect.
+
+        Covers every conversation of the current user in bounded pages: new
+        messages in ID order plus the current unread count of each conversation
+        whose read state changed, at most ``limit`` of each per response. While
+        ``has_more`` is true the client fetches again with the returned cursor.
+
+        Args:
+            request: The HTTP request object containing query parameters:
+                - cursor (str, optional): Cursor returned by a previous sync
+                - since (int, optional): ID of the newest message the client has,
+                  used when the client has no cursor yet; 0 if it has none
+                - limit (int, optional): Maximum number of messages and of read
+                  states to return
+
+        Returns:
+            Response: Messages, read states, the next cursor and whether more
+                changes are pending
+        """
+        cursor = request.query_params.get("cursor")
+        since = request.query_params.get("since")
+
+        try:
+            if cursor:
+                since_id, changed_since, after_conversation_id = decode_sync_cursor(
+                    cursor
+                )
+            elif since is not None:
+                since_id = int(since)
+                after_conversation_id = 0
+                changed_since = None
+                if since_id:
+                    # Read states are replayed from the time of the client's
+                    # newest message
+                    since_message = (
+                        self.get_queryset()
+                        .filter(id=since_id)
+                        .only("timestamp")
+                        .first()
+                    )
+                    if since_message is None:
+                        return Response(
+                            {"error": "Unknown message in since, sync from 0"},
+                            status=status.HTTP_400_BAD_REQUEST,
+                        )
+                    changed_since = since_message.timestamp
+            else:
+                return Response(
+                    {"error": "cursor or since is required"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            limit = int(request.query_params.get("limit", self.sync_page_size))
+        except ValueError:
+            return Response(
+                {"error": "Invalid sync parameters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, self.sync_max_page_size))
+
+        # Taken before querying so changes made during the sync are not skipped
+        synced_at = timezone.now()
+        messages, read_states, has_more, read_position = get_chat_changes(
+            request.user, since_id, changed_since, limit, after_conversation_id
+        )
+        last_message_id = messages[-1].id if messages else since_id
+        changed_since, after_conversation_id = read_position or (synced_at, 0)
+
+        return Response(
+            {
+                "messages": ChatSyncMessageSerializer(
+                    messages, many=True, context={"request": request}
+                ).data,
+                "read_states": read_states,
+                "cursor": encode_sync_cursor(
+                    last_message_id, changed_since, after_conversation_id
+                ),
+                "has_more": has_more,
+            }
+        )
+
     @action(methods=["post"], detail=False)
     def initialize(self, request):
         """Initialize a chat session with a specific user.
@@ -1,5 +1,7 @@
 # pylint: disable=E1101
 from rest_framework import serializers
+from uploads.derivatives import get_derivative_urls
+from uploads.serializers import CompletedUploadField, SignedFileField
 from .models import Course, CourseMaterial, Enrollment, Feedback
 
 
@@ -203,15 +205,73 @@ class CourseMaterialSerializer(serializers.ModelSerializer):
     Includes:
         - Course title instead of ID
         - Material details
+        - Signed, expiring file URL and thumbnail URLs once generated
+        - Write-only upload_id to attach a finished chunked upload instead of a file
     """
 
     course = serializers.StringRelatedField()
+    file = SignedFileField(required=False)
+    thumbnails = serializers.SerializerMethodField()
+    upload_id = CompletedUploadField(source="upload")
 
     class Meta:
         model = CourseMaterial
-        fields = ["id", "course", "title", "file", "uploaded_at", "is_active"]
+        fields = [
+            "id",
+            "course",
+            "title",
+            "file",
+            "thumbnails",
+            "upload_id",
+            "uploaded_at",
+            "is_active",
+        ]
         read_only_fields = ["id", "uploaded_at"]
 
+    def get_thumbnails(self, obj):
+        """Get signed URLs of the image thumbnails that have been generated."""
+        return get_derivative_urls(
+            obj.file.name, "thumbnail", self.context.get("request")
+        )
+
+    def validate(self, data):
+        """
+        Require a file or an upload ID when creating a material.
+
+        Raises:
+            ValidationError: If neither a file nor an upload ID is provided
+        """
+        if self.instance is None and not data.get("file") and not data.get("upload"):
+            raise serializers.ValidationError(
+                "Either file or upload_id must be provided"
+            )
+        return data
+
+
+class CourseMaterialImportSerializer(serializers.Serializer):
+    """
+    Serializer for importing course materials from a ZIP archive.
+
+    The archive is given as a file or as the upload_id of a finished chunked
+    upload. Every file in it becomes a material titled by its filename.
+    """
+
+    file = serializers.FileField(required=False)
+    upload_id = CompletedUploadField(source="upload")
+
+    def validate(self, data):
+        """
+        Require an archive file or an upload ID.
+
+        Raises:
+            ValidationError: If neither a file nor an upload ID is provided
+        """
+        if not data.get("file") and not data.get("upload"):
+            raise serializers.ValidationError(
+                "Either file or upload_id must be provided"
+            )
+        return data
+
 
 class EnrollmentSerializer(serializers.ModelSerializer):
     """
@@ -1,20 +1,28 @@
 import os
 import tempfile
+import zipfile
 from datetime import datetime, timezone
 from io import BytesIO
+from unittest import mock
 from PIL import Image
 
-from django.test import override_settings
+from django.db import connection
+from django.test import AsyncClient, override_settings
 from django.urls import reverse
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
 import factory
 from factory.django import DjangoModelFactory
 
 from courses.models import Course, CourseMaterial, Enrollment, Feedback
+from uploads.archives import extract_zip
+from uploads.models import UploadSession
+from notifications.models import CourseAnnouncement, Notification
 from accounts.tests import UserFactory, TeacherFactory
 
 # ===== FACTORIES =====
@@ -233,6 +241,187 @@ class CourseMaterialTests(APITestCase):
         self.material.refresh_from_db()
         self.assertFalse(self.material.is_active)
 
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_download_archive(self):
+        """Test streaming all active materials as one ZIP file"""
+        self.material.is_active = False
+        self.material.save()
+        for title, name, content in [
+            ("Slides", "slides.pdf", b"%PDF-1.4 slides"),
+            ("Notes", "notes.txt", b"notes " * 1000),
+            ("Notes", "notes.txt", b"more notes"),
+        ]:
+            CourseMaterial.objects.create(
+                course=self.course, title=title, file=ContentFile(content, name=name)
+            )
+
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(f"{self.list_url}archive/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+        infos = {info.filename: info for info in archive.infolist()}
+        self.assertEqual(set(infos), {"Slides.pdf", "Notes.txt", "Notes (2).txt"})
+        self.assertEqual(infos["Slides.pdf"].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(infos["Notes.txt"].compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.read("Notes.txt"), b"notes " * 1000)
+        self.assertIsNone(archive.testzip())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    async def test_archive_streams_under_asgi(self):
+        """Test that ASGI requests get the archive part by part as it is built"""
+        for name in ["one.txt", "two.txt"]:
+            await CourseMaterial.objects.acreate(
+                course=self.course, title=name, file=ContentFile(b"x" * 100, name=name)
+            )
+        token = AccessToken.for_user(self.student)
+        response = await AsyncClient().get(
+            f"{self.list_url}archive/", headers={"Authorization": f"Bearer {token}"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        parts = [part async for part in response.streaming_content]
+        self.assertGreater(len(parts), 2)
+        archive = zipfile.ZipFile(BytesIO(b"".join(parts)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read("two.txt"), b"x" * 100)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_archive_etag(self):
+        """Test that the archive is revalidated by its material fingerprint"""
+        self.client.force_authenticate(user=self.student)
+        url = f"{self.list_url}archive/"
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        CourseMaterial.objects.create(
+            course=self.course, title="New", file=ContentFile(b"new", name="new.txt")
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        self.client.force_authenticate(user=UserFactory())
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def make_zip(self, files):
+        """Helper to build a ZIP archive upload"""
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+        return SimpleUploadedFile("materials.zip", buffer.getvalue())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_import_archive(self):
+        """Test importing materials from a ZIP with one notification each"""
+        EnrollmentFactory(course=self.course)
+        archive = self.make_zip(
+            {
+                "week1/Intro.pdf": b"%PDF-1.4 intro",
+                "week1/notes.txt": b"notes",
+                "Syllabus.docx": b"syllabus",
+                "__MACOSX/week1/._Intro.pdf": b"fork",
+                ".DS_Store": b"finder",
+            }
+        )
+
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.post(
+            f"{self.list_url}import/", {"file": archive}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["count"], 3)
+        materials = CourseMaterial.objects.filter(
+            course=self.course, title__in=["Intro", "notes", "Syllabus"]
+        )
+        self.assertEqual(materials.count(), 3)
+        self.assertEqual(materials.get(title="notes").file.read(), b"notes")
+
+        announcement = CourseAnnouncement.objects.get(course=self.course)
+        self.assertTrue(announcement.message.startswith("3 new materials"))
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), ARCHIVE_MAX_FILES=1)
+    def test_import_archive_limits(self):
+        """Test that oversized archives are rejected before extraction"""
+        self.client.force_authenticate(user=self.teacher)
+        url = f"{self.list_url}import/"
+
+        archive = self.make_zip({"a.txt": b"a", "b.txt": b"b"})
+        response = self.client.post(url, {"file": archive}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        bomb = self.make_zip({"zeros.txt": b"\0" * 1024 * 1024})
+        response = self.client.post(url, {"file": bomb}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("compression ratio", response.data["file"])
+
+        not_zip = SimpleUploadedFile("materials.zip", b"not a zip")
+        response = self.client.post(url, {"file": not_zip}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(CourseMaterial.objects.filter(course=self.course).count(), 1)
+        self.assertFalse(CourseAnnouncement.objects.exists())
+
+    @override_settings(
+        MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_TEMP_DIR=tempfile.mkdtemp()
+    )
+    def test_import_archive_from_upload_outside_transaction(self):
+        """Test that uploads are extracted without holding a transaction open"""
+        self.client.force_authenticate(user=self.teacher)
+        zip_content = self.make_zip({"a.txt": b"a"}).read()
+
+        def upload(content):
+            upload_id = self.client.post(
+                "/api/uploads/",
+                {"filename": "materials.zip", "size": len(content)},
+                format="json",
+            ).data["id"]
+            self.client.put(
+                f"/api/uploads/{upload_id}/?offset=0",
+                content,
+                content_type="application/octet-stream",
+            )
+            self.client.post(f"/api/uploads/{upload_id}/finalize/")
+            return upload_id
+
+        # A failed import leaves the upload available for another attempt
+        bad_id = upload(b"not a zip")
+        response = self.client.post(
+            f"{self.list_url}import/", {"upload_id": bad_id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("upload_id", response.data)
+        self.assertEqual(
+            UploadSession.objects.get(pk=bad_id).status, UploadSession.STATUS_COMPLETE
+        )
+
+        # Savepoints mark atomic blocks inside the test's own transaction
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def extract(archive):
+            depths.append(len(connection.savepoint_ids))
+            return extract_zip(archive)
+
+        with mock.patch(
+            "courses.views.course_material_views.extract_zip", side_effect=extract
+        ):
+            response = self.client.post(
+                f"{self.list_url}import/",
+                {"upload_id": upload(zip_content)},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(depths, [depth])
+
     def test_material_visibility(self):
         """Test material visibility based on course activation"""
         self.course.is_active = False
@@ -1,11 +1,36 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from courses.models import CourseMaterial
-from courses.serializers import CourseMaterialSerializer
+from courses.models import Course, CourseMaterial
+from courses.serializers import CourseMaterialImportSerializer, CourseMaterialSerializer
 from api.permissions import IsCourseTeacher, IsCourseTeacherOrEnrolledStudent
 from notifications.services import create_course_material_notification
+from uploads.archives import (
+    ArchiveError,
+    archive_entry_name,
+    extract_zip,
+    get_archive_fingerprint,
+    stream_zip,
+)
+from uploads.derivatives import schedule_derivatives
+from uploads.serving import streaming_content
+from uploads.services import (
+    UploadError,
+    attach_upload,
+    discard_staged_file,
+    release_upload,
+)
+from uploads.views import IgnoreClientContentNegotiation
 
 
 class CourseMaterialViewSet(viewsets.ModelViewSet):
@@ -15,8 +40,12 @@ class CourseMaterialViewSet(viewsets.ModelViewSet):
     Supports CRUD operations for course materials within a specific course.
     Uses nested routing: /courses/{course_pk}/materials/
 
+    Also provides GET /courses/{course_pk}/materials/archive/ to download all
+    active materials as a single ZIP file, and
+    POST /courses/{course_pk}/materials/import/ to create materials from one.
+
     Permissions:
-    - List/Retrieve: Authenticated users who are either teachers or enrolled students
+    - List/Retrieve/Archive: Authenticated users who are either teachers or enrolled students
     - Create/Update/Delete: Authenticated teachers only
     """
 
@@ -42,7 +71,7 @@ class CourseMaterialViewSet(viewsets.ModelViewSet):
         Returns:
             list: Appropriate permission classes for the current action
         """
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "archive"]:
             self.permission_classes = [
                 IsAuthenticated,
                 IsCourseTeacherOrEnrolledStudent,
@@ -80,14 +109,29 @@ class CourseMaterialViewSet(viewsets.ModelViewSet):
         """
         Create new course material with course_id from URL parameters.
 
+        A finished chunked upload given by upload_id is attached as the file.
+
         Args:
             serializer (CourseMaterialSerializer): Validated serializer instance
 
         Returns:
             CourseMaterial: The newly created material instance
+
+        Raises:
+            ValidationError: If the upload can no longer be attached
         """
         course_pk = self.kwargs.get("course_pk")
-        return serializer.save(course_id=course_pk, is_active=True)
+        upload = serializer.validated_data.pop("upload", None)
+        if upload is None:
+            return serializer.save(course_id=course_pk, is_active=True)
+
+        with transaction.atomic():
+            try:
+                file = attach_upload(upload)
+            except UploadError as e:
+                raise ValidationError({"upload_id": str(e)})
+            with file:
+                return serializer.save(course_id=course_pk, is_active=True, file=file)
 
     def create(self, request, *args, **kwargs):
         """
@@ -99,6 +143,7 @@ class CourseMaterialViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         material = self.perform_create(serializer)
+        schedule_derivatives(material.file, "thumbnail")
 
         # Send notification to course participants
         create_course_material_notification(material.course)
@@ -106,3 +151,122 @@ class CourseMaterialViewSet(viewsets.ModelViewSet):
             {"status": "success", "message": "Material uploaded successfully"},
             status=status.HTTP_201_CREATED,
         )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        content_negotiation_class=IgnoreClientContentNegotiation,
+    )
+    def archive(self, request, course_pk=None):
+        """
+        Stream a ZIP file of all active materials in the course.
+
+        The archive is built while it is sent, in constant memory; under ASGI
+        each part is produced in a worker thread once the previous one has
+        been sent. Its ETag is a fingerprint of the material set, so clients
+        that already have the current archive get a 304 without any files
+        being read.
+
+        Returns:
+            StreamingHttpResponse: The ZIP file, or 304 if it has not changed
+        """
+        materials = self.get_queryset().order_by("uploaded_at", "id")
+        used = set()
+        entries = [
+            (archive_entry_name(title, name, used), name)
+            for title, name in materials.values_list("title", "file")
+            if name
+        ]
+        etag = f'"{get_archive_fingerprint(entries)}"'
+
+        if etag in [
+            tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")
+        ]:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            archive = stream_zip(
+                (arcname, default_storage.path(name)) for arcname, name in entries
+            )
+            response = StreamingHttpResponse(
+                streaming_content(request, archive), content_type="application/zip"
+            )
+            title = Course.objects.values_list("title", flat=True).get(pk=course_pk)
+            response["Content-Disposition"] = content_disposition_header(
+                True, f"{title} materials.zip"
+            )
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_archive(self, request, course_pk=None):
+        """
+        Create a material for every file in an uploaded ZIP archive.
+
+        Entries are decompressed straight into the media storage one at a time,
+        the materials are inserted with a single query, and students get one
+        notification for the whole import.
+
+        Returns:
+            Response: JSON response with success status and the material count
+
+        Raises:
+            ValidationError: If the archive is invalid or exceeds the limits
+        """
+        serializer = CourseMaterialImportSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data.get("upload")
+
+        # The upload is claimed and the archive extracted outside any
+        # transaction, so the database write lock is only held for the insert
+        archive = serializer.validated_data.get("file")
+        if upload:
+            try:
+                archive = attach_upload(upload)
+            except UploadError as e:
+                raise ValidationError({"upload_id": str(e)})
+
+        saved = []
+        try:
+            with archive:
+                materials = []
+                for filename, content in extract_zip(archive):
+                    material = CourseMaterial(
+                        course_id=course_pk,
+                        title=os.path.splitext(filename)[0][:255] or filename,
+                        is_active=True,
+                    )
+                    material.file.save(filename, content, save=False)
+                    saved.append(material.file.name)
+                    materials.append(material)
+            with transaction.atomic():
+                CourseMaterial.objects.bulk_create(materials)
+                if upload:
+                    discard_staged_file(archive)
+        except Exception as e:
+            # Nothing was inserted, so remove the files already stored and let
+            # the upload be used again
+            for name in saved:
+                default_storage.delete(name)
+            if upload:
+                release_upload(upload)
+            if isinstance(e, ArchiveError):
+                raise ValidationError({"upload_id" if upload else "file": str(e)})
+            raise
+
+        for material in materials:
+            schedule_derivatives(material.file, "thumbnail")
+        create_course_material_notification(
+            Course.objects.get(pk=course_pk), count=len(materials)
+        )
+        return Response(
+            {
+                "status": "success",
+                "message": f"{len(materials)} materials imported successfully",
+                "count": len(materials),
+            },
+            status=status.HTTP_201_CREATED,
+        )
@@ -13,6 +13,9 @@ from datetime import timedelta
 import os
 from pathlib import Path
 
+# Django Imports
+from django.utils.crypto import salted_hmac
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,6 +23,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploaded media is deduplicated by content and stored in sharded directories
+STORAGES = {
+    "default": {"BACKEND": "uploads.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 # Security Settings
 SECRET_KEY = "django-insecure-gn%$2ywlum#))s@@n5nm!^x&6+@ie9@kn5y(m$e(wd@$80=pd#"
 DEBUG = True
@@ -46,6 +55,7 @@ INSTALLED_APPS = [
     "courses",
     "chat",
     "notifications",
+    "uploads",
     "api",
 ]
 
@@ -58,6 +68,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.realtime.RealtimeBatchMiddleware",
 ]
 
 ROOT_URLCONF = "elearning.urls"
@@ -117,7 +128,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Channels Configuration
 ASGI_APPLICATION = "elearning.asgi.application"
 
-# Use in-memory channel layer for testing
+# Use in-memory channel layer and cache for testing. Otherwise both live in
+# Redis, so cached values (e.g. chat unread counts) are shared by every worker
+# and management command, and an invalidation anywhere reaches all of them
 import sys
 if 'test' in sys.argv:
     CHANNEL_LAYERS = {
@@ -125,6 +138,11 @@ if 'test' in sys.argv:
             "BACKEND": "channels.layers.InMemoryChannelLayer"
         }
     }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+    }
 else:
     CHANNEL_LAYERS = {
         "default": {
@@ -134,6 +152,108 @@ else:
             },
         },
     }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://127.0.0.1:6379/1",
+        }
+    }
+
+# Chat Configuration
+# Where the chat session list is read from: "conversations" uses the
+# denormalized summaries, "messages" computes it from the messages table
+CHAT_SESSIONS_SOURCE = "conversations"
+
+# Messages sent over WebSocket are buffered for up to this many seconds and
+# written together, or as soon as the batch reaches the maximum size
+CHAT_GROUP_COMMIT_WINDOW = 0.01
+CHAT_GROUP_COMMIT_MAX_BATCH = 100
+
+# Mark-read frames for the same chat within this many seconds share one update
+CHAT_MARK_READ_WINDOW = 0.25
+
+# Seconds the per-user unread counts stay cached; entries are also dropped
+# whenever a counter changes
+CHAT_UNREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Real-time delivery: channel layer sends kept in flight at once when a batch of
+# events is delivered
+REALTIME_MAX_CONCURRENT_SENDS = 100
+
+# Notifications of the same kind, recipient and course (e.g. enrollments in a
+# teacher's course) within this many seconds are merged into one notification
+# that is updated in place; 0 disables digesting
+NOTIFICATION_DIGEST_WINDOW_SECONDS = 15 * 60
+
+# Most notifications replayed to a socket that reconnects with the ID of the last
+# one it received; clients that missed more fall back to the REST list
+NOTIFICATION_REPLAY_LIMIT = 100
+
+# Server-Sent Events stream of notifications (/api/notifications/stream/): a
+# comment is sent after this many idle seconds to keep proxies from closing the
+# connection, and the stream is ended after the maximum age so the client
+# reconnects with a fresh token and course list, resuming from Last-Event-ID
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = 15
+NOTIFICATION_STREAM_MAX_AGE_SECONDS = 60 * 60
+
+# Retention applied by `manage.py prune_notifications`: read notifications older
+# than this many days are deleted, and only the newest NOTIFICATION_MAX_PER_USER
+# notifications of each user are kept (0 disables a rule). Rows are deleted in
+# batches of NOTIFICATION_PRUNE_BATCH_SIZE, one short transaction each
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_MAX_PER_USER = 1000
+NOTIFICATION_PRUNE_BATCH_SIZE = 1000
+
+# Real-time events are written to an outbox in the publishing transaction and,
+# once it commits, sent by a background thread of the same process, so responses
+# never wait for the channel layer. Events that fail are retried by `manage.py
+# dispatch_outbox` with exponential backoff (seconds). Set REALTIME_SEND_INLINE
+# to send them in the committing thread before the response instead, or
+# REALTIME_DISPATCH_ON_COMMIT to False to leave all sending to the dispatcher.
+# Tests send inline so they can check the events right after they commit.
+REALTIME_DISPATCH_ON_COMMIT = True
+REALTIME_SEND_INLINE = 'test' in sys.argv
+REALTIME_OUTBOX_CLAIM_DELAY = 30
+REALTIME_OUTBOX_RETRY_BASE = 2
+REALTIME_OUTBOX_RETRY_MAX = 5 * 60
+REALTIME_OUTBOX_MAX_ATTEMPTS = 10
+
+# Upload Configuration
+# Chunked uploads are staged here until they are attached; keep it on the same
+# filesystem as MEDIA_ROOT so attaching is a rename instead of a copy
+UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, "upload_sessions")
+UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB per file
+UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024  # 16 MB per PUT request
+
+# Limits for ZIP archives imported as course materials, checked against the
+# sizes declared in the archive before anything is extracted
+ARCHIVE_MAX_FILES = 500
+ARCHIVE_MAX_SIZE = UPLOAD_MAX_SIZE  # total uncompressed bytes
+ARCHIVE_MAX_RATIO = 100  # uncompressed / compressed size of any one file
+
+# Media downloads through /api/media/ are access checked; when set, the file is
+# handed off to the web server with X-Accel-Redirect under this internal prefix
+# (e.g. "/protected-media/" mapped by nginx to MEDIA_ROOT). Recommended behind
+# nginx in production; otherwise daphne streams the file block by block itself
+MEDIA_ACCEL_REDIRECT_PREFIX = None
+MEDIA_CACHE_MAX_AGE = 60 * 60  # seconds browsers may reuse a downloaded file
+
+# Media links returned by the API are HMAC-signed with the key named by
+# MEDIA_URL_SIGNING_KEY_ID and expire after MEDIA_URL_TTL, rounded up to the
+# bucket so links stay identical, and cacheable, within each bucket. To rotate,
+# add a new key, switch the ID to it and drop the old key after TTL + bucket.
+# The default key comes from MEDIA_URL_SIGNING_KEY in the environment, or else
+# is derived from SECRET_KEY with its own salt so the raw secret is never used.
+MEDIA_URL_SIGNING_KEYS = {
+    "default": os.environ.get("MEDIA_URL_SIGNING_KEY")
+    or salted_hmac("elearning.media-url", "signing-key", secret=SECRET_KEY).hexdigest(),
+}
+MEDIA_URL_SIGNING_KEY_ID = "default"
+MEDIA_URL_TTL = 60 * 60
+MEDIA_URL_EXPIRY_BUCKET = 15 * 60
+
+# Worker processes rendering image thumbnails and avatars in the background
+DERIVATIVE_PROCESSES = 2
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
@@ -154,7 +274,7 @@ CORS_ALLOW_HEADERS = [
     "x-csrftoken",
     "x-requested-with",
 ]
-CORS_EXPOSE_HEADERS = ["content-type", "x-csrftoken"]
+CORS_EXPOSE_HEADERS = ["content-type", "x-csrftoken", "link"]
 CORS_ALLOW_METHODS = [
     "DELETE",
     "GET",
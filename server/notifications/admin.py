@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Notification
+from .models import (
+    AnnouncementReadCursor,
+    CourseAnnouncement,
+    Notification,
+    UnreadNotificationCounter,
+)
 
 
 @admin.register(Notification)
@@ -8,3 +13,23 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ("is_read", "created_at")
     search_fields = ("recipient__username", "message")
     ordering = ("-created_at",)
+
+
+@admin.register(CourseAnnouncement)
+class CourseAnnouncementAdmin(admin.ModelAdmin):
+    list_display = ("course", "message", "created_at")
+    list_filter = ("created_at",)
+    search_fields = ("course__title", "message")
+    ordering = ("-created_at",)
+
+
+@admin.register(AnnouncementReadCursor)
+class AnnouncementReadCursorAdmin(admin.ModelAdmin):
+    list_display = ("user", "course", "last_read_id")
+    search_fields = ("user__username", "course__title")
+
+
+@admin.register(UnreadNotificationCounter)
+class UnreadNotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ("user", "unread")
+    search_fields = ("user__username",)
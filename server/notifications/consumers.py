@@ -7,12 +7,16 @@ This module contains WebSocket consumers for handling real-time notifications.
 
 import json
 import logging
-from typing import Optional
+from typing import List, Optional, Set, Tuple
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
+from courses.models import Enrollment
+from .serializers import ANNOUNCEMENT_ID_PREFIX
+from .services import announcement_group_name, get_missed_events
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -24,15 +28,22 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     Handles:
     - Authentication via JWT tokens
-    - Group management for user-specific notifications
+    - Group management for user-specific notifications and for the
+      announcements of the user's courses
     - Receiving and broadcasting notifications
+    - Replaying the notifications and announcements missed while offline,
+      when the client passes the last IDs it received as last_id and
+      last_announcement_id in the query string
     """
 
     def __init__(self, *args, **kwargs):
-        """Initialize the consumer with empty user and group name."""
+        """Initialize the consumer with empty user and group names."""
         super().__init__(*args, **kwargs)
         self.user: Optional[User] = None
         self.group_name: Optional[str] = None
+        self.course_groups: List[str] = []
+        # (event type, ID) of replayed events, so they are not sent again live
+        self.replayed: Set[Tuple[str, int]] = set()
 
     async def connect(self):
         """
@@ -43,6 +54,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         2. Extract and validate JWT token from query parameters
         3. Add user to their notification group
         4. Send connection confirmation
+        5. Replay missed events, if the client asked for it
         """
         # Accept the connection first
         await self.accept()
@@ -52,6 +64,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
         # Extract token from query parameters
         token = None
+        params = {}
         if query_string:
             try:
                 params = dict(
@@ -84,6 +97,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             # Join the group
             await self.channel_layer.group_add(self.group_name, self.channel_name)
 
+            # Join the announcement group of every course the user is enrolled
+            # in; courses joined later are picked up on the next connection
+            self.course_groups = [
+                announcement_group_name(course_id)
+                for course_id in await self.get_course_ids(user_id)
+            ]
+            for group in self.course_groups:
+                await self.channel_layer.group_add(group, self.channel_name)
+
             # Send confirmation to client
             await self.send(
                 text_data=json.dumps(
@@ -95,6 +117,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 )
             )
 
+            # Groups are joined first, so nothing published during the replay
+            # is lost; live copies of replayed events are skipped
+            if "last_id" in params or "last_announcement_id" in params:
+                await self.replay(
+                    user_id,
+                    self.parse_id(params.get("last_id")),
+                    self.parse_id(params.get("last_announcement_id")),
+                )
+
         except TokenError as e:
             logger.error("Invalid token: %s", str(e))
         except Exception as e:
@@ -113,6 +144,77 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         # Leave group on disconnect - safely check if group_name exists
         if hasattr(self, "group_name") and self.group_name:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        for group in self.course_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    @staticmethod
+    def parse_id(value: Optional[str]) -> Optional[int]:
+        """
+        Parse an ID from the query string.
+
+        Args:
+            value: Raw query parameter value
+
+        Returns:
+            Optional[int]: The ID, or None if missing or invalid
+        """
+        return int(value) if value and value.isdigit() else None
+
+    async def replay(
+        self,
+        user_id: int,
+        last_id: Optional[int],
+        last_announcement_id: Optional[int],
+    ):
+        """
+        Send the events missed since the given IDs, oldest first.
+
+        At most NOTIFICATION_REPLAY_LIMIT events are sent, followed by a
+        replay_complete message whose has_more flag tells the client to load
+        the rest through the REST API.
+
+        Args:
+            user_id: ID of the connected user
+            last_id: ID of the last notification the client received
+            last_announcement_id: ID of the last announcement the client received
+        """
+        events, has_more = await sync_to_async(get_missed_events)(
+            user_id, last_id, last_announcement_id
+        )
+        for event in events:
+            if event["type"] == "notification_message":
+                await self.notification_message(event)
+                self.replayed.add((event["type"], event["notification_id"]))
+            else:
+                await self.announcement_message(event)
+                self.replayed.add((event["type"], event["announcement_id"]))
+
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "replay_complete",
+                    "count": len(events),
+                    "has_more": has_more,
+                }
+            )
+        )
+
+    @sync_to_async
+    def get_course_ids(self, user_id) -> List[int]:
+        """
+        Get the IDs of the courses a user is enrolled in.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            List[int]: Course IDs
+        """
+        return list(
+            Enrollment.objects.filter(student_id=user_id).values_list(
+                "course_id", flat=True
+            )
+        )
 
     async def receive(self, text_data, bytes_data=None):
         """
@@ -140,6 +242,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         try:
             message_content = event.get("message", "")
             notification_id = event.get("notification_id")
+            if (event["type"], notification_id) in self.replayed:
+                return
 
             # Log the notification being sent
             logger.info("Sending notification (ID: %s) to client", notification_id)
@@ -156,3 +260,31 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
         except Exception as e:
             logger.error("Error sending notification: %s", str(e))
+
+    async def announcement_message(self, event):
+        """
+        Handle course announcements from the course groups.
+
+        Announcements are sent in the same format as notifications, with their
+        prefixed ID.
+
+        Args:
+            event: The event containing announcement data
+        """
+        try:
+            announcement_id = event.get("announcement_id")
+            if (event["type"], announcement_id) in self.replayed:
+                return
+            logger.info("Sending announcement (ID: %s) to client", announcement_id)
+
+            await self.send(
+                text_data=json.dumps(
+                    {
+                        "type": "notification",
+                        "message": event.get("message", ""),
+                        "notification_id": f"{ANNOUNCEMENT_ID_PREFIX}{announcement_id}",
+                    }
+                )
+            )
+        except Exception as e:
+            logger.error("Error sending announcement: %s", str(e))
@@ -0,0 +1,121 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from api.realtime import send_events
+from courses.models import Course, Enrollment
+from notifications.services import (
+    create_course_material_notification,
+    announcement_event,
+    announcement_group_name,
+    create_notification,
+    notification_event,
+)
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data."""
+
+
+class Command(BaseCommand):
+    """Measure notifying every student of a large course.
+
+    Times the course announcement used for new material, which is one row and
+    one event however large the course is. With --compare it also times the
+    per-student alternative: one notification row and one event per student.
+    For each, the database work (including the outbox insert) and the WebSocket
+    delivery are timed separately, since delivery only happens once the
+    upload's transaction commits.
+
+    A temporary course with the requested number of students is created
+    inside a transaction that is rolled back at the end, so the database is
+    left as it was. Events are sent to groups nobody has joined.
+    """
+
+    help = "Benchmark notifying every student of a large course"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--students",
+            type=int,
+            default=2000,
+            help="Number of students enrolled in the course",
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also time creating one notification per student",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["students"], options["compare"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, student_count, compare):
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        teacher = User.objects.create(username=f"{prefix}-teacher", role="teacher")
+        course = Course.objects.create(title=prefix, teacher=teacher)
+        students = User.objects.bulk_create(
+            User(username=f"{prefix}-{i}", role="student") for i in range(student_count)
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(student=student, course=course) for student in students
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            announcement = create_course_material_notification(course)
+            db_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        send_events(
+            [(announcement_group_name(course.id), announcement_event(announcement))]
+        )
+        send_time = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Course announcement to {student_count} students: "
+            f"{db_time * 1000:.1f} ms, {len(queries)} queries; "
+            f"delivery of 1 event {send_time * 1000:.1f} ms"
+        )
+
+        if not compare:
+            return
+
+        enrollments = list(
+            Enrollment.objects.filter(course=course).select_related("student")
+        )
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            notifications = [
+                create_notification(recipient=enrollment.student, message="Benchmark")
+                for enrollment in enrollments
+            ]
+            db_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for notification in notifications:
+            send_events(
+                [
+                    (
+                        f"user_{notification.recipient_id}_notifications",
+                        notification_event(notification),
+                    )
+                ]
+            )
+        send_time = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Per-student notifications: {db_time * 1000:.1f} ms, "
+            f"{len(queries)} queries; "
+            f"delivery of {len(notifications)} events {send_time * 1000:.1f} ms"
+        )
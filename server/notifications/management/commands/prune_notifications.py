@@ -0,0 +1,153 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from notifications.models import Notification
+from notifications.services import decrement_unread_count
+
+
+class Command(BaseCommand):
+    """Delete old notifications according to the retention settings.
+
+    Two rules are applied, each of which can be disabled with 0:
+    - read notifications older than NOTIFICATION_RETENTION_DAYS are deleted
+    - only the newest NOTIFICATION_MAX_PER_USER notifications of each user are
+      kept, read or not
+
+    Rows are deleted by primary key in batches of --batch-size, each in its own
+    short transaction, so the job never holds the database write lock for long
+    and can run next to live traffic. Run it periodically, e.g. from cron.
+    """
+
+    help = "Delete notifications beyond the retention limits"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.NOTIFICATION_RETENTION_DAYS,
+            help="Delete read notifications older than this many days (0 to keep)",
+        )
+        parser.add_argument(
+            "--max-per-user",
+            type=int,
+            default=settings.NOTIFICATION_MAX_PER_USER,
+            help="Keep at most this many notifications per user (0 for no limit)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.NOTIFICATION_PRUNE_BATCH_SIZE,
+            help="Number of notifications deleted per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to wait between batches to let other writers in",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.pause = options["pause"]
+        start = time.perf_counter()
+
+        expired = 0
+        if options["days"]:
+            expired = self.prune_expired(options["days"])
+
+        excess = 0
+        if options["max_per_user"]:
+            excess = self.prune_excess(options["max_per_user"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {expired + excess} notifications "
+                f"({expired} expired, {excess} over the per-user limit) "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+        )
+
+    def prune_expired(self, days):
+        """Delete read notifications created more than ``days`` days ago.
+
+        Args:
+            days (int): Age in days after which read notifications are deleted
+
+        Returns:
+            int: Number of notifications deleted
+        """
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+        deleted = 0
+        last_id = 0
+        while True:
+            ids = list(
+                expired.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: self.batch_size]
+            )
+            if not ids:
+                return deleted
+            deleted += self.delete_batch(ids)
+            last_id = ids[-1]
+
+    def prune_excess(self, max_per_user):
+        """Delete the oldest notifications of users above the per-user limit.
+
+        Args:
+            max_per_user (int): Number of notifications kept for each user
+
+        Returns:
+            int: Number of notifications deleted
+        """
+        recipient_ids = list(
+            Notification.objects.values("recipient_id")
+            .annotate(total=Count("id"))
+            .filter(total__gt=max_per_user)
+            .values_list("recipient_id", flat=True)
+        )
+
+        deleted = 0
+        for recipient_id in recipient_ids:
+            newest = Notification.objects.filter(recipient_id=recipient_id).order_by(
+                "-created_at", "-id"
+            )
+            while True:
+                # Rows after the newest max_per_user; deleting a batch moves the next up
+                ids = list(
+                    newest.values_list("id", flat=True)[
+                        max_per_user : max_per_user + self.batch_size
+                    ]
+                )
+                if not ids:
+                    break
+                deleted += self.delete_batch(ids, recipient_id)
+        return deleted
+
+    def delete_batch(self, ids, recipient_id=None):
+        """Delete one batch of notifications in its own transaction.
+
+        Args:
+            ids (list): IDs of the notifications to delete
+            recipient_id (int): Owner of the notifications, whose unread counter
+                is lowered, if they may include unread ones
+
+        Returns:
+            int: Number of notifications deleted
+        """
+        with transaction.atomic():
+            batch = Notification.objects.filter(id__in=ids)
+            if recipient_id is not None:
+                decrement_unread_count(
+                    recipient_id, batch.filter(is_read=False).count()
+                )
+            deleted, _ = batch.delete()
+        if self.pause:
+            time.sleep(self.pause)
+        return deleted
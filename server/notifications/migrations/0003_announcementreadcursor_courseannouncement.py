@@ -0,0 +1,106 @@
+# Generated by Django 5.1.3 on 2026-10-17 02:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0002_alter_course_created_at_alter_course_description_and_more"),
+        ("notifications", "0002_alter_notification_created_at_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnnouncementReadCursor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_read_id",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="ID of the newest announcement the user has read",
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        help_text="The course whose announcements were read",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="announcement_cursors",
+                        to="courses.course",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="The user who read the announcements",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="announcement_cursors",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "course"), name="unique_announcement_cursor"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CourseAnnouncement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "message",
+                    models.TextField(
+                        help_text="The message content of the announcement"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="The date and time when the announcement was created",
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        help_text="The course whose students receive this announcement",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="announcements",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["course", "-created_at"], name="announcement_course_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.3 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0002_alter_course_created_at_alter_course_description_and_more"),
+        ("notifications", "0003_announcementreadcursor_courseannouncement"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="count",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="The number of events merged into this notification",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="course",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="The course the digested events are about",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="courses.course",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="digest_key",
+            field=models.CharField(
+                blank=True,
+                help_text="Kind, recipient, course and time window of a digest",
+                max_length=100,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="kind",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="The kind of event, for notifications that are digested",
+                max_length=30,
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 02:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0002_alter_course_created_at_alter_course_description_and_more"),
+        ("notifications", "0004_notification_count_notification_course_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "is_read", "created_at"],
+                name="notification_unread_idx",
+            ),
+        ),
+    ]
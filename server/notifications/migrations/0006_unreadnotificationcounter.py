@@ -0,0 +1,59 @@
+# Generated by Django 5.1.3 on 2026-10-17 02:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counters(apps, schema_editor):
+    """Count the existing unread notifications of each user."""
+    Notification = apps.get_model("notifications", "Notification")
+    UnreadNotificationCounter = apps.get_model(
+        "notifications", "UnreadNotificationCounter"
+    )
+    rows = (
+        Notification.objects.filter(is_read=False)
+        .values("recipient_id")
+        .annotate(unread=Count("id"))
+        .order_by()
+    )
+    UnreadNotificationCounter.objects.bulk_create(
+        UnreadNotificationCounter(user_id=row["recipient_id"], unread=row["unread"])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("notifications", "0005_notification_unread_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadNotificationCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        help_text="The user whose unread notifications are counted",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="unread_notification_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "unread",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="The number of unread notifications of the user",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -1,23 +1,34 @@
 """
-Notification Model
-==================
+Notification Models
+===================
 
-This model represents notifications sent to users in the e-learning platform.
+These models represent notifications sent to users in the e-learning platform:
+personal notifications with one row per recipient, and course announcements
+stored once per course and merged into each student's notifications when read.
 """
 
 from django.db import models
 from accounts.models import User
+from courses.models import Course
 
 
 class Notification(models.Model):
     """
     Model representing user notifications.
 
+    Notifications of the same kind about the same course are digested: within
+    one NOTIFICATION_DIGEST_WINDOW_SECONDS window they are merged into a single
+    row, identified by digest_key, whose count and message are updated in place.
+
     Attributes:
         recipient (User): The user receiving the notification
         message (str): The notification content
         is_read (bool): Whether the notification has been read
         created_at (datetime): When the notification was created
+        kind (str): Kind of event for digested notifications, e.g. "enrollment"
+        course (Course): Course the digested events are about
+        count (int): Number of events merged into the notification
+        digest_key (str): Kind, recipient, course and window of a digest
     """
 
     # The user receiving the notification
@@ -45,6 +56,48 @@ class Notification(models.Model):
         help_text="The date and time when the notification was created"
     )
 
+    # The kind of event, set for notifications that are digested
+    kind = models.CharField(
+        max_length=30,
+        blank=True,
+        default="",
+        help_text="The kind of event, for notifications that are digested"
+    )
+
+    # The course the digested events are about
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="The course the digested events are about"
+    )
+
+    # How many events have been merged into this notification
+    count = models.PositiveIntegerField(
+        default=1,
+        help_text="The number of events merged into this notification"
+    )
+
+    # Identifies the digest that further events are merged into
+    digest_key = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        unique=True,
+        help_text="Kind, recipient, course and time window of a digest"
+    )
+
+    class Meta:
+        indexes = [
+            # Serves the unread filter and unread count of a user's feed
+            models.Index(
+                fields=["recipient", "is_read", "created_at"],
+                name="notification_unread_idx",
+            ),
+        ]
+
     def __str__(self):
         """
         String representation of the notification.
@@ -53,3 +106,135 @@ class Notification(models.Model):
             str: A formatted string showing recipient and truncated message
         """
         return f"Notification for {self.recipient.username}: {self.message[:50]}..."
+
+
+class CourseAnnouncement(models.Model):
+    """
+    Model representing a notification addressed to everyone in a course.
+
+    An announcement is stored once, however many students are enrolled. It is
+    shown to students enrolled at the time it was made, and whether they have
+    read it comes from their AnnouncementReadCursor for the course.
+
+    Attributes:
+        course (Course): The course the announcement is addressed to
+        message (str): The announcement content
+        created_at (datetime): When the announcement was created
+    """
+
+    # The course whose students receive the announcement
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="announcements",
+        help_text="The course whose students receive this announcement"
+    )
+
+    # The content of the announcement
+    message = models.TextField(
+        help_text="The message content of the announcement"
+    )
+
+    # When the announcement was created
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="The date and time when the announcement was created"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["course", "-created_at"], name="announcement_course_idx"
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the announcement.
+
+        Returns:
+            str: A formatted string showing course and truncated message
+        """
+        return f"Announcement for {self.course.title}: {self.message[:50]}..."
+
+
+class AnnouncementReadCursor(models.Model):
+    """
+    Model recording which announcements of a course a user has read.
+
+    Announcement IDs increase over time, so every announcement of the course up
+    to last_read_id is read and every later one is unread.
+
+    Attributes:
+        user (User): The reader
+        course (Course): The course whose announcements the cursor covers
+        last_read_id (int): ID of the newest announcement marked as read
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="announcement_cursors",
+        help_text="The user who read the announcements"
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="announcement_cursors",
+        help_text="The course whose announcements were read"
+    )
+    last_read_id = models.PositiveBigIntegerField(
+        default=0,
+        help_text="ID of the newest announcement the user has read"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "course"], name="unique_announcement_cursor"
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the cursor.
+
+        Returns:
+            str: The user, course and position of the cursor
+        """
+        return f"{self.user.username} read {self.course.title} up to {self.last_read_id}"
+
+
+class UnreadNotificationCounter(models.Model):
+    """
+    Model keeping the number of unread notifications of a user.
+
+    The counter is maintained by the notification services whenever a
+    notification is created, merged into a digest, read or deleted, so the
+    unread badge is a primary key lookup instead of a count over the table.
+
+    Attributes:
+        user (User): The owner of the notifications
+        unread (int): Number of the user's notifications that are unread
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="unread_notification_counter",
+        help_text="The user whose unread notifications are counted"
+    )
+    unread = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of unread notifications of the user"
+    )
+
+    def __str__(self):
+        """
+        String representation of the counter.
+
+        Returns:
+            str: The user and their unread count
+        """
+        return f"{self.user.username}: {self.unread} unread"
@@ -0,0 +1,14 @@
+from api.pagination import KeysetPagination
+
+
+class NotificationPagination(KeysetPagination):
+    """Keyset pagination for the notification feed.
+
+    Pages are keyed on (created_at, id), newest first. Personal notifications
+    and course announcements are paged together, one indexed range scan each,
+    so a deep page costs the same as the first one.
+    """
+
+    ordering_field = "created_at"
+    page_size = 50
+    max_page_size = 200
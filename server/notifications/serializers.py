@@ -2,12 +2,15 @@
 Notification Serializers
 =======================
 
-This module contains serializers for the Notification model,
-handling the conversion between Notification instances and JSON data.
+This module contains serializers for the Notification and CourseAnnouncement
+models, handling the conversion between their instances and JSON data.
 """
 
 from rest_framework import serializers
-from .models import Notification
+from .models import CourseAnnouncement, Notification
+
+# Prefix of announcement IDs in the merged notification list
+ANNOUNCEMENT_ID_PREFIX = "announcement-"
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -40,3 +43,36 @@ class NotificationSerializer(serializers.ModelSerializer):
             "created_at",
         ]
         read_only_fields = ["id", "created_at"]
+
+
+class AnnouncementSerializer(serializers.ModelSerializer):
+    """
+    Serializer for course announcements listed among a user's notifications.
+
+    Uses the same fields as NotificationSerializer so both can be shown in one
+    list. IDs are prefixed with "announcement-" to keep them apart from
+    notification IDs, and is_read comes from the user's read cursor.
+    """
+
+    id = serializers.SerializerMethodField()
+    recipient = serializers.SerializerMethodField()
+    is_read = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = CourseAnnouncement
+        fields = [
+            "id",
+            "recipient",
+            "message",
+            "is_read",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+    def get_id(self, obj):
+        """Get the prefixed announcement ID."""
+        return f"{ANNOUNCEMENT_ID_PREFIX}{obj.id}"
+
+    def get_recipient(self, obj):
+        """Get the username of the user reading the announcement."""
+        return str(self.context["request"].user)
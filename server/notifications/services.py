@@ -6,16 +6,85 @@ This module contains business logic for creating and sending notifications
 through various channels (database, WebSocket).
 """
 
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+import heapq
+import time
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from typing import List
-from .models import Notification
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    CharField,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Greatest
+from typing import Iterable, List, Optional, Tuple
+from api.realtime import publish
+from .models import (
+    AnnouncementReadCursor,
+    CourseAnnouncement,
+    Notification,
+    UnreadNotificationCounter,
+)
 from courses.models import Enrollment, Course
 
 User = get_user_model()
 
 
+def notification_event(notification: Notification) -> dict:
+    """
+    Build the channel layer event announcing a notification.
+
+    Args:
+        notification: The saved notification
+
+    Returns:
+        dict: Event handled by the consumers' notification_message
+    """
+    return {
+        "type": "notification_message",
+        "message": notification.message,
+        "notification_id": notification.id,
+    }
+
+
+def announcement_event(announcement: CourseAnnouncement) -> dict:
+    """
+    Build the channel layer event announcing a course announcement.
+
+    Args:
+        announcement: The saved announcement
+
+    Returns:
+        dict: Event handled by the consumers' announcement_message
+    """
+    return {
+        "type": "announcement_message",
+        "message": announcement.message,
+        "announcement_id": announcement.id,
+    }
+
+
+def publish_notification(notification: Notification) -> None:
+    """
+    Send a notification to its recipient via WebSocket once it is committed.
+
+    Delivery failures are logged and retried by the real-time publisher.
+
+    Args:
+        notification: The saved notification
+    """
+    group_name = f"user_{notification.recipient_id}_notifications"
+    publish(group_name, notification_event(notification))
+
+
 def create_notification(recipient: User, message: str) -> Notification:
     """
     Create a notification and send it to the recipient via WebSocket.
@@ -26,39 +95,209 @@ def create_notification(recipient: User, message: str) -> Notification:
 
     Returns:
         Notification: The created notification object
-
-    Raises:
-        Exception: If WebSocket communication fails
     """
     # Create notification in the database
     notification = Notification(recipient=recipient, message=message)
     notification.save()
 
-    # Send notification via WebSocket
-    channel_layer = get_channel_layer()
-    group_name = f"user_{recipient.id}_notifications"
-
-    try:
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "notification_message",
-                "message": message,
-                "notification_id": notification.id,
-            },
+    increment_unread_counts([notification.recipient_id])
+    publish_notification(notification)
+    return notification
+
+
+def create_digest_notification(
+    recipient: User, course: Course, kind: str, message: str, digest_message: str
+) -> Notification:
+    """
+    Create a notification, or merge it into the recipient's digest for the course.
+
+    Events of the same kind for the same recipient and course within one
+    NOTIFICATION_DIGEST_WINDOW_SECONDS window share one row. The first event
+    creates it with message and sends it via WebSocket; later events increment
+    its count, rewrite its message from digest_message and mark it unread in a
+    single UPDATE, without another push. The recipient's unread counter only
+    goes up when a digest they had read becomes unread again. A window of 0
+    disables digesting.
+
+    Args:
+        recipient: User who should receive the notification
+        course: Course the event is about
+        kind: Kind of event, e.g. "enrollment"
+        message: Content of the notification for a single event
+        digest_message: Content for merged events, with a "{count}" placeholder
+
+    Returns:
+        Notification: The created or updated notification
+    """
+    window = settings.NOTIFICATION_DIGEST_WINDOW_SECONDS
+    if not window:
+        return create_notification(recipient, message)
+
+    digest_key = f"{kind}:{recipient.id}:{course.id}:{int(time.time() // window)}"
+    prefix, suffix = digest_message.split("{count}")
+    digest = Notification.objects.filter(digest_key=digest_key)
+
+    changes = {
+        "count": F("count") + 1,
+        "message": Concat(
+            Value(prefix),
+            Cast(F("count") + 1, output_field=CharField()),
+            Value(suffix),
+        ),
+        "is_read": False,
+    }
+
+    def merge():
+        # Bursts usually find the digest still unread, which costs one UPDATE
+        if digest.filter(is_read=False).update(**changes):
+            return 1
+        if digest.filter(is_read=True).update(**changes):
+            increment_unread_counts([recipient.id])
+            return 1
+        return 0
+
+    if not merge():
+        try:
+            with transaction.atomic():
+                notification = Notification.objects.create(
+                    recipient=recipient,
+                    message=message,
+                    kind=kind,
+                    course=course,
+                    digest_key=digest_key,
+                )
+        except IntegrityError:
+            # Another request created the digest first
+            merge()
+        else:
+            increment_unread_counts([recipient.id])
+            publish_notification(notification)
+            return notification
+
+    return digest.get()
+
+
+def increment_unread_counts(recipient_ids: Iterable[int]) -> None:
+    """
+    Count new unread notifications in their recipients' unread counters.
+
+    Counters that grow by the same amount are updated with one UPDATE; only
+    users without a counter yet cost an extra lookup and INSERT.
+
+    Args:
+        recipient_ids: Recipient of each new unread notification, repeated
+            once per notification
+    """
+    by_amount = defaultdict(list)
+    for user_id, amount in Counter(recipient_ids).items():
+        by_amount[amount].append(user_id)
+
+    for amount, user_ids in by_amount.items():
+        counters = UnreadNotificationCounter.objects.filter(user_id__in=user_ids)
+        if counters.update(unread=F("unread") + amount) == len(user_ids):
+            continue
+
+        # First notifications of some of the users: create their counters
+        missing = set(user_ids) - set(counters.values_list("user_id", flat=True))
+        try:
+            with transaction.atomic():
+                UnreadNotificationCounter.objects.bulk_create(
+                    UnreadNotificationCounter(user_id=user_id, unread=amount)
+                    for user_id in missing
+                )
+        except IntegrityError:
+            # Another request created some of them first
+            for user_id in missing:
+                counter, created = UnreadNotificationCounter.objects.get_or_create(
+                    user_id=user_id, defaults={"unread": amount}
+                )
+                if not created:
+                    UnreadNotificationCounter.objects.filter(pk=counter.pk).update(
+                        unread=F("unread") + amount
+                    )
+
+
+def decrement_unread_count(user_id: int, amount: int) -> None:
+    """
+    Remove notifications that were read or deleted from a user's unread counter.
+
+    Args:
+        user_id: ID of the user
+        amount: Number of unread notifications that went away
+    """
+    if amount:
+        UnreadNotificationCounter.objects.filter(user_id=user_id).update(
+            unread=Greatest(F("unread") - amount, 0)
         )
-    except Exception as e:
-        # Log the error but still return the notification
-        # since it was successfully created in the database
-        raise
 
-    return notification
+
+def get_unread_count(user: User) -> int:
+    """
+    Get the number of unread notifications and announcements of a user.
+
+    Personal notifications are read from the user's maintained counter, a
+    primary key lookup. Unread announcements are counted from the user's read
+    cursors, since keeping a counter for them would mean writing one row per
+    student for every announcement.
+
+    Args:
+        user: The reader
+
+    Returns:
+        int: Number of unread notifications and announcements
+    """
+    unread = (
+        UnreadNotificationCounter.objects.filter(user=user)
+        .values_list("unread", flat=True)
+        .first()
+    )
+    return (unread or 0) + get_user_announcements(user).filter(is_read=False).count()
+
+
+def mark_notification_read(user: User, notification_id: int) -> bool:
+    """
+    Mark one of a user's notifications as read.
+
+    Args:
+        user: The reader
+        notification_id: ID of the notification
+
+    Returns:
+        bool: False if the user has no such notification
+    """
+    notifications = Notification.objects.filter(recipient=user, id=notification_id)
+    if notifications.filter(is_read=False).update(is_read=True):
+        decrement_unread_count(user.id, 1)
+        return True
+    return notifications.exists()
+
+
+def mark_all_notifications_read(user: User) -> int:
+    """
+    Mark all of a user's notifications as read.
+
+    Only unread rows are updated, so notifications that were already read are
+    not rewritten.
+
+    Args:
+        user: The reader
+
+    Returns:
+        int: Number of notifications marked as read
+    """
+    updated = Notification.objects.filter(recipient=user, is_read=False).update(
+        is_read=True
+    )
+    decrement_unread_count(user.id, updated)
+    return updated
 
 
 def create_course_enrollment_notification(enrollment: Enrollment) -> Notification:
     """
     Create a notification when a student enrolls in a course.
 
+    Enrollments in the same digest window are merged into one notification.
+
     Args:
         enrollment: The enrollment record
 
@@ -71,7 +310,13 @@ def create_course_enrollment_notification(enrollment: Enrollment) -> Notificatio
 
     message = f"{student.get_full_name() or student.username} has enrolled in your course: {course.title}"
 
-    return create_notification(recipient=teacher, message=message)
+    return create_digest_notification(
+        recipient=teacher,
+        course=course,
+        kind="enrollment",
+        message=message,
+        digest_message=f"{{count}} students have enrolled in your course: {course.title}",
+    )
 
 
 def create_course_unenrollment_notification(
@@ -80,6 +325,8 @@ def create_course_unenrollment_notification(
     """
     Create a notification when a student leaves a course.
 
+    Departures in the same digest window are merged into one notification.
+
     Args:
         course: The course being left
         student: The student who left
@@ -91,26 +338,222 @@ def create_course_unenrollment_notification(
 
     message = f"{student.get_full_name() or student.username} has left your course: {course.title}"
 
-    return create_notification(recipient=teacher, message=message)
+    return create_digest_notification(
+        recipient=teacher,
+        course=course,
+        kind="unenrollment",
+        message=message,
+        digest_message=f"{{count}} students have left your course: {course.title}",
+    )
 
 
-def create_course_material_notification(course: Course) -> List[Notification]:
+def announcement_group_name(course_id: int) -> str:
     """
-    Create notifications for all students when new material is uploaded.
+    Get the channel layer group of a course's announcements.
 
     Args:
-        course: The course with new material
+        course_id: ID of the course
+
+    Returns:
+        str: Group joined by the notification sockets of enrolled students
+    """
+    return f"course_{course_id}_announcements"
+
+
+def create_course_announcement(course: Course, message: str) -> CourseAnnouncement:
+    """
+    Create an announcement for all students of a course.
+
+    One row is written and one WebSocket event is sent to the course group,
+    however many students are enrolled.
+
+    Args:
+        course: The course to announce to
+        message: Content of the announcement
 
     Returns:
-        List[Notification]: List of created notification objects
+        CourseAnnouncement: The created announcement
     """
-    message = f"A new material has been uploaded to your course: {course.title}"
+    announcement = CourseAnnouncement.objects.create(course=course, message=message)
+    publish(announcement_group_name(course.id), announcement_event(announcement))
+    return announcement
+
+
+def get_user_announcements(user: User | int) -> QuerySet:
+    """
+    Get the announcements shown to a user, with their read state.
+
+    A user sees the announcements of the courses they are enrolled in that
+    were made since they enrolled. Each announcement is annotated with is_read
+    from the user's read cursor for its course.
 
-    # Create notifications for all enrolled students
-    notifications = []
-    for enrollment in Enrollment.objects.filter(course=course):
-        notifications.append(
-            create_notification(recipient=enrollment.student, message=message)
+    Args:
+        user: The reader, or their ID
+
+    Returns:
+        QuerySet: Announcements annotated with is_read, newest first
+    """
+    last_read_id = AnnouncementReadCursor.objects.filter(
+        user=user, course=OuterRef("course")
+    ).values("last_read_id")[:1]
+    return (
+        CourseAnnouncement.objects.filter(
+            course__enrolled_students__student=user,
+            created_at__gte=F("course__enrolled_students__enrolled_at"),
+        )
+        .annotate(is_read=Q(id__lte=Coalesce(Subquery(last_read_id), Value(0))))
+        .order_by("-created_at", "-id")
+    )
+
+
+def get_missed_events(
+    user_id: int,
+    last_id: Optional[int] = None,
+    last_announcement_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[dict], bool]:
+    """
+    Get the events a user missed while disconnected, for replay on reconnect.
+
+    Notifications after last_id and announcements after last_announcement_id
+    are returned oldest first, in the format they are published in, so a
+    client can resume from the highest IDs it received. A kind whose last ID
+    is None is not replayed.
+
+    Args:
+        user_id: ID of the user reconnecting
+        last_id: ID of the last notification the client received
+        last_announcement_id: ID of the last announcement the client received
+        limit: Maximum number of events, NOTIFICATION_REPLAY_LIMIT by default
+
+    Returns:
+        Tuple[List[dict], bool]: Channel layer events, and whether more were
+        missed than the limit allows
+    """
+    if limit is None:
+        limit = settings.NOTIFICATION_REPLAY_LIMIT
+
+    missed = []
+    if last_id is not None:
+        notifications = Notification.objects.filter(
+            recipient_id=user_id, id__gt=last_id
+        ).order_by("id")
+        missed.append(
+            (notification.created_at, notification_event(notification))
+            for notification in notifications[: limit + 1]
+        )
+    if last_announcement_id is not None:
+        announcements = (
+            get_user_announcements(user_id)
+            .filter(id__gt=last_announcement_id)
+            .order_by("id")
+        )
+        missed.append(
+            (announcement.created_at, announcement_event(announcement))
+            for announcement in announcements[: limit + 1]
+        )
+
+    events = [event for _, event in heapq.merge(*missed, key=itemgetter(0))][
+        : limit + 1
+    ]
+    return events[:limit], len(events) > limit
+
+
+def get_latest_event_ids(user_id: int) -> Tuple[int, int]:
+    """
+    Get the IDs of the newest notification and announcement a user can see.
+
+    Used as the starting point of a stream, so a later reconnection only
+    replays what was created after it started.
+
+    Args:
+        user_id: ID of the user
+
+    Returns:
+        Tuple[int, int]: Newest notification ID and newest announcement ID, 0
+        if there are none
+    """
+    last_id = Notification.objects.filter(recipient_id=user_id).aggregate(
+        last_id=Max("id")
+    )["last_id"]
+    last_announcement_id = (
+        get_user_announcements(user_id)
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return last_id or 0, last_announcement_id or 0
+
+
+def mark_announcement_read(user: User, announcement: CourseAnnouncement) -> None:
+    """
+    Mark an announcement, and the older ones of its course, as read.
+
+    Args:
+        user: The reader
+        announcement: The announcement that was read
+    """
+    cursor, created = AnnouncementReadCursor.objects.get_or_create(
+        user=user,
+        course_id=announcement.course_id,
+        defaults={"last_read_id": announcement.id},
+    )
+    if not created:
+        # Never move the cursor backwards
+        AnnouncementReadCursor.objects.filter(
+            pk=cursor.pk, last_read_id__lt=announcement.id
+        ).update(last_read_id=announcement.id)
+
+
+def mark_all_announcements_read(user: User) -> None:
+    """
+    Mark every announcement shown to a user as read.
+
+    Moves the user's cursor of each enrolled course to its newest announcement
+    with a single upsert.
+
+    Args:
+        user: The reader
+    """
+    latest = (
+        CourseAnnouncement.objects.filter(course__enrolled_students__student=user)
+        .values("course_id")
+        .annotate(last_id=Max("id"))
+    )
+    AnnouncementReadCursor.objects.bulk_create(
+        [
+            AnnouncementReadCursor(
+                user=user, course_id=row["course_id"], last_read_id=row["last_id"]
+            )
+            for row in latest
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "course"],
+        update_fields=["last_read_id"],
+    )
+
+
+def create_course_material_notification(
+    course: Course, count: int = 1
+) -> CourseAnnouncement:
+    """
+    Announce new material to all students of the course.
+
+    Materials uploaded together, such as an archive import, are covered by a
+    single announcement.
+
+    Args:
+        course: The course with new material
+        count: Number of materials uploaded
+
+    Returns:
+        CourseAnnouncement: The created announcement
+    """
+    if count == 1:
+        message = f"A new material has been uploaded to your course: {course.title}"
+    else:
+        message = (
+            f"{count} new materials have been uploaded to your course: {course.title}"
         )
 
-    return notifications
+    return create_course_announcement(course, message)
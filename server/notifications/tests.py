@@ -6,16 +6,27 @@ This module contains comprehensive tests for the notification system,
 including models, views, services, and WebSocket consumers.
 """
 
-from django.test import TestCase, override_settings
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from channels.layers import get_channel_layer
 from channels.testing import WebsocketCommunicator
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
 from courses.models import Course, Enrollment
-from .models import Notification
+from .models import CourseAnnouncement, Notification
 from .consumers import NotificationConsumer
 from .services import (
     create_notification,
+    get_unread_count,
+    get_user_announcements,
     create_course_enrollment_notification,
     create_course_unenrollment_notification,
     create_course_material_notification,
@@ -87,12 +98,79 @@ class NotificationServiceTests(TestCase):
         self.assertIn(self.user.username, notification.message)
         self.assertIn(self.course.title, notification.message)
 
+    def test_enrollment_notifications_are_digested(self):
+        """Test that enrollments within a window merge into one notification."""
+        first = create_course_enrollment_notification(self.enrollment)
+        first.is_read = True
+        first.save()
+
+        with mock.patch("api.realtime.send_events") as send_events:
+            with self.captureOnCommitCallbacks(execute=True):
+                # Reopening the read digest also counts it as unread again;
+                # merging into an unread one is a single UPDATE and the read
+                for i, queries in enumerate([4, 2]):
+                    student = User.objects.create_user(username=f"student{i}")
+                    enrollment = Enrollment.objects.create(
+                        course=self.course, student=student
+                    )
+                    with self.assertNumQueries(queries):
+                        digest = create_course_enrollment_notification(enrollment)
+        send_events.assert_not_called()
+
+        self.assertEqual(digest.id, first.id)
+        self.assertEqual(digest.count, 3)
+        self.assertEqual(
+            digest.message, "3 students have enrolled in your course: Test Course"
+        )
+        self.assertFalse(digest.is_read)
+        self.assertEqual(Notification.objects.count(), 1)
+
+        # Departures are digested separately
+        create_course_unenrollment_notification(self.course, self.user)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_digest_window(self):
+        """Test that a new window, or a window of 0, starts a new notification."""
+        with mock.patch("notifications.services.time.time", return_value=0):
+            first = create_course_enrollment_notification(self.enrollment)
+        with mock.patch("notifications.services.time.time", return_value=15 * 60):
+            second = create_course_enrollment_notification(self.enrollment)
+        with self.settings(NOTIFICATION_DIGEST_WINDOW_SECONDS=0):
+            third = create_course_enrollment_notification(self.enrollment)
+
+        self.assertEqual(len({first.id, second.id, third.id}), 3)
+        self.assertEqual(second.count, 1)
+        self.assertIsNone(third.digest_key)
+
     def test_create_course_material_notification(self):
-        """Test course material notification creation."""
-        notifications = create_course_material_notification(self.course)
-        self.assertEqual(len(notifications), 1)
-        self.assertEqual(notifications[0].recipient, self.user)
-        self.assertIn(self.course.title, notifications[0].message)
+        """Test that course material is announced once to the whole course."""
+        announcement = create_course_material_notification(self.course)
+        self.assertEqual(announcement.course, self.course)
+        self.assertIn(self.course.title, announcement.message)
+        self.assertEqual(list(get_user_announcements(self.user)), [announcement])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_announcement_cost_is_independent_of_course_size(self):
+        """Test that announcing to 2,000 students writes one row and one event."""
+        students = User.objects.bulk_create(
+            User(username=f"student{i}") for i in range(2000)
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(course=self.course, student=student) for student in students
+        )
+
+        with mock.patch("api.realtime.send_events") as send_events:
+            with self.captureOnCommitCallbacks(execute=True):
+                # The announcement and its outbox event
+                with self.assertNumQueries(2):
+                    create_course_material_notification(self.course)
+
+        self.assertEqual(CourseAnnouncement.objects.count(), 1)
+        send_events.assert_called_once()
+        self.assertEqual(
+            send_events.call_args.args[0][0][0],
+            f"course_{self.course.id}_announcements",
+        )
 
 
 class NotificationViewTests(TestCase):
@@ -113,6 +191,184 @@ class NotificationViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 1)
 
+    def enroll_with_announcements(self):
+        teacher = User.objects.create_user(username="teacher", password="pass")
+        course = Course.objects.create(title="Course", teacher=teacher)
+        CourseAnnouncement.objects.create(course=course, message="Before enrolling")
+        Enrollment.objects.create(course=course, student=self.user)
+        first = CourseAnnouncement.objects.create(course=course, message="First")
+        second = CourseAnnouncement.objects.create(course=course, message="Second")
+        return first, second
+
+    def test_list_merges_announcements(self):
+        """Test that announcements since enrolling are listed newest first."""
+        first, second = self.enroll_with_announcements()
+
+        response = self.client.get("/api/notifications/")
+        self.assertEqual(
+            [item["id"] for item in response.data],
+            [f"announcement-{second.id}", f"announcement-{first.id}"]
+            + [self.notification.id],
+        )
+        self.assertFalse(response.data[0]["is_read"])
+        self.assertEqual(response.data[0]["recipient"], "testuser")
+
+    def test_mark_announcement_read(self):
+        """Test that marking an announcement read moves the course cursor."""
+        first, second = self.enroll_with_announcements()
+
+        response = self.client.patch(f"/api/notifications/announcement-{first.id}/")
+        self.assertEqual(response.status_code, 200)
+        read = {
+            item["id"]: item["is_read"]
+            for item in self.client.get("/api/notifications/").data
+        }
+        self.assertTrue(read[f"announcement-{first.id}"])
+        self.assertFalse(read[f"announcement-{second.id}"])
+
+        self.client.post("/api/notifications/mark_all_read/")
+        data = self.client.get("/api/notifications/").data
+        self.assertTrue(all(item["is_read"] for item in data))
+
+        for pk in ["announcement-0", "announcement-x"]:
+            response = self.client.patch(f"/api/notifications/{pk}/")
+            self.assertEqual(response.status_code, 404)
+
+    def test_feed_is_keyset_paginated(self):
+        """Test paging through notifications and announcements together."""
+        first, _ = self.enroll_with_announcements()
+        for i in range(3):
+            create_notification(self.user, f"Notification {i}")
+
+        response = self.client.get("/api/notifications/?limit=4")
+        self.assertEqual(len(response.data), 4)
+        self.assertIn('rel="prev"', response["Link"])
+        older = response["Link"].split(";")[0].strip("<>")
+        rest = self.client.get(older).data
+
+        self.assertEqual(
+            [item["message"] for item in response.data + rest],
+            [
+                "Notification 2",
+                "Notification 1",
+                "Notification 0",
+                "Second",
+                "First",
+                "Test notification",
+            ],
+        )
+        self.assertEqual(rest[0]["id"], f"announcement-{first.id}")
+
+    def test_unread_filter_and_count(self):
+        """Test the unread filter and the maintained unread count."""
+        first, _ = self.enroll_with_announcements()
+        self.client.patch(f"/api/notifications/{self.notification.id}/")
+        self.client.patch(f"/api/notifications/announcement-{first.id}/")
+        create_notification(self.user, "Unread")
+
+        response = self.client.get("/api/notifications/?unread=true")
+        self.assertEqual(
+            [item["message"] for item in response.data], ["Unread", "Second"]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/notifications/unread_count/")
+        self.assertEqual(response.data, {"unread_count": 2})
+        # Personal notifications come from the counter, not from counting rows
+        self.assertFalse(
+            any('FROM "notifications_notification"' in q["sql"] for q in queries)
+        )
+
+        create_notification(self.user, "Another")
+        response = self.client.get("/api/notifications/unread_count/")
+        self.assertEqual(response.data["unread_count"], 3)
+
+    def test_digest_counts_as_unread_once(self):
+        """Test that a digest only adds to the unread count when it was read."""
+        teacher = User.objects.create_user(username="teacher", password="pass")
+        course = Course.objects.create(title="Course", teacher=self.user)
+        for name in ["a", "b"]:
+            student = User.objects.create_user(username=name, password="pass")
+            create_course_enrollment_notification(
+                Enrollment.objects.create(course=course, student=student)
+            )
+        self.assertEqual(get_unread_count(self.user), 1)
+
+        self.client.post("/api/notifications/mark_all_read/")
+        create_course_enrollment_notification(
+            Enrollment.objects.create(course=course, student=teacher)
+        )
+        self.assertEqual(get_unread_count(self.user), 1)
+
+    def test_mark_all_read_updates_only_unread(self):
+        """Test that marking all read reports the notifications it changed."""
+        Notification.objects.create(recipient=self.user, message="Read", is_read=True)
+        create_notification(self.user, "Unread")
+
+        response = self.client.post("/api/notifications/mark_all_read/")
+        self.assertEqual(response.data, {"status": "success", "updated": 2})
+        response = self.client.get("/api/notifications/unread_count/")
+        self.assertEqual(response.data["unread_count"], 0)
+        response = self.client.post("/api/notifications/mark_all_read/")
+        self.assertEqual(response.data["updated"], 0)
+
+
+
+class PruneNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.other = User.objects.create_user(username="other", password="pass")
+
+    def test_prune_expired_read_notifications(self):
+        """Test that only read notifications past the retention age are deleted."""
+        old = timezone.now() - timedelta(days=100)
+        expired = Notification.objects.bulk_create(
+            Notification(recipient=self.user, message=f"Old {i}", is_read=True)
+            for i in range(5)
+        )
+        unread = Notification.objects.create(recipient=self.user, message="Unread")
+        recent = Notification.objects.create(
+            recipient=self.user, message="Recent", is_read=True
+        )
+        Notification.objects.filter(
+            id__in=[n.id for n in expired] + [unread.id]
+        ).update(created_at=old)
+
+        out = StringIO()
+        call_command(
+            "prune_notifications", days=90, max_per_user=0, batch_size=2, stdout=out
+        )
+
+        self.assertEqual(
+            set(Notification.objects.values_list("id", flat=True)),
+            {unread.id, recent.id},
+        )
+        self.assertIn("Removed 5 notifications (5 expired", out.getvalue())
+
+    def test_prune_keeps_newest_per_user(self):
+        """Test that each user keeps only their newest notifications."""
+        for i in range(7):
+            create_notification(self.user, f"Notification {i}")
+        create_notification(self.other, "Other")
+        # Counted as unread on creation
+        self.assertEqual(get_unread_count(self.user), 7)
+
+        out = StringIO()
+        call_command(
+            "prune_notifications", days=0, max_per_user=3, batch_size=2, stdout=out
+        )
+
+        self.assertEqual(
+            list(
+                Notification.objects.filter(recipient=self.user)
+                .order_by("-id")
+                .values_list("message", flat=True)
+            ),
+            ["Notification 6", "Notification 5", "Notification 4"],
+        )
+        self.assertTrue(Notification.objects.filter(recipient=self.other).exists())
+        self.assertIn("4 over the per-user limit", out.getvalue())
+        self.assertEqual(get_unread_count(self.user), 3)
 
 
 @override_settings(
@@ -140,3 +396,195 @@ class NotificationConsumerTests(TestCase):
         self.assertIn("type", response)
 
         await communicator.disconnect()
+
+    async def test_consumer_receives_course_announcements(self):
+        """Test that sockets of enrolled students get course announcements."""
+        user = await self.create_test_user()
+        course = await sync_to_async(self.enroll)(user)
+        token = str(AccessToken.for_user(user))
+
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(), f"/ws/notifications/?token={token}"
+        )
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        await get_channel_layer().group_send(
+            f"course_{course.id}_announcements",
+            {"type": "announcement_message", "message": "Hi", "announcement_id": 7},
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["notification_id"], "announcement-7")
+        self.assertEqual(response["message"], "Hi")
+
+        await communicator.disconnect()
+
+    async def test_consumer_replays_missed_events(self):
+        """Test that a reconnecting socket gets what it missed, oldest first."""
+        user = await self.create_test_user()
+        course = await sync_to_async(self.enroll)(user)
+        seen = await sync_to_async(create_notification)(user, "Seen")
+        first = await sync_to_async(create_notification)(user, "First")
+        announcement = await sync_to_async(CourseAnnouncement.objects.create)(
+            course=course, message="Announcement"
+        )
+        second = await sync_to_async(create_notification)(user, "Second")
+        token = str(AccessToken.for_user(user))
+
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(),
+            f"/ws/notifications/?token={token}&last_id={seen.id}"
+            "&last_announcement_id=0",
+        )
+        await communicator.connect()
+        self.assertEqual(
+            (await communicator.receive_json_from())["type"], "connection_status"
+        )
+        replayed = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual(
+            [event["notification_id"] for event in replayed],
+            [first.id, f"announcement-{announcement.id}", second.id],
+        )
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {"type": "replay_complete", "count": 3, "has_more": False},
+        )
+
+        # Live copies of replayed events are not sent twice
+        channel_layer = get_channel_layer()
+        await channel_layer.group_send(
+            f"user_{user.id}_notifications",
+            {
+                "type": "notification_message",
+                "message": "Second",
+                "notification_id": second.id,
+            },
+        )
+        await channel_layer.group_send(
+            f"user_{user.id}_notifications",
+            {
+                "type": "notification_message",
+                "message": "Live",
+                "notification_id": 999,
+            },
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["notification_id"], 999)
+
+        await communicator.disconnect()
+
+    @override_settings(NOTIFICATION_REPLAY_LIMIT=2)
+    async def test_consumer_replay_is_bounded(self):
+        """Test that only NOTIFICATION_REPLAY_LIMIT events are replayed."""
+        user = await self.create_test_user()
+        for i in range(3):
+            await sync_to_async(create_notification)(user, f"Notification {i}")
+        token = str(AccessToken.for_user(user))
+
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(),
+            f"/ws/notifications/?token={token}&last_id=0",
+        )
+        await communicator.connect()
+        await communicator.receive_json_from()
+        replayed = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertEqual(
+            [event["message"] for event in replayed],
+            ["Notification 0", "Notification 1"],
+        )
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {"type": "replay_complete", "count": 2, "has_more": True},
+        )
+
+        await communicator.disconnect()
+
+    def enroll(self, user):
+        teacher = User.objects.create_user(username="teacher", password="pass")
+        course = Course.objects.create(title="Course", teacher=teacher)
+        Enrollment.objects.create(course=course, student=user)
+        return course
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+)
+class NotificationStreamTests(TestCase):
+    async def open_stream(self, user, **headers):
+        token = str(AccessToken.for_user(user))
+        response = await AsyncClient().get(
+            f"/api/notifications/stream/?token={token}", headers=headers
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return response, aiter(response.streaming_content)
+
+    async def read(self, stream):
+        return (await anext(stream)).decode()
+
+    async def test_stream_requires_token(self):
+        """Test that the stream rejects requests without a valid token."""
+        response = await AsyncClient().get("/api/notifications/stream/?token=bad")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_sends_live_notifications(self):
+        """Test that group events are streamed with resumable IDs."""
+        user = await sync_to_async(User.objects.create_user)(
+            username="reader", password="pass"
+        )
+        seen = await sync_to_async(create_notification)(user, "Seen")
+        response, stream = await self.open_stream(user)
+
+        connected = await self.read(stream)
+        self.assertIn(f"id: {seen.id}:0\n", connected)
+        self.assertIn("event: connection_status\n", connected)
+
+        await get_channel_layer().group_send(
+            f"user_{user.id}_notifications",
+            {"type": "notification_message", "message": "Hi", "notification_id": 42},
+        )
+        message = await self.read(stream)
+        self.assertTrue(message.startswith("id: 42:0\nevent: notification\n"))
+        self.assertIn('"message": "Hi"', message)
+
+        with override_settings(NOTIFICATION_STREAM_HEARTBEAT_SECONDS=0.01):
+            await get_channel_layer().group_send(
+                f"user_{user.id}_notifications", {"type": "chat_message"}
+            )
+            self.assertEqual(await self.read(stream), ": heartbeat\n\n")
+        await stream.aclose()
+
+    async def test_stream_ends_for_deactivated_user(self):
+        """Test that the stream closes at the next heartbeat after deactivation."""
+        user = await sync_to_async(User.objects.create_user)(
+            username="reader", password="pass"
+        )
+        response, stream = await self.open_stream(user)
+        await self.read(stream)
+
+        await User.objects.filter(id=user.id).aupdate(is_active=False)
+        with override_settings(NOTIFICATION_STREAM_HEARTBEAT_SECONDS=0.01):
+            with self.assertRaises(StopAsyncIteration):
+                await self.read(stream)
+
+        response = await AsyncClient().get(
+            f"/api/notifications/stream/?token={AccessToken.for_user(user)}"
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_resumes_from_last_event_id(self):
+        """Test that a reconnecting stream replays what it missed."""
+        user = await sync_to_async(User.objects.create_user)(
+            username="reader", password="pass"
+        )
+        seen = await sync_to_async(create_notification)(user, "Seen")
+        missed = await sync_to_async(create_notification)(user, "Missed")
+        response, stream = await self.open_stream(
+            user, **{"Last-Event-ID": f"{seen.id}:0"}
+        )
+
+        await self.read(stream)
+        replayed = await self.read(stream)
+        self.assertIn(f"id: {missed.id}:0\n", replayed)
+        self.assertIn('"message": "Missed"', replayed)
+        self.assertIn('"has_more": false', await self.read(stream))
+        await stream.aclose()
@@ -4,15 +4,48 @@ Notification Views
 
 This module contains views for handling notifications in the e-learning platform,
 including listing, marking as read, and other notification-related operations.
+Course announcements are merged into the notification list when it is read.
+Clients that cannot keep a WebSocket open can follow the same real-time events
+through the Server-Sent Events stream instead of polling the list.
 """
 
+import asyncio
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from courses.models import Enrollment
 from .models import Notification
-from .serializers import NotificationSerializer
+from .pagination import NotificationPagination
+from .serializers import (
+    ANNOUNCEMENT_ID_PREFIX,
+    AnnouncementSerializer,
+    NotificationSerializer,
+)
+from .services import (
+    announcement_group_name,
+    get_latest_event_ids,
+    get_missed_events,
+    get_unread_count,
+    get_user_announcements,
+    mark_all_announcements_read,
+    mark_all_notifications_read,
+    mark_announcement_read,
+    mark_notification_read,
+)
+
+User = get_user_model()
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -20,13 +53,15 @@ class NotificationViewSet(viewsets.ModelViewSet):
     ViewSet for handling notifications.
 
     Provides endpoints for:
-    - Listing unread notifications
-    - Marking all notifications as read
-    - Marking a single notification as read
+    - Listing notifications, merged with the announcements of the user's courses
+    - Counting unread notifications and announcements
+    - Marking all notifications and announcements as read
+    - Marking a single notification or announcement ("announcement-<id>") as read
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
     http_method_names = ["get", "post", "patch"]
 
     def get_queryset(self):
@@ -36,23 +71,61 @@ class NotificationViewSet(viewsets.ModelViewSet):
         Returns:
             QuerySet: Notifications for the current user, ordered by creation date
         """
-        return Notification.objects.filter(recipient=self.request.user).order_by(
-            "-created_at"
+        return (
+            Notification.objects.filter(recipient=self.request.user)
+            .select_related("recipient")
+            .order_by("-created_at")
         )
 
     def list(self, request: Request) -> Response:
         """
-        List all unread notifications for the authenticated user.
+        List the notifications of the authenticated user.
+
+        Personal notifications and the announcements of the user's courses are
+        merged into one feed, newest first, and keyset-paginated on
+        (created_at, id). Pass unread=true to list only unread items.
+
+        Args:
+            request: The incoming HTTP request
+
+        Returns:
+            Response: One page of serialized notification and announcement data
+        """
+        notifications = self.get_queryset()
+        announcements = get_user_announcements(request.user)
+        if request.query_params.get("unread", "").lower() in ("1", "true"):
+            notifications = notifications.filter(is_read=False)
+            announcements = announcements.filter(is_read=False)
+
+        page = self.paginator.paginate_querysets(
+            [notifications, announcements], request, view=self
+        )
+        context = self.get_serializer_context()
+        data = [
+            (
+                NotificationSerializer(item, context=context)
+                if isinstance(item, Notification)
+                else AnnouncementSerializer(item, context=context)
+            ).data
+            for item in page
+        ]
+        return self.get_paginated_response(data)
+
+    @action(detail=False, methods=["get"], url_path="unread_count")
+    def unread_count(self, request: Request) -> Response:
+        """
+        Get the number of unread notifications and announcements.
 
         Args:
             request: The incoming HTTP request
 
         Returns:
-            Response: Serialized notification data
+            Response: The unread count
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return Response(
+            {"unread_count": get_unread_count(request.user)},
+            status=status.HTTP_200_OK,
+        )
 
     @action(detail=False, methods=["post"], url_path="mark_all_read")
     def mark_all_read(self, request: Request) -> Response:
@@ -63,29 +136,256 @@ class NotificationViewSet(viewsets.ModelViewSet):
             request: The incoming HTTP request
 
         Returns:
-            Response: Success status
+            Response: Success status and the number of notifications updated
         """
-        queryset = self.get_queryset()
-        queryset.update(is_read=True)
-        return Response({"status": "success"}, status=status.HTTP_200_OK)
+        updated = mark_all_notifications_read(request.user)
+        mark_all_announcements_read(request.user)
+        return Response(
+            {"status": "success", "updated": updated}, status=status.HTTP_200_OK
+        )
 
     def partial_update(self, request: Request, pk: str = None) -> Response:
         """
         Mark a specific notification as read.
 
+        Marking an announcement read also marks the older announcements of its
+        course as read, since announcements are tracked with a read cursor.
+
         Args:
             request: The incoming HTTP request
-            pk: Primary key of the notification to update
+            pk: Primary key of the notification, or "announcement-<id>"
 
         Returns:
             Response: Success status or error message
         """
-        try:
-            notification = self.get_queryset().get(id=pk)
-            notification.is_read = True
-            notification.save()
+        if pk.startswith(ANNOUNCEMENT_ID_PREFIX):
+            announcement_id = pk[len(ANNOUNCEMENT_ID_PREFIX) :]
+            announcement = None
+            if announcement_id.isdigit():
+                announcement = (
+                    get_user_announcements(request.user)
+                    .filter(id=announcement_id)
+                    .first()
+                )
+            if announcement is None:
+                return Response(
+                    {"error": "Notification not found"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            mark_announcement_read(request.user, announcement)
             return Response({"status": "success"}, status=status.HTTP_200_OK)
-        except Notification.DoesNotExist:
+
+        if not pk.isdigit() or not mark_notification_read(request.user, int(pk)):
             return Response(
                 {"error": "Notification not found"}, status=status.HTTP_404_NOT_FOUND
             )
+        return Response({"status": "success"}, status=status.HTTP_200_OK)
+
+
+def format_sse(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    """
+    Format one Server-Sent Events message.
+
+    Args:
+        event: Event name the client listens for
+        data: Payload, sent as JSON
+        event_id: ID the client sends back as Last-Event-ID when reconnecting
+
+    Returns:
+        str: The message, terminated by a blank line
+    """
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Parse the Last-Event-ID of a reconnecting stream.
+
+    Args:
+        value: Header value, "<notification id>:<announcement id>"
+
+    Returns:
+        Optional[Tuple[int, int]]: The IDs, or None if missing or invalid
+    """
+    last_id, _, last_announcement_id = (value or "").partition(":")
+    if not (last_id.isdigit() and last_announcement_id.isdigit()):
+        return None
+    return int(last_id), int(last_announcement_id)
+
+
+def is_active_user(user_id: int) -> bool:
+    """
+    Check whether a user still exists and is allowed to sign in.
+
+    Args:
+        user_id: ID of the user
+
+    Returns:
+        bool: True if the user is active
+    """
+    return User.objects.filter(id=user_id, is_active=True).exists()
+
+
+async def stream_notifications(
+    user_id: int, cursor: Optional[Tuple[int, int]]
+) -> AsyncIterator[str]:
+    """
+    Yield a user's notification events as Server-Sent Events.
+
+    The stream subscribes to the same channel layer groups as
+    NotificationConsumer. With a cursor, the events missed since it are
+    replayed first, like a reconnecting WebSocket. Every event carries the
+    newest notification and announcement IDs sent so far as its ID, so the
+    client can resume from it. The user is checked again on every heartbeat,
+    and the stream ends once they have been deactivated or deleted.
+
+    Args:
+        user_id: ID of the authenticated user
+        cursor: (notification ID, announcement ID) from Last-Event-ID
+
+    Yields:
+        str: Server-Sent Events messages and heartbeat comments
+    """
+    channel_layer = get_channel_layer()
+    channel = await channel_layer.new_channel()
+    course_ids = await sync_to_async(list)(
+        Enrollment.objects.filter(student_id=user_id).values_list(
+            "course_id", flat=True
+        )
+    )
+    groups = [f"user_{user_id}_notifications"] + [
+        announcement_group_name(course_id) for course_id in course_ids
+    ]
+    # Groups are joined before the replay is read, so nothing is lost in between
+    for group in groups:
+        await channel_layer.group_add(group, channel)
+
+    try:
+        replayed = set()
+        if cursor is None:
+            last_id, last_announcement_id = await sync_to_async(get_latest_event_ids)(
+                user_id
+            )
+            missed, has_more = [], False
+        else:
+            last_id, last_announcement_id = cursor
+            missed, has_more = await sync_to_async(get_missed_events)(
+                user_id, last_id, last_announcement_id
+            )
+
+        yield format_sse(
+            "connection_status",
+            {"type": "connection_status", "status": "connected", "user_id": user_id},
+            f"{last_id}:{last_announcement_id}",
+        )
+
+        def to_message(event):
+            nonlocal last_id, last_announcement_id
+            if event["type"] == "notification_message":
+                key = event["notification_id"]
+                last_id = max(last_id, key)
+            else:
+                key = f"{ANNOUNCEMENT_ID_PREFIX}{event['announcement_id']}"
+                last_announcement_id = max(
+                    last_announcement_id, event["announcement_id"]
+                )
+            return key, format_sse(
+                "notification",
+                {
+                    "type": "notification",
+                    "message": event.get("message", ""),
+                    "notification_id": key,
+                },
+                f"{last_id}:{last_announcement_id}",
+            )
+
+        for event in missed:
+            key, message = to_message(event)
+            replayed.add(key)
+            yield message
+        if cursor is not None:
+            yield format_sse(
+                "replay_complete",
+                {"type": "replay_complete", "count": len(missed), "has_more": has_more},
+            )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_AGE_SECONDS
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(
+                    channel_layer.receive(channel),
+                    timeout=min(
+                        settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS, remaining
+                    ),
+                )
+            except asyncio.TimeoutError:
+                if not await sync_to_async(is_active_user)(user_id):
+                    break
+                yield ": heartbeat\n\n"
+                continue
+
+            if event.get("type") not in (
+                "notification_message",
+                "announcement_message",
+            ):
+                continue
+            key, message = to_message(event)
+            # Live copies of replayed events are not sent twice
+            if key not in replayed:
+                yield message
+    finally:
+        for group in groups:
+            await channel_layer.group_discard(group, channel)
+
+
+async def notification_stream(request: HttpRequest):
+    """
+    Stream the authenticated user's notifications as Server-Sent Events.
+
+    One long-lived response replaces polling the notification list when
+    WebSockets are unavailable. EventSource cannot send headers, so the access
+    token may be passed as ?token= instead of in the Authorization header. A
+    reconnecting EventSource sends Last-Event-ID and gets the events it missed.
+
+    Args:
+        request: The incoming HTTP request
+
+    Returns:
+        StreamingHttpResponse: The event stream, or an error response
+    """
+    if request.method != "GET":
+        return JsonResponse(
+            {"error": "Method not allowed"}, status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    token = request.GET.get("token")
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        token = authorization[len("Bearer ") :]
+    try:
+        user_id = AccessToken(token)["user_id"] if token else None
+    except TokenError:
+        user_id = None
+    if not user_id or not await sync_to_async(is_active_user)(user_id):
+        return JsonResponse(
+            {"error": "Authentication credentials were not provided or are invalid"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    if get_channel_layer() is None:
+        return JsonResponse(
+            {"error": "Real-time notifications are not available"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    cursor = parse_last_event_id(request.headers.get("Last-Event-ID"))
+    response = StreamingHttpResponse(
+        stream_notifications(user_id, cursor), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies such as nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
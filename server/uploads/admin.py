@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import UploadSession
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("filename", "owner", "size", "received", "status", "updated_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("owner__username", "filename", "sha256")
+    ordering = ("-updated_at",)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class UploadsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "uploads"
+
+    def ready(self):
+        from django_cleanup.signals import cleanup_post_delete
+        from .derivatives import delete_derivatives
+
+        # Remove derivatives together with the file they were made from
+        cleanup_post_delete.connect(delete_derivatives)
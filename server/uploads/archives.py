@@ -0,0 +1,261 @@
+"""
+Streaming ZIP Archives
+======================
+
+This module builds ZIP archives of stored files on the fly and reads uploaded
+ones. Entries are read and written block by block, so memory use does not
+depend on the number or size of the files. Formats that are already compressed
+are stored as is rather than deflated again.
+"""
+
+import hashlib
+import logging
+import os
+import zipfile
+import zlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files import File
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from each file at a time
+ARCHIVE_BLOCK_SIZE = 64 * 1024
+
+# Formats with their own compression, which deflate cannot shrink further
+STORED_EXTENSIONS = {
+    ".7z",
+    ".avi",
+    ".bz2",
+    ".docx",
+    ".epub",
+    ".gif",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".m4a",
+    ".mkv",
+    ".mov",
+    ".mp3",
+    ".mp4",
+    ".odp",
+    ".ods",
+    ".odt",
+    ".ogg",
+    ".pdf",
+    ".png",
+    ".pptx",
+    ".rar",
+    ".webm",
+    ".webp",
+    ".xlsx",
+    ".xz",
+    ".zip",
+}
+
+
+class ArchiveError(Exception):
+    """Raised when an uploaded archive is invalid or exceeds the import limits."""
+
+
+class ArchiveEntry(File):
+    """File reading an archive entry, reporting corrupt data as ArchiveError."""
+
+    def read(self, *args, **kwargs):
+        try:
+            return self.file.read(*args, **kwargs)
+        except (zipfile.BadZipFile, EOFError, zlib.error) as e:
+            raise ArchiveError(f"Could not extract {self.name}: {str(e)}")
+
+
+class ZipStream:
+    """
+    Write-only buffer that ZipFile writes into and the generator drains.
+
+    It has no tell() or seek(), so ZipFile writes data descriptors after each
+    entry instead of seeking back to patch the local headers.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and clear everything written since the last drain."""
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def archive_entry_name(title, name, used):
+    """
+    Build a unique, flat archive name for a file from its title.
+
+    Args:
+        title: Display title of the file
+        name: Name of the file in the storage, used for the extension
+        used: Set of names already in the archive, updated in place
+
+    Returns:
+        str: Name of the entry in the archive
+    """
+    extension = os.path.splitext(name)[1].lower()
+    base = title.replace("/", "_").replace("\\", "_").strip() or "file"
+    if base.lower().endswith(extension):
+        base = base[: -len(extension)]
+
+    candidate = f"{base}{extension}"
+    number = 2
+    while candidate.lower() in used:
+        candidate = f"{base} ({number}){extension}"
+        number += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def get_archive_fingerprint(entries):
+    """
+    Fingerprint a set of archive entries.
+
+    Stored names change whenever a file's content does, so the fingerprint only
+    needs the entry names and stored names, not the file contents.
+
+    Args:
+        entries: Iterable of (archive name, stored name) pairs
+
+    Returns:
+        str: Hex digest identifying the archive's content
+    """
+    hasher = hashlib.sha256()
+    for arcname, name in entries:
+        hasher.update(f"{arcname}\0{name}\n".encode())
+    return hasher.hexdigest()
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of files on disk as it is written.
+
+    Files that have gone missing from the storage are skipped, since the
+    response has already started when they are reached.
+
+    Args:
+        entries: Iterable of (archive name, absolute path) pairs
+
+    Yields:
+        bytes: Consecutive parts of the archive
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode="w", allowZip64=True) as archive:
+        for arcname, path in entries:
+            try:
+                source = open(path, "rb")
+            except OSError as e:
+                logger.warning(f"Skipping {arcname} in archive: {str(e)}")
+                continue
+
+            with source:
+                stat = os.fstat(source.fileno())
+                info = zipfile.ZipInfo(
+                    arcname, datetime.fromtimestamp(stat.st_mtime).timetuple()[:6]
+                )
+                info.file_size = stat.st_size
+                if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+
+                with archive.open(info, mode="w") as entry:
+                    for block in iter(lambda: source.read(ARCHIVE_BLOCK_SIZE), b""):
+                        entry.write(block)
+                        if stream.chunks:
+                            yield stream.drain()
+            # The data descriptor is written when the entry is closed
+            yield stream.drain()
+    # The central directory is written when the archive is closed
+    yield stream.drain()
+
+
+def archive_members(archive):
+    """
+    List the files of an uploaded archive after checking the import limits.
+
+    Directories, hidden files and macOS resource forks are left out. The limits
+    are checked against the sizes declared in the central directory before
+    anything is extracted, and zipfile stops reading an entry at its declared
+    size, so an archive cannot expand beyond what was checked.
+
+    Args:
+        archive: Open ZipFile
+
+    Returns:
+        list: ZipInfo of each file to import
+
+    Raises:
+        ArchiveError: If the archive is empty or exceeds a limit
+    """
+    members = []
+    total_size = 0
+    for info in archive.infolist():
+        parts = info.filename.replace("\\", "/").split("/")
+        if info.is_dir() or parts[0] == "__MACOSX" or parts[-1].startswith("."):
+            continue
+        if info.flag_bits & 0x1:
+            raise ArchiveError("Encrypted archives are not supported")
+        if info.compress_size and (
+            info.file_size / info.compress_size > settings.ARCHIVE_MAX_RATIO
+        ):
+            raise ArchiveError(f"{parts[-1]} has a suspicious compression ratio")
+        total_size += info.file_size
+        members.append(info)
+
+    if not members:
+        raise ArchiveError("The archive contains no files")
+    if len(members) > settings.ARCHIVE_MAX_FILES:
+        raise ArchiveError(
+            f"Archives may contain at most {settings.ARCHIVE_MAX_FILES} files"
+        )
+    if total_size > settings.ARCHIVE_MAX_SIZE:
+        raise ArchiveError(
+            f"Archives may not expand to more than {settings.ARCHIVE_MAX_SIZE} bytes"
+        )
+    return members
+
+
+def extract_zip(file):
+    """
+    Yield the files of an uploaded ZIP archive one at a time.
+
+    Each file is decompressed while it is read, so nothing is extracted to
+    memory or disk in full.
+
+    Args:
+        file: Seekable file object of the archive
+
+    Yields:
+        tuple: (base filename, File streaming the entry's content)
+
+    Raises:
+        ArchiveError: If the file is not a valid archive or exceeds the limits
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise ArchiveError(f"Invalid ZIP archive: {str(e)}")
+
+    with archive:
+        for info in archive_members(archive):
+            filename = os.path.basename(info.filename.replace("\\", "/"))
+            try:
+                entry = archive.open(info)
+            except (zipfile.BadZipFile, NotImplementedError) as e:
+                raise ArchiveError(f"Could not extract {filename}: {str(e)}")
+            with entry:
+                yield filename, ArchiveEntry(entry, name=filename)
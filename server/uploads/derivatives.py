@@ -0,0 +1,207 @@
+"""
+Media Derivatives
+=================
+
+This module generates fixed-size derivatives of uploaded images, such as
+avatars and thumbnails, in a background process pool, and exposes them once
+they are ready.
+
+Derivatives have deterministic names, ``derivatives/<spec>/<source name>.jpg``,
+so whether one is ready is a single file system check and no database state is
+needed. They are rendered after the upload's transaction commits and never
+block the request. Pillow cannot rasterize PDFs or videos, so only image
+uploads get derivatives.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .signing import signed_media_url
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = "derivatives"
+
+# Spec name -> (width, height, crop). Cropped specs fill the exact size, the
+# others fit inside it keeping the aspect ratio.
+DERIVATIVE_SPECS = {
+    "avatar_64": (64, 64, True),
+    "avatar_256": (256, 256, True),
+    "thumb_320": (320, 320, False),
+    "preview_1280": (1280, 1280, False),
+}
+
+# Derivatives generated for each kind of upload
+DERIVATIVE_KINDS = {
+    "avatar": ["avatar_64", "avatar_256"],
+    "thumbnail": ["thumb_320", "preview_1280"],
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the shared process pool, creating it on first use.
+
+    Workers are spawned rather than forked, so they never inherit the parent's
+    database connections or event loop.
+
+    Returns:
+        ProcessPoolExecutor: Pool sized by DERIVATIVE_PROCESSES
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.DERIVATIVE_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def derivative_name(name, spec):
+    """
+    Return the storage name of a derivative of a stored file.
+
+    Args:
+        name: Name of the source file in the media storage
+        spec: Derivative spec name
+
+    Returns:
+        str: Deterministic name of the derivative
+    """
+    return f"{DERIVATIVE_DIR}/{spec}/{os.path.splitext(name)[0]}.jpg"
+
+
+def has_derivatives(name):
+    """Whether derivatives can be generated for a stored file."""
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def render_derivatives(source_path, targets):
+    """
+    Render derivatives of an image file. Runs in a pool worker.
+
+    Each derivative is written to a temporary file and renamed into place, so a
+    derivative that exists is always complete.
+
+    Args:
+        source_path: Absolute path of the source image
+        targets: (absolute path, width, height, crop) for each derivative
+
+    Returns:
+        int: Number of derivatives written
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white, since JPEG has no alpha channel
+            source = source.convert("RGBA")
+            background = Image.new("RGB", source.size, "white")
+            background.paste(source, mask=source.getchannel("A"))
+            source = background
+        else:
+            source = source.convert("RGB")
+
+        for path, width, height, crop in targets:
+            if crop:
+                image = ImageOps.fit(source, (width, height), Image.LANCZOS)
+            else:
+                image = source.copy()
+                image.thumbnail((width, height), Image.LANCZOS)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            image.save(temp_path, "JPEG", quality=85, optimize=True)
+            os.replace(temp_path, path)
+    return len(targets)
+
+
+def _log_failure(name, future):
+    """Log a derivative job that failed in the pool."""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Error generating derivatives for {name}: {str(error)}")
+
+
+def schedule_derivatives(file, kind):
+    """
+    Generate derivatives of a saved file once the current transaction commits.
+
+    Returns immediately; the work runs in the process pool.
+
+    Args:
+        file: The FieldFile that was saved
+        kind: Kind of derivatives to generate, a key of DERIVATIVE_KINDS
+    """
+    if not file or not has_derivatives(file.name):
+        return
+
+    name = file.name
+    targets = [
+        (default_storage.path(derivative_name(name, spec)), *DERIVATIVE_SPECS[spec])
+        for spec in DERIVATIVE_KINDS[kind]
+    ]
+
+    def submit():
+        try:
+            future = get_executor().submit(
+                render_derivatives, default_storage.path(name), targets
+            )
+        except Exception as e:
+            logger.error(f"Error scheduling derivatives for {name}: {str(e)}")
+            return
+        future.add_done_callback(lambda f: _log_failure(name, f))
+
+    transaction.on_commit(submit)
+
+
+def get_derivative_urls(name, kind, request=None):
+    """
+    Get signed URLs of the derivatives of a file that are ready.
+
+    Args:
+        name: Name of the source file in the media storage
+        kind: Kind of derivatives, a key of DERIVATIVE_KINDS
+        request: Request used to make the URLs absolute, if available
+
+    Returns:
+        dict: Spec name -> signed URL, empty until derivatives exist
+    """
+    if not name or not has_derivatives(name):
+        return {}
+
+    urls = {}
+    for spec in DERIVATIVE_KINDS[kind]:
+        derivative = derivative_name(name, spec)
+        if default_storage.exists(derivative):
+            urls[spec] = signed_media_url(derivative, request)
+    return urls
+
+
+def delete_derivatives(sender, file_name=None, **kwargs):
+    """
+    Delete a file's derivatives after django_cleanup deleted the file.
+
+    Connected to django_cleanup's cleanup_post_delete signal.
+    """
+    if not file_name or not has_derivatives(file_name):
+        return
+    for spec in DERIVATIVE_SPECS:
+        try:
+            os.remove(default_storage.path(derivative_name(file_name, spec)))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,48 @@
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.management.base import BaseCommand
+from uploads.signing import signed_media_url, verify_media_signature
+
+
+class Command(BaseCommand):
+    """Measure the cost of signing and verifying media links.
+
+    Verification is what every signed download pays instead of an access check
+    against the database, so it should stay in the low microseconds.
+    """
+
+    help = "Benchmark signing and verification of media download URLs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100000,
+            help="Number of signatures to create and verify",
+        )
+        parser.add_argument(
+            "--name",
+            default="course_materials/ab/cd/lecture-01-introduction.pdf",
+            help="Media file name to sign",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        name = options["name"]
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            url = signed_media_url(name)
+        sign_time = time.perf_counter() - start
+
+        params = dict(parse_qsl(urlsplit(url).query))
+        start = time.perf_counter()
+        for _ in range(iterations):
+            verify_media_signature(name, params)
+        verify_time = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Signing: {sign_time / iterations * 1e6:.2f} us per URL\n"
+            f"Verification: {verify_time / iterations * 1e6:.2f} us per request"
+        )
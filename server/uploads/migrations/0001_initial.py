@@ -0,0 +1,94 @@
+# Generated by Django 5.1.3 on 2026-10-17 01:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        help_text="Upload ID used to send chunks and attach the file",
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "filename",
+                    models.CharField(
+                        help_text="Original name of the uploaded file", max_length=255
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(
+                        help_text="Total size of the file in bytes"
+                    ),
+                ),
+                (
+                    "received",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Bytes written so far; the offset of the next chunk",
+                    ),
+                ),
+                (
+                    "sha256",
+                    models.CharField(
+                        blank=True,
+                        help_text="Hex SHA-256 digest of the content, set when finalized",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("complete", "Complete"),
+                            ("attached", "Attached"),
+                        ],
+                        default="pending",
+                        help_text="Whether the upload is in progress, complete or attached",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, help_text="When the upload was started"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, help_text="When the upload last changed"
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        help_text="The user uploading the file",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="upload_sessions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
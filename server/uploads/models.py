@@ -0,0 +1,91 @@
+"""
+Upload Session Model
+====================
+
+This model tracks resumable, chunked file uploads. The bytes of an upload are
+staged in a temporary file until the upload is finalized and attached to the
+object that owns it, such as a chat message or a course material.
+"""
+
+import os
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class UploadSession(models.Model):
+    """
+    Model representing a chunked upload in progress or waiting to be attached.
+
+    Attributes:
+        id (UUID): Upload ID used by the client for chunks and attaching
+        owner (User): The user uploading the file
+        filename (str): Original name of the uploaded file
+        size (int): Total size of the file in bytes, declared at init
+        received (int): Number of bytes written so far, the next chunk offset
+        sha256 (str): Hex SHA-256 of the content, set when finalized
+        status (str): Pending, complete or attached
+        created_at (datetime): When the upload was started
+        updated_at (datetime): When the last chunk or state change happened
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_COMPLETE = "complete"
+    STATUS_ATTACHED = "attached"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_COMPLETE, "Complete"),
+        (STATUS_ATTACHED, "Attached"),
+    ]
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        help_text="Upload ID used to send chunks and attach the file",
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        help_text="The user uploading the file",
+    )
+    filename = models.CharField(
+        max_length=255, help_text="Original name of the uploaded file"
+    )
+    size = models.PositiveBigIntegerField(help_text="Total size of the file in bytes")
+    received = models.PositiveBigIntegerField(
+        default=0, help_text="Bytes written so far; the offset of the next chunk"
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Hex SHA-256 digest of the content, set when finalized",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        help_text="Whether the upload is in progress, complete or attached",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, help_text="When the upload was started"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When the upload last changed"
+    )
+
+    def __str__(self):
+        """
+        String representation of the upload session.
+
+        Returns:
+            str: The filename, owner and progress of the upload
+        """
+        return f"{self.filename} by {self.owner} ({self.received}/{self.size} bytes)"
+
+    @property
+    def temp_path(self):
+        """Path of the temporary file the chunks are written to."""
+        return os.path.join(settings.UPLOAD_TEMP_DIR, f"{self.id}.part")
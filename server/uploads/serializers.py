@@ -0,0 +1,94 @@
+"""
+Upload Serializers
+==================
+
+This module contains serializers for starting chunked uploads and for
+referencing finished uploads from other resources.
+"""
+
+import os
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import UploadSession
+from .signing import signed_media_url
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for upload sessions.
+
+    Clients create a session with the filename and total size, then use the
+    returned ID and received offset to send and resume chunks.
+    """
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "filename",
+            "size",
+            "received",
+            "sha256",
+            "status",
+            "created_at",
+        ]
+        read_only_fields = ["id", "received", "sha256", "status", "created_at"]
+
+    def validate_filename(self, value):
+        """Keep only the base name of the client-supplied filename."""
+        filename = os.path.basename(value.replace("\\", "/")).strip()
+        if not filename:
+            raise serializers.ValidationError("A filename is required")
+        return filename
+
+    def validate_size(self, value):
+        """Reject empty files and files above UPLOAD_MAX_SIZE."""
+        if value <= 0:
+            raise serializers.ValidationError("Size must be positive")
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Files may not exceed {settings.UPLOAD_MAX_SIZE} bytes"
+            )
+        return value
+
+
+class CompletedUploadField(serializers.PrimaryKeyRelatedField):
+    """
+    Field resolving an upload ID to a completed upload of the requesting user.
+
+    Used by resources that accept a finished chunked upload instead of a file.
+    """
+
+    default_error_messages = {
+        "does_not_exist": 'Upload "{pk_value}" does not exist or is not complete.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("pk_field", serializers.UUIDField())
+        kwargs.setdefault("write_only", True)
+        kwargs.setdefault("required", False)
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        """Limit uploads to the request user's completed ones."""
+        request = self.context["request"]
+        return UploadSession.objects.filter(
+            owner=request.user, status=UploadSession.STATUS_COMPLETE
+        )
+
+
+class SignedFileField(serializers.FileField):
+    """
+    File field represented as a signed, expiring link to the media endpoint.
+
+    The link grants access to the file by itself, so downloads through it skip
+    the per-request access checks.
+    """
+
+    def to_representation(self, value):
+        """Return the signed URL of the stored file, or None without a file."""
+        if not value:
+            return None
+        return signed_media_url(value.name, self.context.get("request"))
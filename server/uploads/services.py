@@ -0,0 +1,275 @@
+"""
+Upload Services
+===============
+
+This module contains the logic for writing upload chunks to disk, finalizing
+uploads and handing finished uploads over to model file fields.
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.core.files import File
+from django.db import transaction
+
+from .models import UploadSession
+
+# Bytes read from the request body and written to disk at a time
+READ_BLOCK_SIZE = 64 * 1024
+
+# Running SHA-256 state per upload, so each chunk is hashed once as it is
+# written. Upload ID -> (offset the state covers, hash object). If a chunk lands
+# on another process or the entry was evicted, the staged file is rehashed.
+MAX_CACHED_HASHERS = 256
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be applied."""
+
+
+class UploadConflict(UploadError):
+    """Raised when a chunk does not start at the upload's current offset."""
+
+
+class StagedUploadFile(File):
+    """
+    A finalized upload ready to be assigned to a FileField.
+
+    The file exposes temporary_file_path(), so FileSystemStorage moves the
+    staged file into place instead of copying its content.
+    """
+
+    def __init__(self, upload):
+        super().__init__(open(upload.temp_path, "rb"), name=upload.filename)
+        self.size = upload.size
+        self.path = upload.temp_path
+
+    def temporary_file_path(self):
+        """Return the path of the staged file on disk."""
+        return self.path
+
+
+def _resume_hasher(upload, offset):
+    """
+    Return a hash object covering the first offset bytes of an upload.
+
+    Args:
+        upload: The upload session
+        offset: Number of bytes the hash must cover
+
+    Returns:
+        hashlib object: A private copy that the caller may update
+
+    Raises:
+        UploadError: If the staged file is shorter than offset
+    """
+    with _hashers_lock:
+        cached = _hashers.get(upload.pk)
+        if cached is not None and cached[0] == offset:
+            return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    if offset:
+        remaining = offset
+        try:
+            with open(upload.temp_path, "rb") as staged:
+                while remaining:
+                    block = staged.read(min(READ_BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+        except FileNotFoundError:
+            pass
+        if remaining:
+            raise UploadError("Upload data is missing, please restart the upload")
+    return hasher
+
+
+def _store_hasher(upload_id, offset, hasher):
+    """Remember the hash state of an upload after a successful chunk."""
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, hasher)
+        _hashers.move_to_end(upload_id)
+        while len(_hashers) > MAX_CACHED_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _drop_hasher(upload_id):
+    """Forget the hash state of an upload that no longer receives chunks."""
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Stream a chunk from the request body into the staged file.
+
+    The chunk is hashed while it is written. If the connection drops midway,
+    the bytes received so far are kept and the client resumes from the new offset.
+
+    Concurrent chunks for the same upload are serialized with an exclusive lock
+    on the staged file. A request that finds it taken, or that finds the offset
+    moved once it holds it, is rejected before touching the file, so a retried
+    chunk can never truncate bytes another request just wrote.
+
+    Args:
+        upload: The pending upload session
+        offset: Byte offset the chunk starts at, must equal upload.received
+        stream: File-like object to read the chunk from
+        length: Number of bytes announced for the chunk
+
+    Returns:
+        int: The new offset, i.e. the number of bytes received in total
+
+    Raises:
+        UploadConflict: If offset is not the current offset of the upload, or
+            another chunk is being written
+        UploadError: If the upload is not pending or the chunk is too large
+    """
+    if upload.status != UploadSession.STATUS_PENDING:
+        raise UploadError("Upload has already been finalized")
+    if offset + length > upload.size:
+        raise UploadError("Chunk exceeds the declared file size")
+
+    os.makedirs(os.path.dirname(upload.temp_path), exist_ok=True)
+    fd = os.open(upload.temp_path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+b") as staged:
+        try:
+            fcntl.flock(staged, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict("Another chunk of this upload is being written")
+
+        # Check against the committed state now that no other chunk can move it
+        upload.refresh_from_db(fields=["received", "status"])
+        if upload.status != UploadSession.STATUS_PENDING:
+            raise UploadError("Upload has already been finalized")
+        if offset != upload.received:
+            raise UploadConflict("Chunk offset does not match the received bytes")
+
+        hasher = _resume_hasher(upload, offset)
+
+        # Drop any bytes left behind by an interrupted chunk past the offset
+        written = 0
+        staged.seek(offset)
+        staged.truncate()
+        while written < length:
+            block = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            staged.write(block)
+            hasher.update(block)
+            written += len(block)
+        staged.flush()
+
+        received = offset + written
+        updated = UploadSession.objects.filter(
+            pk=upload.pk, received=offset, status=UploadSession.STATUS_PENDING
+        ).update(received=received)
+        if not updated:
+            raise UploadConflict("Upload was modified by another request")
+        _store_hasher(upload.pk, received, hasher)
+
+    upload.received = received
+    return received
+
+
+def finalize_upload(upload, expected_sha256=None):
+    """
+    Complete an upload once all of its bytes have been received.
+
+    Args:
+        upload: The upload session
+        expected_sha256: Optional hex digest computed by the client
+
+    Returns:
+        UploadSession: The completed upload with its sha256 set
+
+    Raises:
+        UploadError: If bytes are missing or the checksum does not match
+    """
+    if upload.status != UploadSession.STATUS_PENDING:
+        return upload
+    if upload.received != upload.size:
+        raise UploadError(
+            f"Upload is incomplete: received {upload.received} of {upload.size} bytes"
+        )
+
+    digest = _resume_hasher(upload, upload.size).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != digest:
+        raise UploadError("Checksum mismatch")
+
+    upload.sha256 = digest
+    upload.status = UploadSession.STATUS_COMPLETE
+    upload.save(update_fields=["sha256", "status", "updated_at"])
+    _drop_hasher(upload.pk)
+    return upload
+
+
+def attach_upload(upload):
+    """
+    Claim a completed upload so it can be assigned to a FileField.
+
+    Use the result as a context manager and save the model inside it:
+
+        with attach_upload(upload) as file:
+            serializer.save(file=file)
+
+    Args:
+        upload: A completed upload session
+
+    Returns:
+        StagedUploadFile: The staged file, named after the original file
+
+    Raises:
+        UploadError: If the upload is not complete or was already attached
+    """
+    claimed = UploadSession.objects.filter(
+        pk=upload.pk, status=UploadSession.STATUS_COMPLETE
+    ).update(status=UploadSession.STATUS_ATTACHED)
+    if not claimed:
+        raise UploadError("Upload is not complete or has already been attached")
+    upload.status = UploadSession.STATUS_ATTACHED
+    return StagedUploadFile(upload)
+
+
+def release_upload(upload):
+    """
+    Return a claimed upload to the completed state after using it failed.
+
+    Needed when the upload was claimed outside the transaction that uses it,
+    so it can be attached again.
+
+    Args:
+        upload: An upload session claimed by attach_upload
+    """
+    UploadSession.objects.filter(
+        pk=upload.pk, status=UploadSession.STATUS_ATTACHED
+    ).update(status=UploadSession.STATUS_COMPLETE)
+    upload.status = UploadSession.STATUS_COMPLETE
+
+
+def discard_staged_file(file):
+    """
+    Remove a staged upload that was read rather than attached to a field.
+
+    The file is removed once the current transaction commits, so a rollback
+    leaves it in place.
+
+    Args:
+        file: The StagedUploadFile returned by attach_upload
+    """
+    path = file.temporary_file_path()
+
+    def remove():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    transaction.on_commit(remove)
@@ -0,0 +1,244 @@
+"""
+Media File Serving
+==================
+
+This module builds streaming responses for stored media files with support for
+conditional requests (ETag / If-None-Match), single byte ranges (Range / 206),
+and optional hand-off to the front web server through X-Accel-Redirect.
+
+Under ASGI (daphne), Django collects a synchronous response iterator into a list
+before sending anything, so responses to ASGI requests read their blocks
+through an asynchronous iterator instead, one block at a time in a worker
+thread. Memory use stays at one block however large the file is.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def is_asgi_request(request):
+    """Whether the request is being served by the ASGI handler."""
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+async def iterate_in_thread(iterator):
+    """
+    Yield the items of a blocking iterator without blocking the event loop.
+
+    Each item is produced in a worker thread, so only one is held in memory at
+    a time. The iterator is closed when the response ends or is cancelled.
+
+    Args:
+        iterator: Iterator whose items may take blocking I/O to produce
+
+    Yields:
+        The items of the iterator
+    """
+    iterator = iter(iterator)
+    done = object()
+    get_next = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (item := await get_next(iterator, done)) is not done:
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=False)()
+
+
+def streaming_content(request, iterator):
+    """
+    Adapt a blocking iterator to the handler serving the request.
+
+    Args:
+        request: The incoming request
+        iterator: Iterator of response blocks
+
+    Returns:
+        The iterator itself under WSGI, an asynchronous iterator under ASGI
+    """
+    if is_asgi_request(request):
+        return iterate_in_thread(iterator)
+    return iterator
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse reading in larger blocks, suited to big media files.
+
+    With asynchronous=True the blocks are read through iterate_in_thread, so
+    an ASGI server sends each one as it is read.
+    """
+
+    block_size = 64 * 1024
+
+    def __init__(self, *args, asynchronous=False, **kwargs):
+        self.asynchronous = asynchronous
+        super().__init__(*args, **kwargs)
+
+    def _set_streaming_content(self, value):
+        super()._set_streaming_content(value)
+        if self.asynchronous and not self.is_async:
+            self._iterator = iterate_in_thread(self._iterator)
+            self.is_async = True
+
+
+class FileRange:
+    """
+    File-like view of a byte range of an open file.
+
+    Attributes:
+        name: Name of the underlying file, used to guess the content type
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        """Read at most size bytes without going past the end of the range."""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        """Close the underlying file."""
+        self.file.close()
+
+
+def get_etag(stat):
+    """
+    Build a strong ETag from a file's inode, size and modification time.
+
+    Args:
+        stat: os.stat_result of the file
+
+    Returns:
+        str: Quoted ETag value
+    """
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header.
+
+    Args:
+        header: Value of the Range header
+        size: Size of the file in bytes
+
+    Returns:
+        tuple: (start, end) inclusive byte positions, None to serve the whole
+        file, or False if the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: serve the whole file
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve_media(request, storage, name, public_max_age=None):
+    """
+    Stream a stored file with conditional and range request support.
+
+    When MEDIA_ACCEL_REDIRECT_PREFIX is set, the file is not read at all: the
+    response only carries an X-Accel-Redirect header and the front web server
+    sends the file, including byte ranges.
+
+    Args:
+        request: The incoming request
+        storage: File system storage holding the file
+        name: Name of the file in the storage
+        public_max_age: Seconds shared caches may keep the response; if None,
+            it is cacheable only by the user's browser
+
+    Returns:
+        HttpResponse: 200, 206, 304 or 416 response for the file
+    """
+    path = storage.path(name)
+    stat = os.stat(path)
+    etag = get_etag(stat)
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or (
+        if_none_match.strip() == "*"
+    ):
+        response = HttpResponse(status=304, headers=headers)
+    elif settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Accel-Redirect"] = quote(
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + name
+        )
+    else:
+        byte_range = None
+        if "Range" in request.headers and request.headers.get("If-Range", etag) == etag:
+            byte_range = parse_range(request.headers["Range"], stat.st_size)
+
+        if byte_range is False:
+            headers["Content-Range"] = f"bytes */{stat.st_size}"
+            response = HttpResponse(status=416, headers=headers)
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = MediaFileResponse(
+                FileRange(open(path, "rb"), start, length),
+                status=206,
+                content_type=content_type,
+                headers=headers,
+                asynchronous=is_asgi_request(request),
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            response["Content-Length"] = length
+        else:
+            response = MediaFileResponse(
+                open(path, "rb"),
+                content_type=content_type,
+                headers=headers,
+                asynchronous=is_asgi_request(request),
+            )
+
+    if public_max_age is None:
+        patch_cache_control(
+            response, private=True, max_age=settings.MEDIA_CACHE_MAX_AGE
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=public_max_age)
+    return response
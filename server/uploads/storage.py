@@ -0,0 +1,205 @@
+"""
+Content-Addressed Media Storage
+===============================
+
+This module defines the default file storage. Every distinct file content is
+stored once as a blob named by its SHA-256 digest, and each saved file is a hard
+link to its blob, placed in subdirectories sharded by that digest.
+"""
+
+import hashlib
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+# Bytes read at a time when hashing a file on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class HashingContent:
+    """
+    Wrap file content so its SHA-256 is computed while it is written.
+
+    Attributes:
+        hasher: Running SHA-256 of the chunks read so far
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.hasher = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        """Yield the content's chunks as bytes and update the digest."""
+        for chunk in self.content.chunks(chunk_size):
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            self.hasher.update(chunk)
+            yield chunk
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that deduplicates files by content.
+
+    Saving ``chat_files/notes.pdf`` stores the content once under
+    ``.blobs/ab/cd/<sha256>.pdf`` and returns the name
+    ``chat_files/ab/cd/notes.pdf``, which is a hard link to that blob. Sending the
+    same file again adds another link rather than another copy, and sharding by
+    digest keeps every directory small.
+
+    The blob's link count is its reference count. Deleting a name only removes
+    that link, and the blob goes away with its last reference, so
+    ``django_cleanup`` can delete files as usual. Files saved before this storage
+    was enabled are plain files and are deleted as before.
+    """
+
+    blob_dir = ".blobs"
+
+    def save(self, name, content, max_length=None):
+        """
+        Store the content as a blob and link it under a sharded name.
+
+        Args:
+            name: Requested name, e.g. the field's upload_to plus the filename
+            content: File or file-like object to store
+            max_length: Maximum length of the returned name
+
+        Returns:
+            str: The name the file was saved under
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        digest, blob_path = self._store_blob(name, content)
+
+        directory, filename = os.path.split(name)
+        name = os.path.join(directory, digest[:2], digest[2:4], filename)
+        while True:
+            name = self.get_available_name(name, max_length=max_length)
+            full_path = self.path(name)
+            self._make_parent_dir(full_path)
+            try:
+                os.link(blob_path, full_path)
+            except FileExistsError:
+                # Another save took the name since get_available_name
+                continue
+            break
+
+        validate_file_name(name, allow_relative_path=True)
+        return str(name).replace("\\", "/")
+
+    def delete(self, name):
+        """
+        Delete a name, and its blob once no other name references it.
+
+        Args:
+            name: Name of the file to delete
+        """
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return
+
+        super().delete(name)
+        # The blob itself holds one link; two links mean this was the last name
+        if stat.st_nlink == 2:
+            self._delete_orphan_blob(name, stat)
+
+    def reference_count(self, name):
+        """
+        Count the saved names sharing a file's content.
+
+        Args:
+            name: Name of a saved file
+
+        Returns:
+            int: Number of names linked to the same blob, including this one
+        """
+        links = os.stat(self.path(name)).st_nlink
+        return links - 1 if links > 1 else links
+
+    def _store_blob(self, name, content):
+        """
+        Store the content under its digest unless an identical blob exists.
+
+        Content with a temporary file on disk (large uploads, finished chunked
+        uploads) is hashed from disk and moved into place; other content is
+        streamed to a temporary blob and hashed on the way. The digest is always
+        computed here, never taken from the caller, since it names the blob that
+        every later save with the same digest links to.
+
+        Returns:
+            tuple: (hex digest, absolute path of the blob)
+        """
+        extension = os.path.splitext(name)[1].lower()
+
+        if hasattr(content, "temporary_file_path"):
+            source = content.temporary_file_path()
+            digest = self._hash_file(source)
+        else:
+            hashing = HashingContent(content)
+            temp_name = os.path.join(self.blob_dir, "tmp", uuid.uuid4().hex)
+            source = self.path(super()._save(temp_name, hashing))
+            digest = hashing.hasher.hexdigest()
+
+        blob_path = self.path(
+            os.path.join(self.blob_dir, digest[:2], digest[2:4], digest + extension)
+        )
+        self._make_parent_dir(blob_path)
+        try:
+            file_move_safe(source, blob_path, allow_overwrite=False)
+        except FileExistsError:
+            # Identical content is already stored; keep the existing blob
+            os.remove(source)
+        else:
+            if self.file_permissions_mode is not None:
+                os.chmod(blob_path, self.file_permissions_mode)
+        return digest, blob_path
+
+    def _delete_orphan_blob(self, name, stat):
+        """Remove the blob a deleted name was linked to if it has no links left."""
+        parts = os.path.normpath(name).split(os.sep)
+        if len(parts) < 3:
+            return
+        shard_dir = self.path(os.path.join(self.blob_dir, parts[-3], parts[-2]))
+        try:
+            entries = list(os.scandir(shard_dir))
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            blob_stat = entry.stat(follow_symlinks=False)
+            if blob_stat.st_ino == stat.st_ino and blob_stat.st_dev == stat.st_dev:
+                if blob_stat.st_nlink == 1:
+                    os.remove(entry.path)
+                return
+
+    def _make_parent_dir(self, path):
+        """Create the directory a file will be written to."""
+        directory = os.path.dirname(path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _hash_file(path):
+        """Return the hex SHA-256 of a file on disk."""
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
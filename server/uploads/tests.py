@@ -0,0 +1,596 @@
+import fcntl
+import hashlib
+import io
+import os
+import tempfile
+import time
+from unittest import mock
+from urllib.parse import urlsplit
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts.tests import TeacherFactory, UserFactory
+from chat.models import ChatMessage
+from courses.models import CourseMaterial
+from courses.tests import CourseFactory, EnrollmentFactory
+from elearning import settings as project_settings
+from PIL import Image
+
+from uploads import derivatives, services
+from uploads.models import UploadSession
+from uploads.serving import MediaFileResponse
+from uploads.signing import get_expiry, signed_media_url, verify_media_signature
+from uploads.storage import ContentAddressedStorage
+
+CONTENT = b"0123456789" * 1000
+
+
+@override_settings(UPLOAD_TEMP_DIR=tempfile.mkdtemp(), MEDIA_ROOT=tempfile.mkdtemp())
+class UploadSessionTests(APITestCase):
+    """
+    Test chunked, resumable uploads
+    """
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+
+    def start_upload(self, filename="notes.pdf", size=len(CONTENT)):
+        response = self.client.post(
+            "/api/uploads/", {"filename": filename, "size": size}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.put(
+            f"/api/uploads/{upload_id}/?offset={offset}",
+            data,
+            content_type="application/octet-stream",
+        )
+
+    def upload(self, filename="notes.pdf"):
+        upload_id = self.start_upload(filename)
+        self.put_chunk(upload_id, 0, CONTENT[:6000])
+        self.put_chunk(upload_id, 6000, CONTENT[6000:])
+        response = self.client.post(f"/api/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return upload_id
+
+    def test_chunked_upload_and_finalize(self):
+        """Test that chunks are written in order and hashed while writing"""
+        upload_id = self.start_upload()
+
+        response = self.put_chunk(upload_id, 0, CONTENT[:4000])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["received"], 4000)
+
+        # Incomplete uploads cannot be finalized
+        response = self.client.post(f"/api/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.put_chunk(upload_id, 4000, CONTENT[4000:])
+        response = self.client.post(
+            f"/api/uploads/{upload_id}/finalize/",
+            {"sha256": hashlib.sha256(CONTENT).hexdigest()},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], UploadSession.STATUS_COMPLETE)
+        self.assertEqual(response.data["sha256"], hashlib.sha256(CONTENT).hexdigest())
+
+    def test_resume_after_wrong_offset(self):
+        """Test that a chunk at the wrong offset returns the offset to resume from"""
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, CONTENT[:3000])
+
+        response = self.put_chunk(upload_id, 0, CONTENT[:3000])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["received"], 3000)
+
+        response = self.client.get(f"/api/uploads/{upload_id}/")
+        self.assertEqual(response.data["received"], 3000)
+
+    def test_concurrent_chunk_is_rejected_before_writing(self):
+        """Test that a chunk racing another one leaves the staged file alone"""
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, CONTENT[:6000])
+        upload = UploadSession.objects.get(id=upload_id)
+
+        # A retry of the first chunk that read the upload before it advanced
+        stale = UploadSession.objects.get(id=upload_id)
+        stale.received = 0
+        with self.assertRaises(services.UploadConflict):
+            services.write_chunk(stale, 0, io.BytesIO(b"x" * 10), 10)
+
+        # A chunk arriving while another one holds the staged file
+        with open(upload.temp_path, "rb") as staged:
+            fcntl.flock(staged, fcntl.LOCK_EX)
+            response = self.put_chunk(upload_id, 6000, CONTENT[6000:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["received"], 6000)
+
+        with open(upload.temp_path, "rb") as staged:
+            self.assertEqual(staged.read(), CONTENT[:6000])
+        response = self.put_chunk(upload_id, 6000, CONTENT[6000:])
+        self.assertEqual(response.data["received"], len(CONTENT))
+
+    def test_finalize_rehashes_without_cached_state(self):
+        """Test that finalizing works when chunks were hashed by another process"""
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, CONTENT[:5000])
+        services._drop_hasher(UploadSession.objects.get(id=upload_id).pk)
+        self.put_chunk(upload_id, 5000, CONTENT[5000:])
+
+        response = self.client.post(f"/api/uploads/{upload_id}/finalize/")
+        self.assertEqual(response.data["sha256"], hashlib.sha256(CONTENT).hexdigest())
+
+    def test_chunk_beyond_declared_size(self):
+        """Test that chunks cannot grow the file past its declared size"""
+        upload_id = self.start_upload(size=10)
+        response = self.put_chunk(upload_id, 0, CONTENT[:20])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_attach_upload_to_chat_message(self):
+        """Test that a finished upload is attached to a message in one save"""
+        receiver = UserFactory()
+        upload_id = self.upload()
+        temp_path = UploadSession.objects.get(id=upload_id).temp_path
+
+        response = self.client.post(
+            "/api/chat/", {"receiver": receiver.id, "upload_id": upload_id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["file"]["title"], "notes.pdf")
+
+        message = ChatMessage.objects.get(id=response.data["id"])
+        with message.file.open("rb") as attached:
+            self.assertEqual(attached.read(), CONTENT)
+        self.assertFalse(os.path.exists(temp_path))
+
+        # An upload can only be attached once
+        response = self.client.post(
+            "/api/chat/", {"receiver": receiver.id, "upload_id": upload_id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_attach_upload_to_course_material(self):
+        """Test that a teacher can create a material from a finished upload"""
+        teacher = TeacherFactory()
+        course = CourseFactory(teacher=teacher)
+        self.client.force_authenticate(user=teacher)
+        upload_id = self.upload("lecture.pdf")
+
+        response = self.client.post(
+            f"/api/courses/{course.id}/materials/",
+            {"title": "Lecture 1", "upload_id": upload_id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        material = CourseMaterial.objects.get(course=course, title="Lecture 1")
+        self.assertTrue(material.file.name.endswith(".pdf"))
+        with material.file.open("rb") as attached:
+            self.assertEqual(attached.read(), CONTENT)
+
+    def test_upload_of_another_user_cannot_be_attached(self):
+        """Test that upload IDs only resolve for their owner"""
+        upload_id = self.upload()
+        other = UserFactory()
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(f"/api/uploads/{upload_id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(
+            "/api/chat/", {"receiver": self.user.id, "upload_id": upload_id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ContentAddressedStorageTests(TestCase):
+    """
+    Test content-addressed, deduplicating media storage
+    """
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage(location=tempfile.mkdtemp())
+
+    def blobs(self):
+        blob_root = self.storage.path(ContentAddressedStorage.blob_dir)
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(blob_root)
+            for name in names
+        ]
+
+    def test_identical_content_is_stored_once(self):
+        """Test that saving the same content twice links to a single blob"""
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        first = self.storage.save("chat_files/notes.pdf", ContentFile(CONTENT))
+        second = self.storage.save("course_materials/lecture.pdf", ContentFile(CONTENT))
+
+        self.assertEqual(first, f"chat_files/{digest[:2]}/{digest[2:4]}/notes.pdf")
+        self.assertTrue(second.endswith("/lecture.pdf"))
+        self.assertEqual(self.storage.reference_count(first), 2)
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertTrue(self.blobs()[0].endswith(f"{digest}.pdf"))
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_same_name_and_content_gets_unique_name(self):
+        """Test that every save returns its own name to delete independently"""
+        first = self.storage.save("chat_files/notes.pdf", ContentFile(CONTENT))
+        second = self.storage.save("chat_files/notes.pdf", ContentFile(CONTENT))
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.storage.reference_count(second), 2)
+
+    def test_staged_file_is_hashed_by_storage(self):
+        """Test that a temporary file is stored under the digest of its content"""
+        path = os.path.join(tempfile.mkdtemp(), "staged")
+        with open(path, "wb") as f:
+            f.write(CONTENT)
+        staged = mock.Mock(
+            chunks=mock.Mock(),
+            temporary_file_path=mock.Mock(return_value=path),
+            sha256=hashlib.sha256(b"other content").hexdigest(),
+        )
+        other = self.storage.save("chat_files/b.txt", ContentFile(b"other content"))
+        name = self.storage.save("chat_files/a.txt", staged)
+
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        self.assertEqual(name, f"chat_files/{digest[:2]}/{digest[2:4]}/a.txt")
+        self.assertEqual(self.storage.reference_count(other), 1)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_blob_is_deleted_with_last_reference(self):
+        """Test that deleting names only removes the blob with the last one"""
+        first = self.storage.save("chat_files/a.txt", ContentFile(CONTENT))
+        second = self.storage.save("chat_files/b.txt", ContentFile(CONTENT))
+
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertEqual(self.storage.reference_count(second), 1)
+        self.assertEqual(len(self.blobs()), 1)
+
+        self.storage.delete(second)
+        self.assertEqual(self.blobs(), [])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_cleanup_keeps_shared_files(self):
+        """Test that django_cleanup deleting one message keeps a shared file"""
+        sender, receiver = UserFactory(), UserFactory()
+        first, second = [
+            ChatMessage.objects.create(
+                sender=sender,
+                receiver=receiver,
+                file=ContentFile(CONTENT, name="notes.pdf"),
+            )
+            for _ in range(2)
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.assertFalse(first.file.storage.exists(first.file.name))
+        with second.file.open("rb") as f:
+            self.assertEqual(f.read(), CONTENT)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaDownloadTests(APITestCase):
+    """
+    Test access-checked media downloads
+    """
+
+    def setUp(self):
+        self.sender = UserFactory()
+        self.receiver = UserFactory()
+        self.message = ChatMessage.objects.create(
+            sender=self.sender,
+            receiver=self.receiver,
+            file=ContentFile(CONTENT, name="notes.txt"),
+        )
+        self.url = f"/api/media/{self.message.file.name}"
+
+    def download(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        if response.streaming:
+            response.content_bytes = b"".join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_participant_downloads_chat_file(self):
+        """Test that chat participants get the file with an ETag"""
+        self.client.force_authenticate(user=self.receiver)
+        response = self.download(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content_bytes, CONTENT)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+        response = self.download(self.url, If_None_Match=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_users_cannot_download_chat_file(self):
+        """Test that chat files are hidden from non-participants"""
+        self.client.force_authenticate(user=UserFactory())
+        response = self.download(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_path_traversal_is_rejected(self):
+        """Test that names escaping their directory never reach the access rules"""
+        self.client.force_authenticate(user=UserFactory())
+        name = self.message.file.name
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        blob = f".blobs/{digest[:2]}/{digest[2:4]}/{digest}.txt"
+        self.assertTrue(default_storage.exists(blob))
+        for url in [
+            f"/api/media/profile_photos/../{name}",
+            f"/api/media/profile_photos/%2e%2e/{name}",
+            f"/api/media/profile_photos/./../{name}",
+            f"/api/media/profile_photos//{name}",
+            f"/api/media/{blob}",
+        ]:
+            response = self.download(url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, url)
+
+    def test_range_request(self):
+        """Test that a byte range is served as partial content"""
+        self.client.force_authenticate(user=self.sender)
+
+        response = self.download(self.url, Range="bytes=100-199")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response.content_bytes, CONTENT[100:200])
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(CONTENT)}")
+        self.assertEqual(response["Content-Length"], "100")
+
+        response = self.download(self.url, Range="bytes=-10")
+        self.assertEqual(response.content_bytes, CONTENT[-10:])
+
+        response = self.download(self.url, Range=f"bytes={len(CONTENT)}-")
+        self.assertEqual(
+            response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX="/protected-media/")
+    def test_accel_redirect(self):
+        """Test that the file is handed off to the web server when configured"""
+        self.client.force_authenticate(user=self.sender)
+        response = self.download(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{self.message.file.name}"
+        )
+        self.assertEqual(response.content, b"")
+
+    def test_course_material_access(self):
+        """Test that materials follow the course teacher or enrolled student rule"""
+        course = CourseFactory()
+        material = CourseMaterial.objects.create(
+            course=course, title="Slides", file=ContentFile(CONTENT, name="slides.pdf")
+        )
+        url = f"/api/media/{material.file.name}"
+        student = UserFactory()
+
+        self.client.force_authenticate(user=student)
+        self.assertEqual(self.download(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        EnrollmentFactory(student=student, course=course)
+        self.assertEqual(self.download(url).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=course.teacher)
+        self.assertEqual(self.download(url).status_code, status.HTTP_200_OK)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    MEDIA_URL_SIGNING_KEYS={"old": "old-secret", "new": "new-secret"},
+    MEDIA_URL_SIGNING_KEY_ID="new",
+)
+class SignedMediaURLTests(APITestCase):
+    """
+    Test signed, expiring media links
+    """
+
+    def setUp(self):
+        self.message = ChatMessage.objects.create(
+            sender=UserFactory(),
+            receiver=UserFactory(),
+            file=ContentFile(CONTENT, name="notes.txt"),
+        )
+        self.name = self.message.file.name
+
+    def params(self, url):
+        return dict(
+            part.split("=", 1) for part in urlsplit(url).query.split("&") if part
+        )
+
+    def test_signed_url_needs_no_auth_or_queries(self):
+        """Test that a signed link is served without any database access"""
+        url = signed_media_url(self.name)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+            content = b"".join(response.streaming_content)
+            response.close()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(content, CONTENT)
+        self.assertIn("public", response["Cache-Control"])
+
+    async def test_asgi_streams_blocks_asynchronously(self):
+        """Test that ASGI responses read the file block by block, not all at once"""
+        url = signed_media_url(self.name)
+        client = AsyncClient()
+
+        with mock.patch.object(MediaFileResponse, "block_size", 100):
+            response = await client.get(url)
+            self.assertTrue(response.is_async)
+            blocks = [block async for block in response.streaming_content]
+            self.assertEqual(b"".join(blocks), CONTENT)
+            self.assertGreater(len(blocks), 1)
+
+            response = await client.get(url, headers={"Range": "bytes=10-259"})
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertTrue(response.is_async)
+            content = b"".join([block async for block in response.streaming_content])
+            self.assertEqual(content, CONTENT[10:260])
+
+    def test_links_are_stable_within_a_bucket(self):
+        """Test that links issued in the same expiry bucket are identical"""
+        now = 1_700_000_000
+        expiry = get_expiry(now)
+        self.assertEqual(get_expiry(now + 1), expiry)
+        self.assertGreaterEqual(expiry - now, 60 * 60)
+
+    def test_tampered_or_expired_links_are_rejected(self):
+        """Test that invalid signatures fall back to authentication"""
+        params = self.params(signed_media_url(self.name))
+
+        other_name = self.name.replace("notes", "other")
+        self.assertFalse(verify_media_signature(other_name, params))
+        self.assertFalse(
+            verify_media_signature(self.name, params, now=int(params["exp"]))
+        )
+        self.assertFalse(
+            verify_media_signature(self.name, {**params, "sig": params["sig"][:-1]})
+        )
+
+        url = f"/api/media/{self.name}?kid=new&exp={int(time.time()) + 60}&sig=bad"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_key_rotation(self):
+        """Test that links signed with a retired key work until it is removed"""
+        with self.settings(MEDIA_URL_SIGNING_KEY_ID="old"):
+            params = self.params(signed_media_url(self.name))
+        self.assertEqual(params["kid"], "old")
+        self.assertTrue(verify_media_signature(self.name, params))
+
+        with self.settings(MEDIA_URL_SIGNING_KEYS={"new": "new-secret"}):
+            self.assertFalse(verify_media_signature(self.name, params))
+
+    def test_default_key_is_not_the_secret_key(self):
+        """Test that media links are not signed with the raw SECRET_KEY"""
+        self.assertNotEqual(
+            project_settings.MEDIA_URL_SIGNING_KEYS["default"],
+            project_settings.SECRET_KEY,
+        )
+
+    def test_serializers_return_signed_urls(self):
+        """Test that chat file URLs in the API are signed links"""
+        self.client.force_authenticate(user=self.message.sender)
+        response = self.client.get(f"/api/chat/{self.message.receiver_id}/")
+
+        url = response.data[0]["file"]["url"]
+        self.assertIn(f"/api/media/{self.name}?", url)
+        self.assertTrue(verify_media_signature(self.name, self.params(url)))
+
+
+def make_image(width=800, height=600, mode="RGBA", fmt="PNG"):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), (200, 40, 40, 128)[: len(mode)]).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DerivativeTests(APITestCase):
+    """
+    Test background generation of image derivatives
+    """
+
+    def setUp(self):
+        self.message = ChatMessage.objects.create(
+            sender=UserFactory(),
+            receiver=UserFactory(),
+            file=ContentFile(make_image(), name="photo.png"),
+        )
+        self.name = self.message.file.name
+
+    def render(self, name, kind):
+        targets = [
+            (
+                default_storage.path(derivatives.derivative_name(name, spec)),
+                *derivatives.DERIVATIVE_SPECS[spec],
+            )
+            for spec in derivatives.DERIVATIVE_KINDS[kind]
+        ]
+        return derivatives.render_derivatives(default_storage.path(name), targets)
+
+    def test_render_derivatives(self):
+        """Test that thumbnails fit the spec and avatars are cropped to it"""
+        self.assertEqual(self.render(self.name, "thumbnail"), 2)
+        self.render(self.name, "avatar")
+
+        sizes = {}
+        for spec in derivatives.DERIVATIVE_SPECS:
+            path = default_storage.path(derivatives.derivative_name(self.name, spec))
+            with Image.open(path) as image:
+                self.assertEqual(image.format, "JPEG")
+                sizes[spec] = image.size
+        self.assertEqual(sizes["thumb_320"], (320, 240))
+        self.assertEqual(sizes["preview_1280"], (800, 600))
+        self.assertEqual(sizes["avatar_64"], (64, 64))
+
+    def test_urls_are_listed_once_ready(self):
+        """Test that the API only lists derivatives that exist"""
+        self.client.force_authenticate(user=self.message.sender)
+        url = f"/api/chat/{self.message.receiver_id}/"
+        self.assertEqual(self.client.get(url).data[0]["file"]["thumbnails"], {})
+
+        self.render(self.name, "thumbnail")
+        thumbnails = self.client.get(url).data[0]["file"]["thumbnails"]
+        self.assertEqual(set(thumbnails), {"thumb_320", "preview_1280"})
+
+        derivative = derivatives.derivative_name(self.name, "thumb_320")
+        response = self.client.get(thumbnails["thumb_320"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        response.close()
+        self.assertIn(f"/api/media/{derivative}?", thumbnails["thumb_320"])
+
+    def test_upload_schedules_after_commit(self):
+        """Test that uploads hand images to the pool only after commit"""
+        self.client.force_authenticate(user=self.message.sender)
+        with mock.patch("uploads.derivatives.get_executor") as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/api/chat/",
+                    {
+                        "receiver": self.message.receiver_id,
+                        "file": SimpleUploadedFile("other.png", make_image()),
+                    },
+                    format="multipart",
+                )
+                get_executor.assert_not_called()
+
+                self.client.post(
+                    "/api/chat/",
+                    {
+                        "receiver": self.message.receiver_id,
+                        "file": SimpleUploadedFile("notes.pdf", b"%PDF-1.4"),
+                    },
+                    format="multipart",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        submit = get_executor.return_value.submit
+        submit.assert_called_once()
+        self.assertIs(submit.call_args.args[0], derivatives.render_derivatives)
+        self.assertEqual(len(submit.call_args.args[2]), 2)
+
+    def test_derivatives_are_deleted_with_file(self):
+        """Test that deleting the source file removes its derivatives"""
+        self.render(self.name, "thumbnail")
+        path = default_storage.path(derivatives.derivative_name(self.name, "thumb_320"))
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.message.delete()
+        self.assertFalse(os.path.exists(path))
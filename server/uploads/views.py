@@ -0,0 +1,263 @@
+"""
+Upload Views
+============
+
+This module contains the chunked upload API: start an upload, send chunks at
+byte offsets, and finalize it so it can be attached to a chat message or a
+course material by its upload ID. It also contains the access-checked media
+download view.
+"""
+
+import posixpath
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.permissions import IsCourseTeacherOrEnrolledStudent
+from chat.models import ChatMessage
+from courses.models import CourseMaterial
+from .models import UploadSession
+from .serializers import UploadSessionSerializer
+from .serving import serve_media
+from .signing import verify_media_signature
+from .storage import ContentAddressedStorage
+from .services import UploadConflict, UploadError, finalize_upload, write_chunk
+
+
+class UploadSessionViewSet(
+    mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """
+    ViewSet for resumable, chunked uploads.
+
+    Provides endpoints for:
+    - POST /uploads/: start an upload with a filename and total size
+    - GET /uploads/{id}/: get the received offset to resume an interrupted upload
+    - PUT /uploads/{id}/?offset=N: write the raw request body at byte offset N
+    - POST /uploads/{id}/finalize/: check the size and checksum and complete it
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSessionSerializer
+    http_method_names = ["get", "post", "put"]
+
+    def get_queryset(self):
+        """
+        Get the uploads of the authenticated user.
+
+        Returns:
+            QuerySet: Upload sessions owned by the current user
+        """
+        return UploadSession.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        """Start the upload for the current user."""
+        serializer.save(owner=self.request.user)
+
+    def update(self, request: Request, pk=None) -> Response:
+        """
+        Write one chunk of the upload from the raw request body.
+
+        The body is streamed to disk without being buffered in memory. A chunk
+        must start at the upload's received offset; otherwise a 409 response
+        carries the offset to resume from.
+
+        Args:
+            request: The HTTP request containing:
+                - offset (int, query): Byte offset the chunk starts at
+                - body: The raw chunk bytes
+
+        Returns:
+            Response: The upload with its new received offset
+        """
+        upload = self.get_object()
+
+        try:
+            offset = int(request.query_params["offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "A numeric offset and Content-Length are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if length <= 0:
+            return Response(
+                {"error": "Chunk is empty"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        max_chunk_size = settings.UPLOAD_MAX_CHUNK_SIZE
+        if length > max_chunk_size:
+            return Response(
+                {"error": f"Chunks may not exceed {max_chunk_size} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        try:
+            write_chunk(upload, offset, request.stream, length)
+        except UploadConflict as e:
+            upload.refresh_from_db()
+            return Response(
+                {"error": str(e), "received": upload.received},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=["post"])
+    def finalize(self, request: Request, pk=None) -> Response:
+        """
+        Complete the upload after all bytes have been received.
+
+        Args:
+            request: The HTTP request optionally containing:
+                - sha256 (str): Hex SHA-256 digest computed by the client
+
+        Returns:
+            Response: The completed upload including its sha256
+        """
+        upload = self.get_object()
+        try:
+            finalize_upload(upload, request.data.get("sha256"))
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
+
+
+# Upper bound for how long shared caches may keep a signed media response
+MAX_PUBLIC_AGE = 24 * 60 * 60
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Content negotiation that ignores the Accept header.
+
+    Media requests from <img> and <video> tags accept the file's own type, which
+    must not turn error responses into 406s.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class MediaDownloadView(APIView):
+    """
+    Serve a stored media file after checking that the user may access it.
+
+    Links signed by uploads.signing grant access on their own: the signature is
+    checked without authentication or database access, and the response may be
+    cached publicly until the link expires. Otherwise the authenticated user
+    must pass the access rule for the file's upload directory:
+    - course_materials/: the course teacher and enrolled students, as for the
+      material endpoints; the material and its course must be active
+    - chat_files/: the sender and the receiver of the message
+    - profile_photos/: any authenticated user
+    """
+
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def initial(self, request, *args, **kwargs):
+        """Check the link signature before authentication and permissions."""
+        self.check_media_name(kwargs["name"])
+        self.signed = verify_media_signature(kwargs["name"], request.query_params)
+        super().initial(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        """Skip authentication for signed links, which need no user."""
+        if not self.signed:
+            super().perform_authentication(request)
+
+    def get_permissions(self):
+        """Allow signed links without further permission checks."""
+        if self.signed:
+            return []
+        return super().get_permissions()
+
+    def get(self, request: Request, name: str):
+        """
+        Stream the file, honouring Range and If-None-Match headers.
+
+        Args:
+            request: The HTTP request
+            name: Name of the file in the media storage
+
+        Returns:
+            HttpResponse: The file or a part of it, or 304 if unchanged
+        """
+        public_max_age = None
+        if self.signed:
+            expires = int(request.query_params["exp"])
+            public_max_age = max(0, min(expires - int(time.time()), MAX_PUBLIC_AGE))
+        else:
+            self.check_media_access(request, name)
+
+        try:
+            return serve_media(
+                request, default_storage, name, public_max_age=public_max_age
+            )
+        except (FileNotFoundError, SuspiciousFileOperation):
+            raise NotFound("File not found")
+
+    def check_media_name(self, name):
+        """
+        Reject names that are not the normalized name of an uploaded file.
+
+        The access rules are chosen by the name's leading directory, so a name
+        such as "profile_photos/../chat_files/..." must never reach them. The
+        deduplicated blobs are only reachable through the names linked to them.
+
+        Raises:
+            NotFound: If the name is absolute, not normalized, climbs out of its
+                directory or points into the blob store
+        """
+        if (
+            not name
+            or posixpath.normpath(name) != name
+            or name.startswith("/")
+            or ".." in name.split("/")
+            or name.startswith(f"{ContentAddressedStorage.blob_dir}/")
+        ):
+            raise NotFound("File not found")
+
+    def check_media_access(self, request, name):
+        """
+        Check the access rule for the directory the file was uploaded to.
+
+        Raises:
+            NotFound: If no accessible object references the file
+            PermissionDenied: If the user may not access the object
+        """
+        if name.startswith("course_materials/"):
+            material = (
+                CourseMaterial.objects.select_related("course")
+                .filter(file=name, is_active=True, course__is_active=True)
+                .first()
+            )
+            if material is None:
+                raise NotFound("File not found")
+            permission = IsCourseTeacherOrEnrolledStudent()
+            if not permission.has_object_permission(request, self, material):
+                raise PermissionDenied()
+        elif name.startswith("chat_files/"):
+            is_participant = ChatMessage.objects.filter(
+                Q(sender=request.user) | Q(receiver=request.user), file=name
+            ).exists()
+            if not is_participant:
+                raise NotFound("File not found")
+        elif not name.startswith("profile_photos/"):
+            raise NotFound("File not found")